@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分散処理（--distributed）のスループットと、停止したワーカーのリースの再取得の確認
+
+1つのマシンで、同じ一時フォルダ（キュー用フォルダ・出力先・合成PDFコーパス）に対して
+プロセス数を変えながらワーカーを起動し、全文書が終わるまでの時間と合計のスループット
+（文書/秒。ワーカーの起動時間を除いた、最初から最後の完了までの間の値も求める）を
+計測する。各文書がちょうど1回ずつ処理されたこと（完了の記録と各ワーカーの成功数の
+合計が文書数に一致すること）も確かめる。
+
+--simulate-ms を指定すると、PDFを処理せずに1文書あたりその時間だけ待つワーカーで
+キューだけを計測する（CPU数に関係なく、リースの取り合いによるオーバーヘッドを確かめられる）。
+--kill-after を指定すると、最大のプロセス数で起動したうえで1つのワーカーをその秒数後に
+強制終了し、残ったリースがほかのワーカーに取得し直されて全文書が完了することを確かめる。
+--shared-cache を指定すると、全ワーカーが同じ結果キャッシュのフォルダを使い、同時に保存しても
+全文書のエントリが索引に残ることを確かめる
+
+使用方法:
+    python benchmarks/bench_distributed.py [--files 40] [--max-pages 6] [--processes 1,2,4]
+        [--simulate-ms 0] [--kill-after 0] [--lease-seconds 6] [--shared-cache] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from src.distributed import LeaseQueue, LEASE_SUFFIX, process_folder_distributed
+from src.schema import FileResult, SplitMode
+
+def _quiet_logger():
+    """ログ出力を警告以上・標準エラーのみにする"""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+def run_worker(args):
+    """ワーカー1つ分の処理（子プロセスで実行し、結果をJSONで標準出力に書き出す）"""
+    _quiet_logger()
+    pdf_files = sorted(os.path.join(args.folder, name) for name in os.listdir(args.folder)
+                       if name.endswith(".pdf"))
+    if args.simulate_ms:
+        queue = LeaseQueue(args.queue_dir, args.folder, "bench", args.lease_seconds,
+                           args.heartbeat_seconds)
+        succeeded = 0
+        try:
+            while True:
+                for pdf_file in queue.iter_claimed(pdf_files):
+                    time.sleep(args.simulate_ms / 1000)
+                    queue.complete(FileResult(pdf_path=pdf_file, success=True, message=""))
+                    succeeded += 1
+                remaining, claimable = queue.scan(pdf_files)
+                if not remaining:
+                    break
+                if not claimable:
+                    time.sleep(args.poll_seconds)
+        finally:
+            queue.close()
+        print(json.dumps({"success": succeeded, "reclaimed": queue.reclaimed}))
+        return
+
+    from src.settings import load_settings
+    settings = load_settings()
+    settings = settings.model_copy(update={
+        "output_dir": args.output_dir,
+        "cache": settings.cache.model_copy(update={"cache_dir": args.cache_dir or "cache"}),
+        "extraction": settings.extraction.model_copy(update={"extractor": args.extractor}),
+        "distributed": settings.distributed.model_copy(update={
+            "lease_seconds": args.lease_seconds, "heartbeat_seconds": args.heartbeat_seconds,
+            "poll_seconds": args.poll_seconds}),
+    })
+    summary = process_folder_distributed(args.folder, SplitMode.HALF, workers=1,
+                                         use_cache=bool(args.cache_dir), queue_dir=args.queue_dir,
+                                         settings=settings)
+    print(json.dumps({"success": summary.success_count, "errors": summary.error_count}))
+
+def count_leases(queue_dir, worker_id):
+    """ワーカーが持っているリースの数"""
+    lease_dir = os.path.join(queue_dir, "leases")
+    if not os.path.isdir(lease_dir):
+        return 0
+    count = 0
+    for name in os.listdir(lease_dir):
+        if not name.endswith(LEASE_SUFFIX):
+            continue
+        try:
+            with open(os.path.join(lease_dir, name), "r", encoding="utf-8") as f:
+                if json.load(f).get("worker") == worker_id:
+                    count += 1
+        except (OSError, ValueError):
+            continue
+    return count
+
+def count_done(queue_dir, worker_id=None):
+    """完了の記録の数（worker_id を指定した場合はそのワーカーが書いたもの）"""
+    done_dir = os.path.join(queue_dir, "done")
+    count = 0
+    for name in os.listdir(done_dir):
+        if name.endswith(".tmp"):
+            continue
+        if worker_id is not None:
+            with open(os.path.join(done_dir, name), "r", encoding="utf-8") as f:
+                if json.load(f).get("worker") != worker_id:
+                    continue
+        count += 1
+    return count
+
+def count_cache_entries(cache_dir):
+    """結果キャッシュの索引にあるエントリの数"""
+    with open(os.path.join(cache_dir, "index.json"), "r", encoding="utf-8") as f:
+        return len(json.load(f)["entries"])
+
+def steady_throughput(queue_dir):
+    """
+    最初から最後の完了の記録までの間の文書/秒
+
+    ワーカーの起動時間（1CPUで多数のプロセスを起動する場合に大きい）を含めない
+    """
+    done_dir = os.path.join(queue_dir, "done")
+    times = sorted(os.stat(os.path.join(done_dir, name)).st_mtime for name in os.listdir(done_dir)
+                   if not name.endswith(".tmp"))
+    if len(times) < 2 or times[-1] <= times[0]:
+        return None
+    return (len(times) - 1) / (times[-1] - times[0])
+
+def measure(corpus_dir, files, processes, args, kill_after=0):
+    """processes 個のワーカーで全文書を処理して計測"""
+    run_dir = tempfile.mkdtemp(prefix="bench_distributed_")
+    queue_dir = os.path.join(run_dir, "queue")
+    cache_dir = os.path.join(run_dir, "cache") if args.shared_cache else ""
+    workers = []
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--folder", corpus_dir,
+                   "--queue-dir", queue_dir, "--output-dir", os.path.join(run_dir, "outputs"),
+                   "--lease-seconds", str(args.lease_seconds),
+                   "--heartbeat-seconds", str(args.heartbeat_seconds),
+                   "--poll-seconds", str(args.poll_seconds),
+                   "--simulate-ms", str(args.simulate_ms), "--extractor", args.extractor,
+                   "--cache-dir", cache_dir]
+        start = time.perf_counter()
+        # ワーカーごとに別のプロセスグループにし、強制終了する場合は子プロセスごと止める
+        workers = [subprocess.Popen(command, stdout=subprocess.PIPE, cwd=run_dir,
+                                    start_new_session=True)
+                   for _ in range(processes)]
+
+        killed = None
+        orphaned = 0
+        if kill_after:
+            time.sleep(kill_after)
+            killed = workers[0]
+            killed_id = f"{socket.gethostname()}-{killed.pid}"
+            # 処理中の文書を持った状態で止める
+            while count_leases(queue_dir, killed_id) == 0 and killed.poll() is None:
+                time.sleep(0.05)
+            os.killpg(killed.pid, signal.SIGKILL)
+            killed.wait()
+            orphaned = count_leases(queue_dir, killed_id)
+
+        reports = []
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker is not killed:
+                if worker.returncode != 0:
+                    raise RuntimeError(f"ワーカーが異常終了しました: 終了コード {worker.returncode}")
+                reports.append(json.loads(output.decode("utf-8").strip().splitlines()[-1]))
+        seconds = time.perf_counter() - start
+
+        done = count_done(queue_dir)
+        # 強制終了したワーカーの成功数は、そのワーカーが書いた完了の記録の数
+        succeeded = sum(report["success"] for report in reports)
+        if killed is not None:
+            succeeded += count_done(queue_dir, killed_id)
+        result = {
+            "processes": processes,
+            "seconds": round(seconds, 2),
+            "documents_per_second": round(files / seconds, 2),
+            "steady_documents_per_second": round(steady_throughput(queue_dir) or 0, 2),
+            "done": done,
+            # 2回以上処理された文書の数（0であること）
+            "duplicates": succeeded - done,
+            "per_worker": [report["success"] for report in reports],
+        }
+        if cache_dir:
+            # 同時に保存しても、ほかのワーカーのエントリが失われないこと（文書数と一致すること）
+            result["cache_entries"] = count_cache_entries(cache_dir)
+        if killed is not None:
+            result["killed_after_seconds"] = kill_after
+            result["orphaned_leases"] = orphaned
+            # 強制終了したワーカーのリースがすべて取り除かれたこと（0であること）
+            result["leases_left"] = count_leases(queue_dir, killed_id)
+        if done != files:
+            raise RuntimeError(f"完了していない文書があります: {done}/{files}件")
+        if cache_dir and killed is None and result["cache_entries"] != files:
+            raise RuntimeError(f"結果キャッシュのエントリが失われました: {result['cache_entries']}/{files}件")
+        return result
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                os.killpg(worker.pid, signal.SIGKILL)
+                worker.wait()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="分散処理のスループットとリースの再取得の確認")
+    parser.add_argument("--files", type=int, default=40, help="合成PDFの数")
+    parser.add_argument("--max-pages", type=int, default=6, help="合成PDFの最大ページ数")
+    parser.add_argument("--processes", default="1,2,4", help="起動するワーカー数（カンマ区切り）")
+    parser.add_argument("--extractor", choices=["pdfplumber", "pdfminer", "auto"], default="pdfminer",
+                        help="抽出方式")
+    parser.add_argument("--simulate-ms", type=float, default=0,
+                        help="PDFを処理せず1文書あたりこの時間だけ待つ（キューだけを計測）")
+    parser.add_argument("--kill-after", type=float, default=0,
+                        help="この秒数後に1つのワーカーを強制終了して、リースの再取得を確かめる（0で行わない）")
+    parser.add_argument("--lease-seconds", type=float, default=6.0, help="リースの期限（秒）")
+    parser.add_argument("--heartbeat-seconds", type=float, default=2.0, help="リースを更新する間隔（秒）")
+    parser.add_argument("--poll-seconds", type=float, default=1.0, help="処理待ちの確認間隔（秒）")
+    parser.add_argument("--shared-cache", action="store_true",
+                        help="全ワーカーで同じ結果キャッシュのフォルダを使う（合成PDFの場合のみ）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    # 以下は子プロセスのワーカー用
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    parser.add_argument("--queue-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_distributed_corpus_")
+    try:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        if args.simulate_ms:
+            # キューだけを計測する場合はPDFの内容を読まない
+            os.makedirs(corpus_dir)
+            for number in range(args.files):
+                with open(os.path.join(corpus_dir, f"doc{number:06d}.pdf"), "wb") as f:
+                    f.write(b"%PDF-1.4\n")
+        else:
+            generate_corpus(corpus_dir, files=args.files, min_pages=1, max_pages=args.max_pages)
+
+        counts = [int(value) for value in args.processes.split(",")]
+        results = [measure(corpus_dir, args.files, count, args) for count in counts]
+        if args.kill_after:
+            results.append(measure(corpus_dir, args.files, max(max(counts), 2), args, args.kill_after))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"files": args.files, "cpus": os.cpu_count(), "simulate_ms": args.simulate_ms,
+              "results": results}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    mode = f"待機 {args.simulate_ms}ms/文書" if args.simulate_ms else f"合成PDF ({args.extractor})"
+    print(f"文書数: {args.files}, {mode}, CPU数: {report['cpus']}")
+    baseline = results[0]["steady_documents_per_second"] if results[0]["processes"] == 1 else None
+    for result in results:
+        scaling = (f" ({result['steady_documents_per_second'] / baseline:.2f}倍)"
+                   if baseline else "")
+        line = (f"{result['processes']}プロセス: {result['seconds']:7.2f}秒 "
+                f"({result['documents_per_second']:.2f} 文書/秒), 起動後の処理 "
+                f"{result['steady_documents_per_second']:8.2f} 文書/秒{scaling}, "
+                f"重複 {result['duplicates']}件, ワーカーごとの件数 {result['per_worker']}")
+        if "cache_entries" in result:
+            line += f", キャッシュのエントリ {result['cache_entries']}件"
+        if "killed_after_seconds" in result:
+            line += (f" / {result['killed_after_seconds']}秒後に1ワーカーを強制終了: "
+                     f"残ったリース {result['orphaned_leases']}件 → 終了時 {result['leases_left']}件")
+        print(line)
+
+if __name__ == "__main__":
+    main()
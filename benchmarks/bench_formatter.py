@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+整形処理のマイクロベンチマーク
+
+合成した日本語コーパスに対し、行ごとに設定を解釈する従来の整形ルール
+(is_bullet_point / insert_line_breaks) と、構築済みの CompiledFormatter
+（従来エンジン・複数行をまとめて処理する fast エンジン）の処理速度（行/秒）を比較する
+
+使用方法:
+    python benchmarks/bench_formatter.py [--lines 200000] [--repeat 3]
+"""
+
+import os
+import sys
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.formatter import (StreamFormatter, CompiledFormatter, is_bullet_point,
+                           insert_line_breaks)
+from src.schema import FormattingSettings
+
+SENTENCES = [
+    "本契約は甲乙間の取引条件を定めるものである。",
+    "第三条に定める期日までに支払うものとする。",
+    "なお、詳細は別紙のとおりとする。",
+    "当社は個人情報を適切に管理します．",
+    "「本書の内容は予告なく変更されることがあります。」",
+    "「質問は担当者まで。回答は後日送付します。」",
+    "システム構成は以下のとおりです。",
+]
+BULLETS = ["・", "●", "■", "◆"]
+
+class LegacyRules(CompiledFormatter):
+    """変更前と同じく、行ごとに設定から記号リスト・改行文字を組み立てるルール"""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.config = config
+
+    def is_bullet_point(self, line):
+        return is_bullet_point(line, self.config)
+
+    def insert_line_breaks(self, text, in_quote):
+        return insert_line_breaks(text, in_quote, self.config)
+
+def generate_corpus(line_count, seed=0):
+    """
+    日本語の合成コーパスを生成
+
+    Args:
+        line_count (int): 行数
+        seed (int): 乱数シード
+
+    Returns:
+        list: 行のリスト
+    """
+    rnd = random.Random(seed)
+    lines = []
+    for _ in range(line_count):
+        roll = rnd.random()
+        if roll < 0.1:
+            lines.append(rnd.choice(BULLETS) + rnd.choice(SENTENCES))
+        elif roll < 0.15:
+            lines.append("")
+        elif roll < 0.2:
+            lines.append("　" + rnd.choice(SENTENCES))
+        else:
+            lines.append(" ".join(rnd.choice(SENTENCES) for _ in range(rnd.randint(1, 3))))
+    return lines
+
+def measure(rules, lines, repeat):
+    """最良の実行時間から行/秒を求める"""
+    best = float("inf")
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = "".join(StreamFormatter(rules).format_lines(lines))
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best, output
+
+def main():
+    parser = argparse.ArgumentParser(description="整形処理のマイクロベンチマーク")
+    parser.add_argument("--lines", type=int, default=200000, help="コーパスの行数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最良値を採用）")
+    args = parser.parse_args()
+
+    config = FormattingSettings(break_at_dot=True, custom_break_chars=["！"]).model_dump()
+    lines = generate_corpus(args.lines)
+
+    before, legacy_output = measure(LegacyRules(config), lines, args.repeat)
+    after, compiled_output = measure(CompiledFormatter(config), lines, args.repeat)
+    fast, fast_output = measure(CompiledFormatter(dict(config, engine="fast")), lines, args.repeat)
+
+    if not legacy_output == compiled_output == fast_output:
+        print("エラー: 整形結果が一致しません")
+        sys.exit(1)
+
+    print(f"行数: {len(lines)}")
+    print(f"従来ルール       : {before:12,.0f} 行/秒")
+    print(f"CompiledFormatter: {after:12,.0f} 行/秒 ({after / before:.2f}倍)")
+    print(f"  engine=fast    : {fast:12,.0f} 行/秒 ({fast / before:.2f}倍)")
+
+if __name__ == "__main__":
+    main()
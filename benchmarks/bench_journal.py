@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+実行記録（journal.jsonl）のオーバーヘッドの計測
+
+1. 合成した処理結果（PDFと出力ファイルは一時フォルダに実際に作成する）を RunJournal に
+   記録し、1件あたりの時間と fsync の回数を計測する。結果キャッシュの値を使える場合
+   （通常の実行）と、PDFの内容のハッシュ値を計算する場合（--no-cache）の両方を計測する
+2. --resume と同じく、記録の読み込み（load_completed）とPDF・出力ファイルの確認
+   （is_completed）にかかる時間を計測する
+
+使用方法:
+    python benchmarks/bench_journal.py [--documents 20000] [--pdf-kb 200] [--sync-documents 100] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.cache import hash_file
+from src.journal import RunJournal, load_completed, is_completed, JOURNAL_FILE
+from src.schema import FileResult
+
+def create_files(work_dir, count, pdf_kb):
+    """PDFに見立てたファイルと出力ファイル（1文書2パート）を作成"""
+    pdf_dir = os.path.join(work_dir, "pdfs")
+    output_dir = os.path.join(work_dir, "outputs")
+    os.makedirs(pdf_dir)
+    os.makedirs(output_dir)
+    payload = os.urandom(pdf_kb * 1024)
+    results = []
+    for number in range(count):
+        pdf_path = os.path.join(pdf_dir, f"doc{number:06d}.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(number.to_bytes(4, "big") + payload)
+        output_paths = []
+        for part in (1, 2):
+            path = os.path.join(output_dir, f"doc{number:06d}_part{part}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"文書{number} パート{part}\n" * 50)
+            output_paths.append(path)
+        results.append(FileResult(pdf_path=pdf_path, success=True, message="",
+                                  output_paths=output_paths))
+    return results
+
+def measure_record(results, journal_path, sync_documents, known_hashes):
+    """全件を記録して1件あたりの時間と fsync の回数を計測"""
+    journal = RunJournal(journal_path, "bench", sync_documents=sync_documents)
+    start = time.perf_counter()
+    for result, known_hash in zip(results, known_hashes):
+        journal.record(result, known_hash)
+    journal.close()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 3),
+        "us_per_document": round(seconds / len(results) * 1e6, 1),
+        "documents_per_second": round(len(results) / seconds, 1),
+        "fsyncs": journal.syncs,
+    }
+
+def measure_resume(results, log_dir):
+    """記録の読み込みと処理済みの確認にかかる時間を計測"""
+    start = time.perf_counter()
+    completed = load_completed("bench", log_dir=log_dir)
+    loaded = time.perf_counter() - start
+    skipped = sum(1 for result in results
+                  if is_completed(completed[os.path.abspath(result.pdf_path)], result.pdf_path))
+    seconds = time.perf_counter() - start
+    return {
+        "load_seconds": round(loaded, 3),
+        "seconds": round(seconds, 3),
+        "us_per_document": round(seconds / len(results) * 1e6, 1),
+        "skipped": skipped,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="実行記録のオーバーヘッドの計測")
+    parser.add_argument("--documents", type=int, default=20000, help="文書数")
+    parser.add_argument("--pdf-kb", type=int, default=200, help="PDFに見立てたファイルのサイズ (KB)")
+    parser.add_argument("--sync-documents", type=int, default=100, help="fsync するまでの件数")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        results = create_files(work_dir, args.documents, args.pdf_kb)
+        # 結果キャッシュに記録済みの値（サイズ・更新日時・ハッシュ値）を用意する
+        cached = []
+        for result in results:
+            stat = os.stat(result.pdf_path)
+            cached.append([stat.st_size, stat.st_mtime_ns, hash_file(result.pdf_path)])
+
+        report = {"documents": args.documents, "pdf_kb": args.pdf_kb}
+        log_dir = os.path.join(work_dir, "log")
+        today = os.path.join(log_dir, time.strftime("%Y%m%d"))
+        report["record_cached"] = measure_record(
+            results, os.path.join(today, JOURNAL_FILE), args.sync_documents, cached)
+        report["record_hashed"] = measure_record(
+            results, os.path.join(work_dir, "hashed", JOURNAL_FILE), args.sync_documents,
+            [None] * len(results))
+        report["resume"] = measure_resume(results, log_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"文書数: {report['documents']} (PDF {report['pdf_kb']}KB, 出力2パート/文書)")
+    for key, label in (("record_cached", "記録 (キャッシュの値)"), ("record_hashed", "記録 (ハッシュ計算)")):
+        measured = report[key]
+        print(f"{label}: {measured['us_per_document']:8.1f} µs/文書 "
+              f"({measured['documents_per_second']:,.0f} 文書/秒), fsync {measured['fsyncs']}回")
+    resume = report["resume"]
+    print(f"再開時の確認: 読み込み {resume['load_seconds']}秒, 合計 {resume['seconds']}秒 "
+          f"({resume['us_per_document']} µs/文書), 処理済み {resume['skipped']}件")
+
+if __name__ == "__main__":
+    main()
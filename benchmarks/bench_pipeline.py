@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+処理パイプラインのベンチマーク
+
+合成PDFコーパス（benchmarks/corpus.py）に対し、抽出・整形・分割・保存の各段階と
+全体（process_files）の処理時間を計測し、ファイル/秒・ページ/秒・MB/秒・最大RSSを
+JSONで出力する。各段階は新しいプロセスで実行するため、最大RSSは段階ごとの値になる。
+--baseline を指定した場合は保存済みの結果と比較し、しきい値を超えて遅くなった
+段階があれば終了コード1で終了する。抽出を計測する場合は、抽出方式ごとの抽出の
+処理時間と抽出した文字数も extractors に出力する（speedup は pdfplumber との比）
+
+MB/秒 は抽出と全体ではPDFのバイト数、それ以外は入力テキストのUTF-8バイト数から求める。
+ログ出力のコストは計測に含めない（警告以上のみ表示）
+
+使用方法:
+    python benchmarks/bench_pipeline.py [--files 20] [--max-pages 30] [--workers 1]
+        [--extractor pdfplumber] [--output 結果.json] [--baseline 基準.json] [--threshold 0.15]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_corpus
+
+STAGES = ["extraction", "formatting", "splitting", "saving", "end_to_end"]
+EXTRACTORS = ["pdfplumber", "pdfminer", "auto"]
+
+def peak_rss_mb():
+    """
+    このプロセスと終了した子プロセスの最大RSS（MB）
+
+    Returns:
+        float | None: 最大RSS（resource モジュールがない環境ではNone）
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Linux は KB、macOS はバイト単位
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * unit / (1024 * 1024), 1)
+
+def _quiet_logger():
+    """ログ出力を警告以上・標準エラーのみにする"""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+def _best_time(func, repeat):
+    """最良の実行時間（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _read_texts(folder):
+    """フォルダ内の .txt をファイル名順に読み込む"""
+    texts = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), "r", encoding="utf-8", newline="") as f:
+            texts.append(f.read())
+    return texts
+
+def _write_texts(folder, names, texts):
+    """テキストを .txt として保存（次の段階の入力）"""
+    os.makedirs(folder, exist_ok=True)
+    for name, text in zip(names, texts):
+        with open(os.path.join(folder, name + ".txt"), "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+
+def run_stage(stage, corpus_dir, work_dir, split_mode, workers, repeat, extractor="pdfplumber"):
+    """
+    1段階を計測（新しいプロセスで呼び出す）
+
+    抽出・整形の結果は work_dir に保存し、次の段階の入力にする
+
+    Args:
+        stage (str): 段階名（STAGES のいずれか）
+        corpus_dir (str): コーパスのフォルダ
+        work_dir (str): 作業フォルダ
+        split_mode (str): 分割モード
+        workers (int): 全体の計測に使う並列ワーカー数
+        repeat (int): 計測回数（最良値を採用）
+        extractor (str, optional): 抽出と全体の計測に使う抽出方式
+
+    Returns:
+        dict: 秒数・入力バイト数・最大RSS（抽出では抽出した文字数も）
+    """
+    from src.batch import process_files
+    from src.formatter import StreamFormatter, CompiledFormatter
+    from src.schema import SplitMode
+    from src.settings import load_settings
+    from src.splitter import TextSplitter
+    from src.utils import iter_pdf_pages, split_text, save_text_stream, get_output_path
+    # 各モジュールの読み込み時に設定されたログ出力を置き換える
+    _quiet_logger()
+
+    settings = load_settings()
+    # 区切り位置・分割数・サイズは設定ファイルの [split] に従う
+    split_mode = TextSplitter.from_settings(SplitMode(split_mode), settings)
+    pdf_files = [os.path.join(corpus_dir, name)
+                 for name in sorted(os.listdir(corpus_dir)) if name.endswith(".pdf")]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in pdf_files]
+    raw_dir = os.path.join(work_dir, "raw")
+    formatted_dir = os.path.join(work_dir, "formatted")
+    output_dir = os.path.join(work_dir, "outputs")
+    input_bytes = sum(os.path.getsize(path) for path in pdf_files)
+    measured = {}
+
+    if stage == "extraction":
+        texts = []
+
+        def extract():
+            texts[:] = ["".join(iter_pdf_pages(path, extractor=extractor)) for path in pdf_files]
+
+        seconds = _best_time(extract, repeat)
+        _write_texts(raw_dir, names, texts)
+        measured["chars"] = sum(len(text) for text in texts)
+
+    elif stage == "formatting":
+        texts = _read_texts(raw_dir)
+        input_bytes = sum(len(text.encode("utf-8")) for text in texts)
+        formatter = CompiledFormatter(settings.formatting)
+        formatted = []
+
+        def format_all():
+            formatted[:] = ["".join(StreamFormatter(formatter).format_lines(text.splitlines()))
+                            for text in texts]
+
+        seconds = _best_time(format_all, repeat)
+        _write_texts(formatted_dir, names, formatted)
+
+    elif stage == "splitting":
+        texts = _read_texts(formatted_dir)
+        input_bytes = sum(len(text.encode("utf-8")) for text in texts)
+        seconds = _best_time(lambda: [split_text(text, split_mode) for text in texts], repeat)
+
+    elif stage == "saving":
+        texts = _read_texts(formatted_dir)
+        input_bytes = sum(len(text.encode("utf-8")) for text in texts)
+
+        def save_all():
+            for name, text in zip(names, texts):
+                save_text_stream([text], lambda part, name=name: get_output_path(
+                    name, "bench", part, output_dir), split_mode)
+
+        seconds = _best_time(save_all, repeat)
+
+    elif stage == "end_to_end":
+        e2e_settings = settings.model_copy(update={
+            "output_dir": output_dir,
+            "extraction": settings.extraction.model_copy(update={"extractor": extractor}),
+        })
+
+        def run_all():
+            _, error_count = process_files(pdf_files, split_mode, workers, use_cache=False,
+                                           settings=e2e_settings)
+            if error_count:
+                raise RuntimeError(f"処理に失敗したファイルがあります: {error_count}件")
+
+        seconds = _best_time(run_all, repeat)
+
+    else:
+        raise ValueError(f"不明な段階です: {stage}")
+
+    measured.update(seconds=seconds, input_bytes=input_bytes, peak_rss_mb=peak_rss_mb())
+    return measured
+
+def _measure(corpus, stage, *args):
+    """新しいプロセスで1段階を計測し、処理速度を求める"""
+    # 段階ごとに新しいプロセスで実行し、最大RSSを分ける
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        measured = executor.submit(run_stage, stage, *args).result()
+
+    seconds = measured["seconds"]
+    result = {
+        "seconds": round(seconds, 4),
+        "files_per_s": round(corpus["file_count"] / seconds, 2),
+        "pages_per_s": round(corpus["page_count"] / seconds, 2),
+        "mb_per_s": round(measured["input_bytes"] / 1e6 / seconds, 3),
+        "peak_rss_mb": measured["peak_rss_mb"],
+    }
+    if "chars" in measured:
+        result["chars"] = measured["chars"]
+    return result
+
+def run_benchmark(corpus, corpus_dir, split_mode="half", workers=1, repeat=3, stages=None,
+                  extractor="pdfplumber"):
+    """
+    全段階を計測
+
+    Args:
+        corpus (dict): generate_corpus() の結果
+        corpus_dir (str): コーパスのフォルダ
+        split_mode (str, optional): 分割モード
+        workers (int, optional): 全体の計測に使う並列ワーカー数
+        repeat (int, optional): 計測回数（最良値を採用）
+        stages (list, optional): 計測する段階（指定しない場合はすべて）
+        extractor (str, optional): 抽出と全体の計測に使う抽出方式
+
+    Returns:
+        dict: 段階名 -> 計測結果
+    """
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    try:
+        for stage in stages or STAGES:
+            results[stage] = _measure(corpus, stage, corpus_dir, work_dir, split_mode, workers,
+                                      repeat, extractor)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def compare_extractors(corpus, corpus_dir, repeat=3):
+    """
+    抽出方式ごとに抽出を計測
+
+    Args:
+        corpus (dict): generate_corpus() の結果
+        corpus_dir (str): コーパスのフォルダ
+        repeat (int, optional): 計測回数（最良値を採用）
+
+    Returns:
+        dict: 抽出方式 -> 計測結果（speedup は pdfplumber の処理時間との比）
+    """
+    results = {}
+    for extractor in EXTRACTORS:
+        work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+        try:
+            results[extractor] = _measure(corpus, "extraction", corpus_dir, work_dir, "full", 1,
+                                          repeat, extractor)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    base = results["pdfplumber"]["seconds"]
+    for result in results.values():
+        result["speedup"] = round(base / result["seconds"], 2)
+    return results
+
+def compare_baseline(report, baseline, threshold):
+    """
+    基準の結果と比較
+
+    Args:
+        report (dict): 今回の結果
+        baseline (dict): 基準の結果
+        threshold (float): 許容する処理時間の増加率（0.15なら15%）
+
+    Returns:
+        list: しきい値を超えて遅くなった段階の説明
+    """
+    if baseline.get("corpus", {}).get("params") != report["corpus"]["params"]:
+        print("警告: 基準とコーパスの生成条件が異なります", file=sys.stderr)
+    for key in ("split_mode", "workers", "extractor"):
+        if baseline.get(key) != report[key]:
+            print(f"警告: 基準と {key} が異なります ({baseline.get(key)} → {report[key]})",
+                  file=sys.stderr)
+
+    regressions = []
+    for stage, result in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        print(f"{stage:<12}: {base['seconds']:8.3f}秒 → {result['seconds']:8.3f}秒 ({ratio:.2f}倍)",
+              file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(f"{stage}: {ratio:.2f}倍 (許容 {1 + threshold:.2f}倍)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="処理パイプラインのベンチマーク")
+    parser.add_argument("--corpus-dir", help="コーパスのフォルダ（指定しない場合は一時フォルダ）")
+    parser.add_argument("--files", type=int, default=20, help="ファイル数")
+    parser.add_argument("--min-pages", type=int, default=1, help="1ファイルの最小ページ数")
+    parser.add_argument("--max-pages", type=int, default=30, help="1ファイルの最大ページ数")
+    parser.add_argument("--english-ratio", type=float, default=0.2, help="英語の段落の割合")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--split", choices=["full", "half", "third", "parts", "size"], default="half",
+                        help="分割モード")
+    parser.add_argument("--workers", type=int, default=1, help="全体の計測に使う並列ワーカー数")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="pdfplumber",
+                        help="抽出と全体の計測に使う抽出方式")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最良値を採用）")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="計測する段階")
+    parser.add_argument("--output", help="結果のJSONの保存先（指定しない場合は標準出力）")
+    parser.add_argument("--baseline", help="比較する基準の結果のJSON")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="許容する処理時間の増加率（0.15なら15%%）")
+    args = parser.parse_args()
+
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), "pdf_bench_corpus")
+    corpus = generate_corpus(corpus_dir, args.files, args.min_pages, args.max_pages,
+                             args.english_ratio, args.seed)
+
+    report = {
+        "corpus": {key: corpus[key] for key in ("params", "file_count", "page_count", "total_bytes")},
+        "split_mode": args.split,
+        "workers": args.workers,
+        "extractor": args.extractor,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": run_benchmark(corpus, corpus_dir, args.split, args.workers, args.repeat,
+                                args.stages, args.extractor),
+    }
+    if "extraction" in (args.stages or STAGES):
+        report["extractors"] = compare_extractors(corpus, corpus_dir, args.repeat)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(report, baseline, args.threshold)
+        if regressions:
+            print("性能が低下しました: " + ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+全文検索の索引のベンチマーク
+
+1. 合成した整形済みテキストを出力ファイルとして書き出し、SearchIndexer で索引に追加する
+   速度（文書/秒）と索引のサイズを計測する
+2. 文書から取り出した検索語で、索引を使った検索（SearchIndex.search）と、すべての出力
+   ファイルを読んで行ごとに探す場合（grep 相当）の応答時間を比較する
+3. 合成PDFコーパスを process_files で処理し、[search] enabled の有無で全体の処理時間を
+   比較して、索引の追加による処理時間の増加率を求める（--pdf-files 0 で省略）
+
+使用方法:
+    python benchmarks/bench_search.py [--documents 20000] [--pages 2] [--queries 20]
+        [--pdf-files 20] [--extractor pdfminer] [--repeat 3] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.bench_store import generate_documents
+from src.search import SearchIndex, SearchIndexer, normalize
+from src.utils import get_output_path, save_text
+
+def _quiet_logger():
+    """ログ出力を警告以上・標準エラーのみにする"""
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+def add_unique_lines(documents, seed=0):
+    """
+    各文書に固有の行（ランダムな漢字の管理番号）を加える
+
+    合成コーパスの文は少数の文の組み合わせで、どの検索語もほぼすべての文書に現れるため、
+    少数の文書にしか現れない検索語を作れるようにする
+    """
+    rnd = random.Random(seed)
+    for number, text in enumerate(documents):
+        codes = ["".join(chr(rnd.randint(0x4E00, 0x9FFF)) for _ in range(8)) for _ in range(3)]
+        documents[number] = text + "".join(f"管理番号{code}に関する条項は別紙による。\n"
+                                           for code in codes)
+    return documents
+
+def build_index(documents, work_dir):
+    """文書を出力ファイルに書き出し、1文書ずつ索引に追加して計測"""
+    output_dir = os.path.join(work_dir, "outputs")
+    paths = []
+    for number, text in enumerate(documents):
+        path = get_output_path(f"doc{number:06d}", "20260101", None, output_dir)
+        save_text(text, path)
+        paths.append(path)
+
+    index = SearchIndex(os.path.join(work_dir, "search_index.sqlite3"))
+    start = time.perf_counter()
+    indexer = SearchIndexer(index)
+    for path in paths:
+        indexer.add(path, [path])
+    indexer.close()
+    seconds = time.perf_counter() - start
+    return index, paths, seconds
+
+def pick_queries(documents, count, rare, seed=0):
+    """
+    文書の行から検索語を取り出す
+
+    rare なら固有の行から4文字（ほぼ1文書にだけ現れる）、そうでなければ
+    ほかの行から2〜8文字（多くの文書に現れる）を取り出す
+    """
+    rnd = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        lines = [line for line in rnd.choice(documents).split("\n")
+                 if len(line) >= 8 and line.startswith("管理番号") == rare]
+        if not lines:
+            continue
+        line = rnd.choice(lines)
+        if rare:
+            start = rnd.randrange(4, 9)
+            query = line[start:start + 4]
+        else:
+            length = rnd.randint(2, 8)
+            start = rnd.randrange(len(line) - length + 1)
+            query = line[start:start + length].strip()
+        if len(query) >= 2:
+            queries.append(query)
+    return queries
+
+def scan_files(paths, query, limit):
+    """すべての出力ファイルを読んで行ごとに探す（索引を使わない場合）"""
+    term = normalize(query)
+    hits = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if term in normalize(line):
+                    hits += 1
+                    if hits >= limit:
+                        return hits
+    return hits
+
+def measure_queries(index, paths, queries, limit, scan_queries):
+    """索引を使った検索と全件走査の応答時間（ミリ秒）"""
+    index_ms = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit)
+        index_ms.append((time.perf_counter() - start) * 1000)
+
+    # 全件走査は遅いため、先頭の scan_queries 件だけ計測する
+    scan_ms = []
+    for query in queries[:scan_queries]:
+        start = time.perf_counter()
+        scan_files(paths, query, limit)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+
+    index_ms.sort()
+    return {
+        "queries": len(queries),
+        "index_median_ms": round(statistics.median(index_ms), 2),
+        "index_p95_ms": round(index_ms[int(len(index_ms) * 0.95) - 1 if len(index_ms) > 1 else 0], 2),
+        "index_max_ms": round(index_ms[-1], 2),
+        "scan_median_ms": round(statistics.median(scan_ms), 1) if scan_ms else None,
+    }
+
+def measure_pipeline(pdf_files, work_dir, extractor, repeat):
+    """[search] enabled の有無で process_files の処理時間を比較"""
+    from src.batch import process_files
+    from src.settings import load_settings
+    from src.schema import SplitMode
+
+    settings = load_settings()
+    best = {False: float("inf"), True: float("inf")}
+    # 有効・無効を交互に実行して、実行順による差を抑える
+    for _ in range(repeat):
+        for enabled in (False, True):
+            run_dir = tempfile.mkdtemp(dir=work_dir)
+            run_settings = settings.model_copy(update={
+                "output_dir": os.path.join(run_dir, "outputs"),
+                "extraction": settings.extraction.model_copy(update={"extractor": extractor}),
+                "search": settings.search.model_copy(update={
+                    "enabled": enabled, "index_file": os.path.join(run_dir, "search_index.sqlite3")}),
+            })
+            start = time.perf_counter()
+            _, error_count = process_files(pdf_files, SplitMode.HALF, 1, use_cache=False,
+                                           settings=run_settings)
+            best[enabled] = min(best[enabled], time.perf_counter() - start)
+            if error_count:
+                raise RuntimeError(f"処理に失敗したファイルがあります: {error_count}件")
+            shutil.rmtree(run_dir, ignore_errors=True)
+    return {
+        "files": len(pdf_files),
+        "extractor": extractor,
+        "without_index_seconds": round(best[False], 3),
+        "with_index_seconds": round(best[True], 3),
+        "overhead_percent": round((best[True] / best[False] - 1) * 100, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="全文検索の索引のベンチマーク")
+    parser.add_argument("--documents", type=int, default=20000, help="索引に追加する文書数")
+    parser.add_argument("--pages", type=int, default=2, help="1文書あたりのページ数")
+    parser.add_argument("--queries", type=int, default=20, help="検索語の数")
+    parser.add_argument("--scan-queries", type=int, default=3, help="全件走査で計測する検索語の数")
+    parser.add_argument("--limit", type=int, default=100, help="1回の検索で返す行数の上限")
+    parser.add_argument("--pdf-files", type=int, default=20,
+                        help="処理時間の増加率の計測に使うPDFの数（0で計測しない）")
+    parser.add_argument("--extractor", choices=["pdfplumber", "pdfminer", "auto"], default="pdfminer",
+                        help="処理時間の計測に使う抽出方式")
+    parser.add_argument("--repeat", type=int, default=3, help="処理時間の計測回数（最良値を採用）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    _quiet_logger()
+    work_dir = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        documents = add_unique_lines(generate_documents(args.documents, args.pages))
+        index, paths, build_seconds = build_index(documents, work_dir)
+        info = index.info()
+        text_mb = sum(len(text.encode("utf-8")) for text in documents) / (1024 * 1024)
+        report = {
+            "index": {
+                "documents": len(documents),
+                "text_mb": round(text_mb, 1),
+                "seconds": round(build_seconds, 2),
+                "documents_per_second": round(len(documents) / build_seconds, 1),
+                "index_mb": round(info["size_bytes"] / (1024 * 1024), 1),
+                "segments": info["segments"],
+            },
+            "rare": measure_queries(index, paths, pick_queries(documents, args.queries, True),
+                                    args.limit, args.scan_queries),
+            "common": measure_queries(index, paths, pick_queries(documents, args.queries, False),
+                                      args.limit, args.scan_queries),
+        }
+        index.close()
+
+        if args.pdf_files:
+            corpus_dir = os.path.join(work_dir, "corpus")
+            generate_corpus(corpus_dir, files=args.pdf_files)
+            pdf_files = sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+                               if name.endswith(".pdf"))
+            report["pipeline"] = measure_pipeline(pdf_files, work_dir, args.extractor, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    built = report["index"]
+    print(f"索引の追加: {built['documents']}文書 ({built['text_mb']}MB) を {built['seconds']}秒 "
+          f"({built['documents_per_second']:,.0f} 文書/秒), 索引 {built['index_mb']}MB, "
+          f"セグメント {built['segments']}件")
+    for key, label in (("rare", "少数の文書に現れる語"), ("common", "多くの文書に現れる語")):
+        found = report[key]
+        print(f"検索 ({label}, {found['queries']}語): 索引 中央値 {found['index_median_ms']}ms, "
+              f"p95 {found['index_p95_ms']}ms, 最大 {found['index_max_ms']}ms / "
+              f"全件走査 中央値 {found['scan_median_ms']}ms")
+    if "pipeline" in report:
+        pipeline = report["pipeline"]
+        print(f"処理時間 ({pipeline['files']}ファイル, {pipeline['extractor']}): "
+              f"索引なし {pipeline['without_index_seconds']}秒, "
+              f"索引あり {pipeline['with_index_seconds']}秒 ({pipeline['overhead_percent']:+.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CLI起動時の読み込み時間のベンチマーク
+
+新しいプロセスで `python -X importtime -c "import main"` を繰り返し実行し、
+main.py の読み込みにかかった時間（最良値）をJSONで出力する。main.py は並列処理の
+ワーカープロセスでも読み込まれるため、ここが遅いと小さなジョブでは処理時間の
+大半を占める。GUI・PDF抽出・プロファイル用のモジュールが読み込まれていた場合や、
+読み込み時間が --budget-ms を超えた場合は終了コード1で終了する
+
+使用方法:
+    python benchmarks/bench_startup.py [--budget-ms 500] [--repeat 5] [--output 結果.json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# CLIの起動時に読み込んではいけないモジュール（実際に使うときに読み込む）
+DEFERRED_MODULES = [
+    "PySimpleGUI",
+    "tkinter",
+    "pdfplumber",
+    "pdfminer",
+    "PIL",
+    "cProfile",
+    "pstats",
+    "concurrent.futures.process",
+]
+
+def measure_import(module="main"):
+    """
+    新しいプロセスでモジュールを読み込み、-X importtime の結果を集計
+
+    Args:
+        module (str, optional): 読み込むモジュール
+
+    Returns:
+        tuple: (読み込み時間(ms), {モジュール名: (自身の時間(ms), 累積時間(ms))})
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT_DIR, capture_output=True, text=True, encoding="utf-8",
+                               errors="replace")
+    if completed.returncode != 0:
+        raise RuntimeError(f"{module} の読み込みに失敗しました:\n{completed.stderr}")
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        modules[fields[2].strip()] = (int(fields[0]) / 1000, int(fields[1]) / 1000)
+    return modules[module][1], modules
+
+def find_deferred(modules):
+    """
+    読み込まれていた DEFERRED_MODULES（サブモジュールを含む）
+
+    Args:
+        modules (dict): measure_import() の結果のモジュール一覧
+
+    Returns:
+        list: 読み込まれていたモジュール名
+    """
+    return sorted(name for name in modules
+                  if any(name == deferred or name.startswith(deferred + ".")
+                         for deferred in DEFERRED_MODULES))
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI起動時の読み込み時間のベンチマーク")
+    parser.add_argument("--module", default="main", help="読み込むモジュール")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最良値を採用）")
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="許容する読み込み時間（ミリ秒）")
+    parser.add_argument("--top", type=int, default=10, help="出力する時間のかかったモジュールの数")
+    parser.add_argument("--output", help="結果のJSONの保存先（指定しない場合は標準出力）")
+    args = parser.parse_args()
+
+    # 1回目は .pyc の作成を含むため計測に使わない
+    measure_import(args.module)
+    best_ms, best_modules = None, None
+    for _ in range(max(1, args.repeat)):
+        import_ms, modules = measure_import(args.module)
+        if best_ms is None or import_ms < best_ms:
+            best_ms, best_modules = import_ms, modules
+
+    deferred = find_deferred(best_modules)
+    slowest = sorted(best_modules.items(), key=lambda item: -item[1][0])[:args.top]
+    report = {
+        "module": args.module,
+        "import_ms": round(best_ms, 1),
+        "budget_ms": args.budget_ms,
+        "module_count": len(best_modules),
+        "deferred_loaded": deferred,
+        "slowest": [{"module": name, "self_ms": round(self_ms, 1),
+                     "cumulative_ms": round(cumulative_ms, 1)}
+                    for name, (self_ms, cumulative_ms) in slowest],
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    failed = False
+    if deferred:
+        print("起動時に読み込まれたモジュールがあります: " + ", ".join(deferred), file=sys.stderr)
+        failed = True
+    if best_ms > args.budget_ms:
+        print(f"起動時の読み込みが遅くなりました: {best_ms:.1f}ms (許容 {args.budget_ms:.0f}ms)",
+              file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
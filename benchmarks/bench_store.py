@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+出力先（[output] sink）ごとの書き出しスループットの計測
+
+合成した整形済みテキストを OutputWriter から出力先に書き出し、従来の1パート1ファイルの
+出力 (files) と、JSONL シャード (jsonl) ・SQLite (sqlite) にまとめる出力とで、
+文書/秒・MB/秒・作成されたファイル数・ディスク上のサイズを比較する。
+zstd は zstandard パッケージがインストールされている場合のみ計測する
+
+使用方法:
+    python benchmarks/bench_store.py [--documents 5000] [--pages 2] [--split full] [--repeat 3] [--json]
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_pages
+from src.schema import OutputSettings, SplitMode
+from src.store import open_output_store
+from src.utils import get_output_path
+from src.writer import OutputWriter
+
+def generate_documents(count, pages, seed=0):
+    """整形済みテキストに見立てた文書を生成"""
+    rnd = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        lines = [line for page in generate_pages(rnd, pages, 0.2) for _, line in page]
+        documents.append("\n".join(lines) + "\n")
+    return documents
+
+def disk_usage(root):
+    """フォルダ内のファイル数と合計サイズ"""
+    files = 0
+    size = 0
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            files += 1
+            size += os.path.getsize(os.path.join(dir_path, file_name))
+    return files, size
+
+def measure(sink, compression, documents, split_mode, max_jobs):
+    """1つの出力先に全文書を書き出して計測"""
+    work_dir = tempfile.mkdtemp(prefix="bench_store_")
+    try:
+        output_dir = os.path.join(work_dir, "outputs")
+        os.makedirs(output_dir)
+        store = open_output_store(OutputSettings(sink=sink, compression=compression), output_dir)
+        writer = OutputWriter(max_jobs=max_jobs)
+
+        start = time.perf_counter()
+        futures = []
+        for index, text in enumerate(documents):
+            def get_path(part, name=f"doc{index:06d}"):
+                return get_output_path(name, "20260101", part, output_dir,
+                                       create_dir=store is None)
+            futures.append(writer.write([text], get_path, split_mode, store=store))
+        parts = sum(len(future.result()) for future in futures)
+        if store is not None:
+            store.commit()
+        seconds = time.perf_counter() - start
+
+        files, size = disk_usage(output_dir)
+        text_mb = sum(len(text.encode("utf-8")) for text in documents) / (1024 * 1024)
+        return {
+            "sink": sink if sink != "jsonl" else f"jsonl-{compression}",
+            "seconds": round(seconds, 3),
+            "documents_per_second": round(len(documents) / seconds, 1),
+            "mb_per_second": round(text_mb / seconds, 2),
+            "parts": parts,
+            "files": files,
+            "disk_mb": round(size / (1024 * 1024), 2),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="出力先ごとの書き出しスループットの計測")
+    parser.add_argument("--documents", type=int, default=5000, help="文書数")
+    parser.add_argument("--pages", type=int, default=2, help="1文書あたりのページ数")
+    parser.add_argument("--split", choices=[mode.value for mode in SplitMode], default="full",
+                        help="分割モード")
+    parser.add_argument("--max-jobs", type=int, default=2,
+                        help="書き出し待ちにできる文書数（パイプラインと同じ既定値は2）")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最良値を採用）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    documents = generate_documents(args.documents, args.pages)
+    sinks = [("files", "gzip"), ("jsonl", "gzip"), ("sqlite", "gzip")]
+    try:
+        import zstandard  # noqa: F401
+        sinks.insert(2, ("jsonl", "zstd"))
+    except ImportError:
+        pass
+
+    results = []
+    for sink, compression in sinks:
+        runs = [measure(sink, compression, documents, SplitMode(args.split), args.max_jobs)
+                for _ in range(args.repeat)]
+        results.append(min(runs, key=lambda run: run["seconds"]))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    baseline = results[0]["seconds"]
+    print(f"文書数: {args.documents} ({args.pages}ページ/文書, split={args.split})")
+    for result in results:
+        print(f"{result['sink']:<11}: {result['documents_per_second']:9,.1f} 文書/秒 "
+              f"{result['mb_per_second']:7.2f} MB/秒 ({baseline / result['seconds']:.2f}倍) "
+              f"ファイル数 {result['files']:6d}  ディスク {result['disk_mb']:8.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+改行挿入エンジンの差分検証
+
+engine = "fast"（「」内の1回の走査での置換と、複数行をまとめた空白の削除・改行の挿入）が、
+従来の insert_line_breaks・1行ずつの整形と同じ結果になることを、ランダムな設定・ランダムな行
+（まとめる行数もランダムに変える）と、実際のPDF／テキストファイルで確認する
+
+使用方法:
+    python benchmarks/check_engines.py [--cases 200] [--lines 500] [--input フォルダ]
+"""
+
+import os
+import sys
+import glob
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import formatter
+from src.formatter import StreamFormatter, CompiledFormatter, insert_line_breaks
+from src.schema import FormattingSettings
+
+# 改行・「」・英文処理の境界になりやすい文字を多めに含める
+ALPHABET = list("。。．！？.」」「「 　\tABCabc本文契約。") + ["\n", formatter.BULK_SEPARATOR]
+CUSTOM_BREAK_CHOICES = ["！", "？", ".", "A", "」", " ", "。", "！？", ""]
+
+def random_config(rnd):
+    """
+    ランダムな整形設定を生成
+
+    Args:
+        rnd (random.Random): 乱数生成器
+
+    Returns:
+        dict: 整形設定
+    """
+    return FormattingSettings(
+        break_at_kuten=rnd.random() < 0.8,
+        break_at_dot=rnd.random() < 0.5,
+        paragraph_break=rnd.random() < 0.3,
+        english_mode=rnd.random() < 0.5,
+        quote_break_inside=rnd.random() < 0.5,
+        add_closing_quote=rnd.random() < 0.8,
+        remove_tab=rnd.random() < 0.5,
+        remove_space=rnd.random() < 0.5,
+        custom_break_chars=rnd.sample(CUSTOM_BREAK_CHOICES, rnd.randint(0, 3)),
+    ).model_dump()
+
+def random_line(rnd):
+    """ランダムな1行を生成"""
+    return "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 30)))
+
+def load_real_lines(folder):
+    """
+    フォルダ内のPDF・テキストファイルから行を読み込む
+
+    Args:
+        folder (str): PDFまたは .txt を含むフォルダ
+
+    Returns:
+        list: 行のリスト
+    """
+    lines = []
+    for txt_file in sorted(glob.glob(os.path.join(folder, "*.txt"))):
+        with open(txt_file, "r", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+
+    pdf_files = sorted(glob.glob(os.path.join(folder, "*.pdf")))
+    if pdf_files:
+        from src.utils import iter_pdf_pages
+        for pdf_file in pdf_files:
+            for page in iter_pdf_pages(pdf_file):
+                lines.extend(page.splitlines())
+    return lines
+
+def compare(config, lines, bulk_lines=formatter.BULK_LINES):
+    """
+    同じ設定で従来エンジンと fast エンジンの結果を比較
+
+    Args:
+        config (dict): 整形設定
+        lines (list): 入力行
+        bulk_lines (int): fast エンジンで一度にまとめる行数
+
+    Returns:
+        str | None: 不一致の説明（一致した場合はNone）
+    """
+    legacy = CompiledFormatter(dict(config, engine="legacy"))
+    fast = CompiledFormatter(dict(config, engine="fast"))
+
+    # 行単位（改行を含む入力も含めて）
+    for line in lines:
+        for in_quote in (False, True):
+            expected = insert_line_breaks(line, in_quote, config)
+            actual = fast.insert_line_breaks(line, in_quote)
+            if expected != actual:
+                return f"insert_line_breaks({line!r}, in_quote={in_quote}): {expected!r} != {actual!r}"
+
+    # 文書全体（まとめる行数の区切りで状態が引き継がれることも確かめる）
+    expected = "".join(StreamFormatter(legacy).format_lines(lines))
+    default_bulk_lines = formatter.BULK_LINES
+    formatter.BULK_LINES = bulk_lines
+    try:
+        actual = "".join(StreamFormatter(fast).format_lines(lines))
+    finally:
+        formatter.BULK_LINES = default_bulk_lines
+    if expected != actual:
+        return "StreamFormatter の出力が一致しません"
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="改行挿入エンジンの差分検証")
+    parser.add_argument("--cases", type=int, default=200, help="ランダムな設定の数")
+    parser.add_argument("--lines", type=int, default=500, help="1設定あたりのランダムな行数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--input", help="実データ（PDF・.txt）を含むフォルダ")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    real_lines = load_real_lines(args.input) if args.input else []
+
+    failures = 0
+    for case in range(args.cases):
+        config = random_config(rnd)
+        lines = [random_line(rnd) for _ in range(args.lines)] + real_lines
+        error = compare(config, lines, rnd.choice([1, 7, 64, formatter.BULK_LINES]))
+        if error:
+            failures += 1
+            print(f"不一致 (case {case}): {error}")
+            print(f"  設定: {config}")
+
+    print(f"検証: {args.cases}設定, 実データ {len(real_lines)}行, 不一致 {failures}件")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
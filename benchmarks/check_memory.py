@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+抽出時のメモリ使用量の検証
+
+ページ数の異なる合成PDFを新しいプロセスで抽出し、抽出中のRSSの増加量（抽出前からの
+最大値）が、ページ数を増やしてもほぼ一定であることを確認する。通常の抽出（解析済みの
+ページを1ページずつ破棄）と省メモリ抽出（ページ範囲ごとにPDFを開き直す）の両方を調べ、
+最小ページ数と最大ページ数のRSSの増加量の差が --tolerance-mb を超えた場合は終了コード1で終了する
+
+使用方法:
+    python benchmarks/check_memory.py [--pages 100 800] [--extractor pdfplumber] [--tolerance-mb 32]
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_pages, build_pdf
+
+# 抽出時間を短くするため、1ページあたりの行数を減らす
+LINES_PER_PAGE = 12
+
+def measure_extraction(pdf_path, extractor, memory_limit_mb, window_pages):
+    """
+    PDFを抽出し、抽出中のRSSの増加量を計測（新しいプロセスで呼び出す）
+
+    Args:
+        pdf_path (str): PDFファイルのパス
+        extractor (str): 抽出方式の名前
+        memory_limit_mb (int | None): 省メモリ抽出に切り替えるRSS（0なら最初から省メモリ抽出）
+        window_pages (int): 省メモリ抽出で一度に開くページ数
+
+    Returns:
+        tuple: (RSSの増加量(MB), 抽出したページ数)
+    """
+    from src.metrics import get_rss_mb
+    from src.utils import iter_pdf_pages
+    from src.extractor import get_extractor
+    # PDFライブラリの読み込み分を計測に含めない
+    list(get_extractor(extractor).iter_pages(pdf_path, 0, 1))
+
+    before = get_rss_mb()
+    peak = before
+    pages = 0
+    for _ in iter_pdf_pages(pdf_path, extractor=extractor, memory_limit_mb=memory_limit_mb,
+                            window_pages=window_pages):
+        peak = max(peak, get_rss_mb())
+        pages += 1
+    return peak - before, pages
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出時のメモリ使用量の検証")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 800],
+                        help="検証するページ数（2つ以上）")
+    parser.add_argument("--extractor", choices=["pdfplumber", "pdfminer", "auto"],
+                        default="pdfplumber", help="抽出方式")
+    parser.add_argument("--window", type=int, default=50, help="省メモリ抽出で一度に開くページ数")
+    parser.add_argument("--tolerance-mb", type=float, default=32.0,
+                        help="最小ページ数と最大ページ数で許容するRSSの増加量の差（MB）")
+    args = parser.parse_args()
+
+    if len(args.pages) < 2:
+        parser.error("--pages には2つ以上のページ数を指定してください")
+
+    from src.metrics import get_rss_mb
+    if get_rss_mb() is None:
+        print("この環境ではRSSを取得できないため検証できません", file=sys.stderr)
+        sys.exit(1)
+
+    page_counts = sorted(args.pages)
+    modes = [("通常", None), ("省メモリ", 0)]
+    failed = False
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="pdf_memory_") as work_dir:
+        pdf_paths = {}
+        for page_count in page_counts:
+            pages = generate_pages(random.Random(page_count), page_count, 0.2)
+            pdf_paths[page_count] = os.path.join(work_dir, f"pages{page_count}.pdf")
+            with open(pdf_paths[page_count], "wb") as f:
+                f.write(build_pdf([lines[:LINES_PER_PAGE] for lines in pages]))
+
+        for label, memory_limit_mb in modes:
+            growth = {}
+            for page_count in page_counts:
+                # ファイルごとに新しいプロセスで抽出し、前の抽出の影響を受けないようにする
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    growth[page_count], extracted = executor.submit(
+                        measure_extraction, pdf_paths[page_count], args.extractor,
+                        memory_limit_mb, args.window).result()
+                print(f"{label} {page_count}ページ: RSS +{growth[page_count]:.1f}MB "
+                      f"({extracted}ページ抽出)")
+
+            difference = growth[page_counts[-1]] - growth[page_counts[0]]
+            if difference > args.tolerance_mb:
+                print(f"{label}: ページ数に応じてメモリ使用量が増えています "
+                      f"(+{difference:.1f}MB, 許容 {args.tolerance_mb:.0f}MB)", file=sys.stderr)
+                failed = True
+
+    if failed:
+        sys.exit(1)
+    print("OK: ページ数を増やしてもメモリ使用量はほぼ一定です")
+
+if __name__ == "__main__":
+    main()
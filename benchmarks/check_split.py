@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分割位置の差分検証（文字列とUTF-8のバッファ）
+
+同じテキストを split_text（str）で分割した結果と、save_text_stream（一時ファイルを
+メモリマップしたUTF-8のバッファ）・出力先に追加する場合（UTF-8のバイト列）で分割した
+結果が一致することを、日本語・英語の混じった合成テキスト（1行あたりの文字数とバイト数の
+比が行ごとに異なる）と、分割モード・区切り位置・分割位置を動かせる範囲の組み合わせで確認する
+
+使用方法:
+    python benchmarks/check_split.py [--cases 100] [--lines 400] [--seed 0]
+"""
+
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.schema import SplitMode
+from src.splitter import TextSplitter, count_lines
+from src.utils import split_text, save_text_stream
+
+JA_SENTENCES = [
+    "本契約は甲乙間の取引条件を定めるものである。",
+    "第三条に定める期日までに支払うものとする。",
+    "なお、詳細は別紙のとおりとする",
+    "システム構成は以下のとおりです．",
+]
+EN_SENTENCES = [
+    "The parties agree to the terms below.",
+    "See appendix A",
+    "Payment is due within 30 days!",
+]
+BULLETS = ["・", "●", "■"]
+MODES = [SplitMode.HALF, SplitMode.THIRD, SplitMode.PARTS, SplitMode.SIZE]
+BOUNDARIES = ["line", "sentence", "paragraph"]
+
+def random_text(rnd, line_count):
+    """
+    文末・段落・箇条書き・複数行にまたがる「」を含む合成テキストを生成
+
+    Args:
+        rnd (random.Random): 乱数生成器
+        line_count (int): 行数
+
+    Returns:
+        str: テキスト
+    """
+    lines = []
+    while len(lines) < line_count:
+        roll = rnd.random()
+        if roll < 0.1:
+            lines.append("")
+        elif roll < 0.2:
+            lines.extend(rnd.choice(BULLETS) + rnd.choice(JA_SENTENCES)
+                         for _ in range(rnd.randint(1, 4)))
+        elif roll < 0.3:
+            lines.append("「" + rnd.choice(JA_SENTENCES))
+            lines.extend(rnd.choice(JA_SENTENCES) for _ in range(rnd.randint(0, 3)))
+            lines.append(rnd.choice(JA_SENTENCES) + "」")
+        elif roll < 0.4:
+            lines.append("　" + rnd.choice(JA_SENTENCES))
+        elif roll < 0.6:
+            # ASCII だけの行（1文字1バイト）と長い日本語の行（1文字3バイト）で、行ごとの比を変える
+            lines.append(" ".join(rnd.choice(EN_SENTENCES) for _ in range(rnd.randint(1, 4))))
+        else:
+            lines.append("".join(rnd.choice(JA_SENTENCES) for _ in range(rnd.randint(1, 5))))
+    text = "\n".join(lines[:line_count])
+    return text + "\n" if rnd.random() < 0.5 else text
+
+def random_splitter(rnd, text):
+    """ランダムな分割方法（size モードの上限はテキストの大きさに合わせる）"""
+    mode = rnd.choice(MODES)
+    size = len(text.encode("utf-8"))
+    return TextSplitter(mode, parts=rnd.randint(2, 6),
+                        max_bytes=rnd.randint(size // 8 + 16, size // 2 + 32),
+                        boundary=rnd.choice(BOUNDARIES), snap_window=rnd.choice([0.1, 0.3, 0.5, 1.0]),
+                        bullets=BULLETS)
+
+def split_file(text, splitter, work_dir):
+    """save_text_stream で分割して保存し、各パートを読み込む"""
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+
+    def get_path(part):
+        return os.path.join(work_dir, "full.txt" if part is None else f"part{part}.txt")
+
+    # 改行を変換せずに読み込み、split_text の結果と比較する
+    paths = save_text_stream([text], get_path, splitter)
+    parts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            parts.append(f.read().replace(os.linesep, "\n"))
+    return parts
+
+def split_bytes(text, splitter):
+    """UTF-8のバイト列で分割位置を求めて各パートを取り出す（出力先に追加する場合と同じ）"""
+    data = text.encode("utf-8")
+    line_count = count_lines(data)
+    if not splitter.needs_split(line_count, len(data)):
+        return [text]
+    return [data[start:end].decode("utf-8") for start, end in splitter.iter_parts(data, line_count)]
+
+def describe(splitter):
+    """分割方法の説明"""
+    return (f"mode={splitter.mode.value}, parts={splitter.parts}, max_bytes={splitter.max_bytes}, "
+            f"boundary={splitter.boundary}, snap_window={splitter.snap_window}")
+
+def main():
+    parser = argparse.ArgumentParser(description="分割位置の差分検証（文字列とUTF-8のバッファ）")
+    parser.add_argument("--cases", type=int, default=100, help="ランダムなテキストの数")
+    parser.add_argument("--lines", type=int, default=400, help="1テキストあたりの最大行数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="check_split_")
+    checked = 0
+    failures = 0
+    try:
+        for case in range(args.cases):
+            text = random_text(rnd, rnd.randint(2, args.lines))
+            # 区切り位置を調整する組み合わせを必ず含める
+            splitters = [random_splitter(rnd, text) for _ in range(3)]
+            splitters += [TextSplitter(SplitMode.THIRD, boundary=boundary, snap_window=0.5,
+                                       bullets=BULLETS)
+                          for boundary in ("sentence", "paragraph")]
+            for splitter in splitters:
+                expected = split_text(text, splitter)
+                results = (("save_text_stream", split_file(text, splitter, os.path.join(work_dir, "out"))),
+                           ("UTF-8のバイト列", split_bytes(text, splitter)))
+                for name, actual in results:
+                    checked += 1
+                    if actual != expected:
+                        failures += 1
+                        print(f"不一致 (case {case}, {name}): {describe(splitter)}")
+                        print(f"  パートの文字数: split_text {[len(part) for part in expected]} / "
+                              f"{name} {[len(part) for part in actual]}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"検証: {args.cases}テキスト, {checked}件の比較, 不一致 {failures}件")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ベンチマーク用の合成PDFコーパス生成
+
+外部ライブラリを使わずにPDFを直接書き出すため、オフラインでも同じシードから
+バイト単位で同じコーパスを再生成できる。日本語は埋め込みなしの標準CJKフォント
+(HeiseiMin-W3, UniJIS-UCS2-H)、英語は Helvetica で描画し、pdfplumber で抽出できる
+
+使用方法:
+    python benchmarks/corpus.py 出力フォルダ [--files 20] [--min-pages 1] [--max-pages 30]
+"""
+
+import os
+import json
+import random
+import argparse
+
+# 生成条件が同じならコーパスを作り直さないための記録
+MANIFEST_NAME = "corpus.json"
+
+JA_SENTENCES = [
+    "本契約は甲乙間の取引条件を定めるものである。",
+    "第三条に定める期日までに支払うものとする。",
+    "なお、詳細は別紙のとおりとする。",
+    "当社は個人情報を適切に管理します．",
+    "システム構成は以下のとおりです。",
+    "本書の記載事項は、関係法令の改正に応じて見直すものとする。",
+    "申請者は、必要書類を添えて担当窓口に提出しなければならない。",
+]
+JA_QUOTES = [
+    "「本書の内容は予告なく変更されることがあります。」",
+    "「質問は担当者まで。回答は後日送付します。」",
+    "「確認しました。問題ありません。」",
+]
+EN_SENTENCES = [
+    "The parties agree to the terms set forth in this agreement.",
+    "Payment shall be made within thirty days of the invoice date.",
+    "All notices must be delivered in writing. Email is acceptable.",
+    "This document is provided for reference only.",
+    "See Appendix A for the complete list of requirements.",
+]
+BULLETS = ["・", "●", "■", "◆"]
+
+# A4 縦、10pt、1ページあたりの行数と1行の文字数
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT_SIZE = 10
+LEADING = 14
+MARGIN = 50
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+JA_LINE_CHARS = (PAGE_WIDTH - 2 * MARGIN) // FONT_SIZE
+EN_LINE_CHARS = 90
+
+def generate_paragraph(rnd, english_ratio):
+    """
+    段落を1つ生成
+
+    Args:
+        rnd (random.Random): 乱数生成器
+        english_ratio (float): 英語の段落の割合
+
+    Returns:
+        tuple: (英語かどうか, 段落のテキスト)
+    """
+    if rnd.random() < english_ratio:
+        return True, " ".join(rnd.choice(EN_SENTENCES) for _ in range(rnd.randint(1, 4)))
+
+    roll = rnd.random()
+    if roll < 0.15:
+        return False, rnd.choice(BULLETS) + rnd.choice(JA_SENTENCES)
+    if roll < 0.3:
+        return False, rnd.choice(JA_QUOTES)
+    text = "".join(rnd.choice(JA_SENTENCES) for _ in range(rnd.randint(1, 5)))
+    # 字下げした段落
+    return False, ("　" + text) if roll < 0.5 else text
+
+def wrap_paragraph(english, text):
+    """
+    段落を1行の文字数で折り返す
+
+    Args:
+        english (bool): 英語かどうか
+        text (str): 段落のテキスト
+
+    Returns:
+        list: (英語かどうか, 行) のリスト
+    """
+    if not english:
+        return [(False, text[i:i + JA_LINE_CHARS]) for i in range(0, len(text), JA_LINE_CHARS)]
+
+    lines = []
+    line = ""
+    for word in text.split(" "):
+        if line and len(line) + 1 + len(word) > EN_LINE_CHARS:
+            lines.append((True, line))
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append((True, line))
+    return lines
+
+def generate_pages(rnd, page_count, english_ratio):
+    """
+    ページごとの行を生成
+
+    Args:
+        rnd (random.Random): 乱数生成器
+        page_count (int): ページ数
+        english_ratio (float): 英語の段落の割合
+
+    Returns:
+        list: ページごとの (英語かどうか, 行) のリスト
+    """
+    pages = []
+    lines = []
+    while len(pages) < page_count:
+        english, text = generate_paragraph(rnd, english_ratio)
+        lines.extend(wrap_paragraph(english, text))
+        # 段落の間の空行
+        if rnd.random() < 0.3:
+            lines.append((False, ""))
+        while len(lines) >= LINES_PER_PAGE and len(pages) < page_count:
+            pages.append(lines[:LINES_PER_PAGE])
+            lines = lines[LINES_PER_PAGE:]
+    return pages
+
+def _escape_latin(text):
+    """Helvetica 用の文字列リテラル"""
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return "(" + text + ")"
+
+def _encode_cjk(text):
+    """UniJIS-UCS2-H 用の16進文字列"""
+    return "<" + text.encode("utf-16-be").hex().upper() + ">"
+
+def page_content(lines):
+    """
+    ページの描画命令を生成
+
+    Args:
+        lines (list): (英語かどうか, 行) のリスト
+
+    Returns:
+        bytes: コンテンツストリーム
+    """
+    ops = ["BT", f"{LEADING} TL", f"{MARGIN} {PAGE_HEIGHT - MARGIN} Td"]
+    for english, line in lines:
+        if line:
+            if english:
+                ops.append(f"/F1 {FONT_SIZE} Tf {_escape_latin(line)} Tj")
+            else:
+                ops.append(f"/F2 {FONT_SIZE} Tf {_encode_cjk(line)} Tj")
+        ops.append("T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+def build_pdf(pages):
+    """
+    ページの行からPDFを組み立てる
+
+    Args:
+        pages (list): generate_pages() の結果
+
+    Returns:
+        bytes: PDFファイルの内容
+    """
+    # 1: Catalog, 2: Pages, 3: Helvetica, 4: Type0, 5: CIDFont, 6: FontDescriptor
+    # 7以降: ページごとに Page とコンテンツ
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiMin-W3 /Encoding /UniJIS-UCS2-H"
+        b" /DescendantFonts [5 0 R] >>",
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiMin-W3"
+        b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >>"
+        b" /FontDescriptor 6 0 R /DW 1000 >>",
+        b"<< /Type /FontDescriptor /FontName /HeiseiMin-W3 /Flags 6"
+        b" /FontBBox [-123 -257 1001 910] /ItalicAngle 0 /Ascent 859 /Descent -141"
+        b" /CapHeight 709 /StemV 69 >>",
+    ]
+
+    kids = []
+    for lines in pages:
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        content = page_content(lines)
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+                        f" /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >>"
+                        f" /Contents {page_id + 1} 0 R >>").encode("latin-1"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode("latin-1")
+
+    data = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(data)
+
+def generate_corpus(out_dir, files=20, min_pages=1, max_pages=30, english_ratio=0.2, seed=0):
+    """
+    合成PDFコーパスを生成
+
+    同じ条件で生成済みの場合は作り直さない
+
+    Args:
+        out_dir (str): 出力フォルダ
+        files (int, optional): ファイル数
+        min_pages (int, optional): 1ファイルの最小ページ数
+        max_pages (int, optional): 1ファイルの最大ページ数
+        english_ratio (float, optional): 英語の段落の割合
+        seed (int, optional): 乱数シード
+
+    Returns:
+        dict: 生成条件・ファイル数・ページ数・合計バイト数
+    """
+    params = {"files": files, "min_pages": min_pages, "max_pages": max_pages,
+              "english_ratio": english_ratio, "seed": seed}
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params and all(
+                os.path.exists(os.path.join(out_dir, name)) for name in manifest["file_names"]):
+            return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith(".pdf"):
+            os.remove(os.path.join(out_dir, name))
+
+    rnd = random.Random(seed)
+    file_names = []
+    page_count = 0
+    total_bytes = 0
+    for index in range(files):
+        pages = generate_pages(rnd, rnd.randint(min_pages, max_pages), english_ratio)
+        data = build_pdf(pages)
+        name = f"doc{index:04d}.pdf"
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(data)
+        file_names.append(name)
+        page_count += len(pages)
+        total_bytes += len(data)
+
+    manifest = {"params": params, "file_names": file_names, "file_count": files,
+                "page_count": page_count, "total_bytes": total_bytes}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成PDFコーパス生成")
+    parser.add_argument("out_dir", help="出力フォルダ")
+    parser.add_argument("--files", type=int, default=20, help="ファイル数")
+    parser.add_argument("--min-pages", type=int, default=1, help="1ファイルの最小ページ数")
+    parser.add_argument("--max-pages", type=int, default=30, help="1ファイルの最大ページ数")
+    parser.add_argument("--english-ratio", type=float, default=0.2, help="英語の段落の割合")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out_dir, args.files, args.min_pages, args.max_pages,
+                               args.english_ratio, args.seed)
+    print(f"コーパス: {manifest['file_count']}ファイル, {manifest['page_count']}ページ, "
+          f"{manifest['total_bytes'] / 1e6:.1f}MB ({args.out_dir})")
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,11 @@ import os
 import threading
 import webbrowser
 from datetime import datetime
-from src.batch import process_folder
+from src.batch import iter_process_folder
 from src.logger import setup_logger, get_log_file_path
-from src.settings import load_settings
-from src.schema import SplitMode
+from src.progress import ProgressChannel
+from src.settings import load_settings, reload_settings
+from src.schema import SplitMode, BatchSummary
 from src.utils import ensure_dir
 
 # ロガーのセットアップ
@@ -24,7 +25,7 @@ def create_layout(settings):
     """GUIレイアウトを生成する"""
     # メニューバー
     menu_def = [
-        ['ファイル', ['終了']],
+        ['ファイル', ['設定を再読み込み', '終了']],
         ['ヘルプ', ['ログを開く', 'バージョン情報']]
     ]
 
@@ -41,7 +42,7 @@ def create_layout(settings):
          sg.Radio('半分', 'SPLIT', key='-HALF-'),
          sg.Radio('三分割', 'SPLIT', key='-THIRD-')],
         [sg.Text('出力先フォルダ:', size=(15, 1)),
-         sg.Text(os.path.abspath('./outputs/'), key='-OUTPUT_PATH-', size=(50, 1))],
+         sg.Text(os.path.abspath(settings.output_dir), key='-OUTPUT_PATH-', size=(50, 1))],
         [sg.Text('_' * 80)],
         [sg.Text('処理設定:')],
         [sg.Checkbox('。(句点)で改行', default=True, key='-KUTEN-'),
@@ -53,8 +54,11 @@ def create_layout(settings):
          sg.Checkbox('スペースを削除', default=True, key='-SPACE-')],
         [sg.Text('_' * 80)],
         [sg.Button('実行', key='-EXECUTE-', size=(10, 1)),
+         sg.Button('中止', key='-CANCEL-', size=(10, 1), disabled=True),
          sg.Button('ログを表示', key='-VIEW_LOG-', size=(15, 1)),
          sg.Button('終了', key='-EXIT-', size=(10, 1))],
+        [sg.ProgressBar(1, orientation='h', size=(30, 15), key='-PROGRESS_BAR-'),
+         sg.Text('', key='-PROGRESS_TEXT-', size=(45, 1))],
         [sg.Output(size=(80, 10), key='-OUTPUT-')]
     ]
 
@@ -69,15 +73,47 @@ def get_split_mode(values):
     else:
         return SplitMode.FULL
 
-def process_with_progress(folder_path, split_mode, window):
-    """進捗表示付きでフォルダを処理"""
+def process_with_progress(folder_path, split_mode, window, cancel):
+    """
+    進捗表示付きでフォルダを処理
+
+    1ファイル終わるごとの通知を '-PROGRESS-' イベントとして一定間隔でまとめて送り、
+    cancel がセットされたら処理中のファイルが終わった時点で終了する
+    """
+    summary = BatchSummary()
     try:
-        success_count, error_count = process_folder(folder_path, split_mode)
-        window.write_event_value('-PROCESS_COMPLETE-', (success_count, error_count))
+        # 並列処理でも完了した順に通知を受け取り、進捗を止めない
+        with ProgressChannel(window.write_event_value, '-PROGRESS-') as channel:
+            for event in iter_process_folder(folder_path, split_mode, cancel=cancel,
+                                             ordered=False, summary=summary):
+                channel.put(event)
+        window.write_event_value('-PROCESS_COMPLETE-', summary)
     except Exception as e:
         logger.error(f"処理中にエラーが発生しました: {str(e)}")
         window.write_event_value('-PROCESS_ERROR-', str(e))
 
+def format_seconds(seconds):
+    """秒数を時:分:秒の文字列にする"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+def show_progress(window, events):
+    """まとめて届いた通知を表示し、最後の通知で進捗バーと残り時間を更新"""
+    for event in events:
+        count = f"{event.done}/{event.total}" if event.total else f"{event.done}"
+        print(f"[{count}] {event.result.message}")
+
+    latest = events[-1]
+    if latest.total:
+        window['-PROGRESS_BAR-'].update(current_count=latest.done, max=latest.total)
+    remaining = latest.remaining_seconds
+    remaining = "--:--:--" if remaining is None else format_seconds(remaining)
+    count = f"{latest.done}/{latest.total}件" if latest.total else f"{latest.done}件"
+    window['-PROGRESS_TEXT-'].update(
+        f"{count} (失敗 {latest.summary.error_count}) "
+        f"経過 {format_seconds(latest.elapsed_seconds)} 残り約 {remaining}")
+
 def open_log_file():
     """現在日付のログファイルを開く"""
     log_file = get_log_file_path()
@@ -93,6 +129,7 @@ def start_gui():
     """GUIアプリケーションを起動"""
     # 設定の読み込み
     settings = load_settings()
+    setup_logger(settings.log_level)
 
     # GUIテーマの設定
     sg.theme('DefaultElement')
@@ -104,15 +141,19 @@ def start_gui():
     window = sg.Window('PDFテキスト整形ツール v2.0', layout, finalize=True)
 
     # 出力ディレクトリの作成
-    output_dir = os.path.abspath('./outputs/')
+    output_dir = os.path.abspath(settings.output_dir)
     ensure_dir(output_dir)
 
+    # 実行中の処理を中止するためのイベント
+    cancel = threading.Event()
+
     # メインイベントループ
     while True:
         event, values = window.read()
 
-        # ウィンドウが閉じられたら終了
+        # ウィンドウが閉じられたら終了（実行中の処理は新しいファイルを始めない）
         if event == sg.WINDOW_CLOSED or event == '終了' or event == '-EXIT-':
+            cancel.set()
             break
 
         # バージョン情報表示
@@ -123,6 +164,14 @@ def start_gui():
         elif event == 'ログを開く' or event == '-VIEW_LOG-':
             open_log_file()
 
+        # 設定ファイルの再読み込み（次の実行から反映）
+        elif event == '設定を再読み込み':
+            settings = reload_settings()
+            output_dir = os.path.abspath(settings.output_dir)
+            ensure_dir(output_dir)
+            window['-OUTPUT_PATH-'].update(output_dir)
+            print("設定ファイルを読み込み直しました")
+
         # 実行ボタン
         elif event == '-EXECUTE-':
             folder_path = values['-FOLDER-']
@@ -138,23 +187,43 @@ def start_gui():
 
             # 処理中表示に更新
             window['-EXECUTE-'].update(disabled=True)
+            window['-CANCEL-'].update(disabled=False)
             window['-OUTPUT-'].update('')
+            window['-PROGRESS_BAR-'].update(current_count=0, max=1)
+            window['-PROGRESS_TEXT-'].update('')
             print(f"フォルダ「{folder_path}」内のPDFファイルを処理しています...")
             print(f"分割モード: {split_mode.value}")
 
             # 別スレッドで処理を実行
+            cancel = threading.Event()
             threading.Thread(
                 target=process_with_progress,
-                args=(folder_path, split_mode, window),
+                args=(folder_path, split_mode, window, cancel),
                 daemon=True
             ).start()
 
+        # 中止ボタン（処理中のファイルが終わった時点で終了する）
+        elif event == '-CANCEL-':
+            cancel.set()
+            window['-CANCEL-'].update(disabled=True)
+            print("中止しています（処理中のファイルが終わるまでお待ちください）...")
+
+        # 進捗イベント（一定間隔でまとめて届く）
+        elif event == '-PROGRESS-':
+            show_progress(window, values[event])
+
         # 処理完了イベント
         elif event == '-PROCESS_COMPLETE-':
-            success_count, error_count = values[event]
+            summary = values[event]
+            success_count, error_count = summary.success_count, summary.error_count
+            if cancel.is_set():
+                print("処理を中止しました")
             print(f"処理完了: {success_count}ファイル成功, {error_count}ファイル失敗")
-            print(f"出力先: {os.path.abspath('./outputs/')}")
+            if summary.cache_hits or summary.cache_misses:
+                print(f"キャッシュ: ヒット={summary.cache_hits}, ミス={summary.cache_misses}")
+            print(f"出力先: {output_dir}")
             window['-EXECUTE-'].update(disabled=False)
+            window['-CANCEL-'].update(disabled=True)
 
             if success_count > 0:
                 sg.popup_notify('処理完了', f'{success_count}ファイルの変換に成功しました')
@@ -168,6 +237,7 @@ def start_gui():
             print(f"エラー: {error_message}")
             print("詳細はログファイルを確認してください")
             window['-EXECUTE-'].update(disabled=False)
+            window['-CANCEL-'].update(disabled=True)
             sg.popup_error(f"処理中にエラーが発生しました: {error_message}")
 
     # ウィンドウを閉じる
@@ -8,13 +8,18 @@ PDFを読み取り、改行や句読点を整形し .txt に変換・保存す
 
 import sys
 import os
+import time
 import argparse
 from datetime import datetime
-from src.batch import process_folder
+from src.batch import process_folder, get_raw_store, get_profiler, get_search_index
+from src.watch import watch_folder
+from src.distributed import process_folder_distributed
 from src.logger import setup_logger
 from src.settings import load_settings
-from src.schema import SplitMode
-import PySimpleGUI as sg
+from src.schema import SplitMode, BatchSummary
+from src.splitter import TextSplitter
+from src.store import open_output_store, export_store
+from src.search import rebuild_index
 
 logger = setup_logger()
 
@@ -22,13 +27,159 @@ def parse_arguments():
     """コマンドライン引数をパース"""
     parser = argparse.ArgumentParser(description='PDFテキスト整形ツール')
     parser.add_argument('--folder', '-f', help='処理するPDFが含まれるフォルダパス')
-    parser.add_argument('--split', '-s', choices=['full', 'half', 'third'],
-                        default='full', help='分割モード (full=全体, half=半分, third=三分割)')
+    parser.add_argument('--split', '-s', choices=[mode.value for mode in SplitMode],
+                        default='full', help='分割モード (full=全体, half=半分, third=三分割, '
+                                             'parts=--parts 個に分割, size=--max-bytes バイトごとに分割)')
+    parser.add_argument('--parts', type=int, default=None, metavar='N',
+                        help='--split parts の分割数 (省略時は設定ファイルの値)')
+    parser.add_argument('--max-bytes', type=int, default=None, metavar='BYTES',
+                        help='--split size の1ファイルあたりの上限バイト数 (省略時は設定ファイルの値)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='並列ワーカー数 (0=CPU数に合わせて自動, 1=逐次処理, 省略時は設定ファイルの値)')
+    parser.add_argument('--recursive', '-r', action='store_true',
+                        help='サブフォルダも処理し、フォルダ構成を出力先に再現する')
+    parser.add_argument('--include', action='append', default=[], metavar='PATTERN',
+                        help='対象にするファイルのパターン (例: "*契約*.pdf", "2025/*", 複数指定可)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='除外するファイル・フォルダのパターン (例: "archive", "*_draft.pdf", 複数指定可)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='結果キャッシュを使わずに全ファイルを処理する')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='キャッシュを使わずに全ファイルを処理し、キャッシュを作り直す')
+    parser.add_argument('--resume', action='store_true',
+                        help='前回までの実行で処理済みの文書（ログフォルダの journal.jsonl に記録され、'
+                             'PDFが変わっておらず出力も残っているもの）を飛ばして続きから処理')
+    parser.add_argument('--distributed', nargs='?', const='', default=None, metavar='QUEUE_DIR',
+                        help='同じ共有フォルダを処理するほかのホスト・プロセスと、QUEUE_DIR のリースファイルで'
+                             '文書を分担して処理する (QUEUE_DIR 省略時は設定ファイルの [distributed] queue_dir)')
+    parser.add_argument('--watch', action='store_true',
+                        help='フォルダを監視し、追加・更新されたPDFを処理し続ける (Ctrl+Cで終了)')
+    parser.add_argument('--interval', type=float, default=None,
+                        help='--watch の走査間隔 (秒, 省略時は設定ファイルの値)')
+    parser.add_argument('--profile', action='store_true',
+                        help='処理を cProfile で計測し、ログフォルダに .pstats とレポートを保存する')
+    parser.add_argument('--profile-limit', type=int, default=None, metavar='N',
+                        help='--profile で計測するファイル数 (処理した順に先頭から, 0=上限なし, 省略時は設定ファイルの値)')
+    parser.add_argument('--profile-file', default=None, metavar='NAME',
+                        help='--profile で計測するファイル名またはパターン (例: "契約書A.pdf")')
+    parser.add_argument('--extractor', choices=['pdfplumber', 'pdfminer', 'auto'], default=None,
+                        help='抽出方式 (pdfplumber=従来どおり, pdfminer=テキストのみの高速抽出, '
+                             'auto=pdfminer で抽出し読み取れないページだけ pdfplumber, 省略時は設定ファイルの値)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default=None,
+                        help='ログの出力レベル (DEBUG でファイルごとの成功も出力, 省略時は設定ファイルの値)')
+    parser.add_argument('--raw-store', choices=['info', 'prune'],
+                        help='抽出テキストの保存先を表示 (info) または整理 (prune) して終了')
+    parser.add_argument('--max-age-days', type=float, default=None,
+                        help='--raw-store prune で、この日数より長く使われていない抽出テキストも削除')
+    parser.add_argument('--export', nargs='?', const='', default=None, metavar='DIR',
+                        help='出力先 ([output] sink = jsonl / sqlite) に保存した整形結果を、従来の出力ファイル'
+                             '（1パート1ファイル）として DIR に書き出して終了 (DIR 省略時は出力先フォルダ)')
+    parser.add_argument('--search', default=None, metavar='QUERY',
+                        help='全文検索の索引 ([search]) から QUERY を含む行を表示して終了')
+    parser.add_argument('--limit', type=int, default=None, metavar='N',
+                        help='--search で表示する行数の上限 (省略時は設定ファイルの値)')
+    parser.add_argument('--search-index', choices=['info', 'rebuild'],
+                        help='全文検索の索引を表示 (info) または出力先フォルダの出力から作り直して (rebuild) 終了')
     return parser.parse_args()
 
+def run_raw_store_command(command, max_age_days=None, extractor=None):
+    """抽出テキストの保存先を表示・整理"""
+    store = get_raw_store(load_settings(), extractor)
+
+    if command == 'prune':
+        removed, removed_size = store.prune(max_age_days)
+        logger.info(f"抽出テキストを整理しました: {removed}件, {removed_size / 1024 / 1024:.1f}MB削除")
+
+    entries = store.list_entries()
+    tags = sorted({entry[3] for entry in entries if entry[3]})
+    usable = sum(1 for entry in entries if entry[3])
+    total_size = sum(entry[1] for entry in entries)
+    print(f"抽出テキストの保存先: {os.path.abspath(store.raw_dir)}")
+    for tag in tags:
+        print(f"{tag}: {sum(1 for entry in entries if entry[3] == tag)}件")
+    print(f"使えるもの: {usable}件, その他: {len(entries) - usable}件 (現在の抽出方式: {store.tag})")
+    print(f"合計サイズ: {total_size / 1024 / 1024:.1f}MB (上限 {store.max_size / 1024 / 1024:.0f}MB)")
+    if command == 'prune':
+        print(f"削除: {removed}件, {removed_size / 1024 / 1024:.1f}MB")
+
+def run_export_command(export_dir=None):
+    """出力先にまとめて保存した整形結果を従来の出力ファイルとして書き出す"""
+    settings = load_settings()
+    store = open_output_store(settings.output, settings.output_dir)
+    if store is None:
+        print("エラー: 出力先が files のため、書き出す必要はありません ([output] sink を確認してください)")
+        sys.exit(1)
+
+    export_dir = export_dir or settings.output_dir
+    started = time.perf_counter()
+    count, size = export_store(store, export_dir)
+    seconds = time.perf_counter() - started
+    logger.info(f"出力先の内容を書き出しました: {count}ファイル, {size / 1024 / 1024:.1f}MB, "
+                f"{seconds:.2f}秒 ({store.kind} → {os.path.abspath(export_dir)})")
+    print(f"書き出し完了: {count}ファイル, {size / 1024 / 1024:.1f}MB → {os.path.abspath(export_dir)}")
+
+def run_search_command(query, limit=None):
+    """全文検索の索引から検索語を含む行を表示"""
+    settings = load_settings()
+    if not os.path.exists(settings.search.index_file):
+        print("エラー: 検索索引がありません ([search] enabled = true で処理するか、"
+              "--search-index rebuild で作成してください)")
+        sys.exit(1)
+
+    limit = limit or settings.search.max_hits
+    started = time.perf_counter()
+    hits, checked = get_search_index(settings).search(query, limit)
+    seconds = time.perf_counter() - started
+    for hit in hits:
+        part = "" if hit.part is None else f" [part{hit.part}]"
+        print(f"{hit.path}:{hit.line}:{part} {hit.text}")
+    more = " (上限に達したため以降は省略)" if len(hits) >= limit else ""
+    print(f"検索結果: {len(hits)}行{more}, {checked}パートを確認, {seconds * 1000:.1f}ms")
+
+def run_search_index_command(command):
+    """全文検索の索引を表示・作り直し"""
+    settings = load_settings()
+    index = get_search_index(settings)
+
+    if command == 'rebuild':
+        started = time.perf_counter()
+        store = open_output_store(settings.output, settings.output_dir)
+        added = rebuild_index(index, settings.output_dir, store, settings.search.batch_documents)
+        seconds = time.perf_counter() - started
+        logger.info(f"検索索引を作り直しました: {added}パート, {seconds:.2f}秒")
+        print(f"作り直し完了: {added}パート, {seconds:.2f}秒")
+
+    info = index.info()
+    print(f"検索索引: {os.path.abspath(settings.search.index_file)} ({info['ngram']}-gram)")
+    print(f"パート: {info['parts']}件 (元のPDF: {info['sources']}件), "
+          f"セグメント: {info['segments']}件, n-gram: {info['postings']}件")
+    print(f"サイズ: {info['size_bytes'] / 1024 / 1024:.1f}MB")
+
 def run_cli():
     """CLIモードで実行"""
     args = parse_arguments()
+    settings = load_settings()
+    setup_logger(args.log_level or settings.log_level)
+
+    if args.raw_store:
+        run_raw_store_command(args.raw_store, args.max_age_days, args.extractor)
+        return
+
+    if args.export is not None:
+        run_export_command(args.export)
+        return
+
+    if args.limit is not None and args.limit < 1:
+        print(f"エラー: 表示する行数は1以上を指定してください: {args.limit}")
+        sys.exit(1)
+
+    if args.search is not None:
+        run_search_command(args.search, args.limit)
+        return
+
+    if args.search_index:
+        run_search_index_command(args.search_index)
+        return
 
     if not args.folder:
         print("エラー: フォルダパスを指定してください (--folder オプション)")
@@ -38,13 +189,87 @@ def run_cli():
         print(f"エラー: 指定されたパスはフォルダではありません: {args.folder}")
         sys.exit(1)
 
-    settings = load_settings()
     split_mode = SplitMode(args.split)
 
+    if args.parts is not None and args.parts < 2:
+        print(f"エラー: 分割数は2以上を指定してください: {args.parts}")
+        sys.exit(1)
+
+    if args.max_bytes is not None and args.max_bytes < 1024:
+        print(f"エラー: 1ファイルあたりの上限は1024バイト以上を指定してください: {args.max_bytes}")
+        sys.exit(1)
+
+    if args.parts is not None or args.max_bytes is not None:
+        # 指定した値で [split] を上書きした分割方法を渡す
+        overrides = {key: value for key, value in
+                     (("parts", args.parts), ("max_bytes", args.max_bytes)) if value is not None}
+        split_mode = TextSplitter.from_settings(
+            split_mode,
+            settings.model_copy(update={"split": settings.split.model_copy(update=overrides)}))
+
+    if args.workers is not None and args.workers < 0:
+        print(f"エラー: ワーカー数は0以上を指定してください: {args.workers}")
+        sys.exit(1)
+
+    if args.interval is not None and args.interval <= 0:
+        print(f"エラー: 走査間隔は0より大きい値を指定してください: {args.interval}")
+        sys.exit(1)
+
+    if args.profile_limit is not None and args.profile_limit < 0:
+        print(f"エラー: 計測するファイル数は0以上を指定してください: {args.profile_limit}")
+        sys.exit(1)
+
+    if args.resume and args.watch:
+        print("エラー: --resume は --watch と同時に指定できません")
+        sys.exit(1)
+
+    if args.distributed is not None:
+        # 分散処理では完了した文書をキュー用フォルダに記録し、常に続きから処理する
+        for option, given in (("--watch", args.watch), ("--resume", args.resume),
+                              ("--profile", args.profile or args.profile_limit is not None
+                               or args.profile_file)):
+            if given:
+                print(f"エラー: --distributed は {option} と同時に指定できません")
+                sys.exit(1)
+
+    profiler = None
+    if args.profile or args.profile_limit is not None or args.profile_file:
+        if args.watch:
+            print("エラー: --profile は --watch と同時に指定できません")
+            sys.exit(1)
+        profiler = get_profiler(settings, args.profile_limit, args.profile_file)
+
     try:
-        success_count, error_count = process_folder(args.folder, split_mode)
-        logger.info(f"処理完了: 成功={success_count}, 失敗={error_count}")
-        print(f"処理完了: {success_count}ファイル成功, {error_count}ファイル失敗")
+        if args.distributed is not None:
+            summary = process_folder_distributed(args.folder, split_mode, workers=args.workers,
+                                                 use_cache=False if args.no_cache else None,
+                                                 rebuild_cache=args.rebuild_cache,
+                                                 recursive=args.recursive,
+                                                 include=args.include, exclude=args.exclude,
+                                                 extractor=args.extractor,
+                                                 queue_dir=args.distributed or None)
+        elif args.watch:
+            summary = watch_folder(args.folder, split_mode, workers=args.workers,
+                                   use_cache=False if args.no_cache else None,
+                                   interval=args.interval, extractor=args.extractor,
+                                   rebuild_cache=args.rebuild_cache, recursive=args.recursive,
+                                   include=args.include, exclude=args.exclude)
+        else:
+            summary = BatchSummary()
+            process_folder(args.folder, split_mode, workers=args.workers,
+                           use_cache=False if args.no_cache else None,
+                           rebuild_cache=args.rebuild_cache,
+                           recursive=args.recursive,
+                           include=args.include, exclude=args.exclude,
+                           profiler=profiler, extractor=args.extractor,
+                           resume=args.resume, summary=summary)
+        cache_info = ""
+        if summary.cache_hits or summary.cache_misses:
+            cache_info = f", キャッシュ ヒット={summary.cache_hits}, ミス={summary.cache_misses}"
+        if summary.skipped_count:
+            cache_info += f", 処理済みのため省略={summary.skipped_count}"
+        logger.info(f"処理完了: 成功={summary.success_count}, 失敗={summary.error_count}{cache_info}")
+        print(f"処理完了: {summary.success_count}ファイル成功, {summary.error_count}ファイル失敗{cache_info}")
     except Exception as e:
         logger.error(f"処理中にエラーが発生しました: {str(e)}")
         print(f"エラー: {str(e)}")
@@ -52,6 +277,8 @@ def run_cli():
 
 def run_gui():
     """GUIモードで実行"""
+    # PySimpleGUI（tkinter）はGUIモードでだけ読み込む。main.py は並列処理の
+    # ワーカープロセスでも読み込まれるため、CLIの経路では読み込まない
     from gui_app import start_gui
     start_gui()
 
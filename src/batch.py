@@ -6,77 +6,960 @@
 """
 
 import os
-import glob
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime
-from src.formatter import format_text
-from src.utils import read_pdf_text, save_text, split_text
-from src.logger import setup_logger
-from src.schema import SplitMode
+from functools import partial
+from itertools import chain
+from src.formatter import StreamFormatter, CompiledFormatter
+from src.cache import ResultCache, RawTextStore, hash_settings, iter_raw_text, tee_raw_text
+from src.utils import (iter_pdf_pages, get_pdf_page_count, get_page_ranges,
+                       extract_page_range, get_output_dir, get_success_message)
+from src.scanner import PdfScanner
+from src.splitter import TextSplitter
+from src.writer import InlineWriter, get_writer
+from src.store import get_output_store
+from src.search import SearchIndex, SearchIndexer
+from src.journal import RunJournal, get_run_key, load_completed, is_completed
+from src.metrics import FileTimer, MetricsRecorder
+from src.profiler import FileProfiler, run_profiled
+from src.logger import setup_logger, get_log_file_path, get_metrics_file_path, get_journal_file_path
+from src.settings import load_settings
+from src.schema import (SplitMode, FileResult, FileMetrics, ExtractionSettings, BatchSummary,
+                        FileEvent)
 
 logger = setup_logger()
 
-def process_folder(folder_path, split_mode=SplitMode.FULL):
+# 並列処理の中止を確認する間隔（秒）
+CANCEL_POLL_SECONDS = 0.5
+
+def resolve_workers(workers, file_count):
+    """
+    実際に使用するワーカー数を決定
+
+    Args:
+        workers (int): 指定ワーカー数（0またはNoneでCPU数に合わせて自動）
+        file_count (int | None): 処理対象のファイル数（探索しながら処理する場合はNone）
+
+    Returns:
+        int: ワーカー数（1以上、ファイル数以下）
+    """
+    if not workers:
+        workers = os.cpu_count() or 1
+    if file_count is None:
+        return max(1, workers)
+    return max(1, min(workers, file_count))
+
+def process_pages(pdf_file, pages, split_mode, timestamp, config, source_root=None,
+                  output_dir="outputs", writer=None, timer=None, output=None):
+    """
+    ページごとのテキストを逐次整形・分割・保存する
+
+    ページ単位で整形して書き出しスレッドへ渡すため、文書全体を1つの文字列として保持しない
+
+    Args:
+        pdf_file (str): 元のPDFファイルのパス
+        pages (iterable): ページごとのテキスト
+        split_mode (SplitMode | TextSplitter): 分割モード
+        timestamp (str): 出力ファイル名に付ける日付
+        config (CompiledFormatter): 整形ルール
+        source_root (str, optional): 探索を開始したフォルダ（指定した場合はフォルダ構成を出力先に再現）
+        output_dir (str, optional): 出力先フォルダ
+        writer (OutputWriter, optional): 書き出しスレッド。指定した場合は書き出しの完了を待たずに、
+            完了を待って処理結果を返す関数を返す
+        timer (FileTimer, optional): 処理時間の計測（指定しない場合はここから計測）
+        output (OutputSettings, optional): 出力先の設定（指定しない場合は出力ファイルに保存）
+
+    Returns:
+        FileResult | callable: 処理結果（writer を指定した場合は処理結果を返す関数）
+    """
+    if timer is None:
+        timer = FileTimer(pdf_file)
+
+    try:
+        # ファイル名（拡張子なし）
+        file_name = os.path.splitext(os.path.basename(pdf_file))[0]
+        store = get_output_store(output, output_dir)
+        output_dir = get_output_dir(pdf_file, source_root, output_dir)
+
+        pages = timer.iter_pages(pages)
+        first_page = next(pages, None)
+
+        if not first_page:
+            return FileResult(pdf_path=pdf_file, success=False,
+                              message=f"{file_name}.pdf → PDFの内容を読み取れません",
+                              metrics=timer.finish())
+
+        def get_path(part):
+            part_suffix = "" if part is None else f"_part{part}"
+            output_filename = f"{file_name}_{timestamp}整形後{part_suffix}.txt"
+            return os.path.join(output_dir, output_filename)
+
+        # 整形しながら書き出しスレッドへ渡し、分割して保存
+        lines = (line for page in chain([first_page], pages) for line in page.splitlines())
+        formatted = timer.iter_formatted(StreamFormatter(config).format_lines(lines))
+        stats = {}
+        future = (writer or get_writer()).write(formatted, get_path, split_mode, stats, store)
+
+        finish = partial(_finish_result, pdf_file, file_name, split_mode, future, timer, stats)
+        return finish if writer is not None else finish()
+
+    except Exception as e:
+        return _error_result(pdf_file, e, timer.finish())
+
+def _finish_result(pdf_file, file_name, split_mode, future, timer, stats):
+    """書き出しの完了を待って処理結果を生成"""
+    try:
+        output_paths = future.result()
+    except Exception as e:
+        return _error_result(pdf_file, e, timer.finish())
+
+    return FileResult(pdf_path=pdf_file, success=True,
+                      message=get_success_message(file_name, split_mode),
+                      output_paths=output_paths, metrics=timer.finish(stats))
+
+def process_text(pdf_file, raw_text, split_mode, timestamp, config, raw_path=None,
+                 source_root=None, output_dir="outputs", output=None, writer=None):
+    """
+    抽出済みテキストを整形・分割・保存する
+
+    Args:
+        pdf_file (str): 元のPDFファイルのパス
+        raw_text (str): PDFから抽出したテキスト
+        split_mode (SplitMode | TextSplitter): 分割モード
+        timestamp (str): 出力ファイル名に付ける日付
+        config (CompiledFormatter): 整形ルール
+        raw_path (str, optional): 抽出テキストの保存先（指定した場合は整形しながら保存）
+        source_root (str, optional): 探索を開始したフォルダ
+        output_dir (str, optional): 出力先フォルダ
+        output (OutputSettings, optional): 出力先の設定
+        writer (OutputWriter, optional): 書き出しスレッド（process_pages を参照）
+
+    Returns:
+        FileResult | callable: 処理結果（writer を指定した場合は処理結果を返す関数）
+    """
+    pages = [raw_text] if raw_path is None else tee_raw_text([raw_text], raw_path)
+    return process_pages(pdf_file, pages, split_mode, timestamp, config, source_root, output_dir,
+                         writer, output=output)
+
+def process_pdf(pdf_file, split_mode, timestamp, config, page_threshold=0, raw_path=None,
+                source_root=None, output_dir="outputs", extraction=None, output=None, writer=None):
+    """
+    PDFファイル1件を読み取り・整形・分割・保存する
+
+    ワーカープロセスからも呼ばれるため、ログは直接出力せず結果に含めて返す
+
+    Args:
+        pdf_file (str): PDFファイルのパス
+        split_mode (SplitMode | TextSplitter): 分割モード
+        timestamp (str): 出力ファイル名に付ける日付
+        config (CompiledFormatter): 整形ルール
+        page_threshold (int, optional): このページ数以上のPDFは処理せずページ数を返す（0で無効）
+        raw_path (str, optional): 抽出テキストの保存先。保存済みなら抽出せずに整形し、
+            なければ抽出しながら保存する
+        source_root (str, optional): 探索を開始したフォルダ
+        output_dir (str, optional): 出力先フォルダ
+        extraction (ExtractionSettings, optional): 抽出設定（抽出方式・省メモリ抽出）
+        output (OutputSettings, optional): 出力先の設定（指定しない場合は出力ファイルに保存）
+        writer (OutputWriter, optional): 書き出しスレッド（process_pages を参照）
+
+    Returns:
+        FileResult | int | callable: 処理結果。ページ数が page_threshold 以上の場合はページ数。
+            writer を指定した場合は処理結果を返す関数の場合がある
+    """
+    # 抽出済みのテキストがあれば整形だけやり直す
+    if raw_path is not None and os.path.exists(raw_path):
+        return process_pages(pdf_file, iter_raw_text(raw_path), split_mode, timestamp, config,
+                             source_root, output_dir, writer, FileTimer(pdf_file, "raw"), output)
+
+    extraction = extraction or ExtractionSettings()
+    timer = FileTimer(pdf_file)
+    try:
+        if page_threshold > 0:
+            page_count = get_pdf_page_count(pdf_file, extraction.extractor)
+            if page_count >= page_threshold:
+                return page_count
+    except Exception as e:
+        return _error_result(pdf_file, e, timer.finish())
+
+    # PDFをページごとに読み取りながら処理
+    pages = iter_pdf_pages(pdf_file, extractor=extraction.extractor,
+                           memory_limit_mb=extraction.get_memory_limit(),
+                           window_pages=extraction.low_memory_window)
+    if raw_path is not None:
+        pages = tee_raw_text(pages, raw_path)
+    return process_pages(pdf_file, pages, split_mode, timestamp, config, source_root, output_dir,
+                         writer, timer, output)
+
+def _timed_extract_page_range(pdf_file, start, end, extractor="pdfplumber"):
+    """ページ範囲のテキストを抽出し、抽出にかかった秒数と合わせて返す"""
+    started = time.perf_counter()
+    text = extract_page_range(pdf_file, start, end, extractor)
+    return text, time.perf_counter() - started
+
+def _error_result(pdf_file, error, metrics=None):
+    """例外から失敗結果を生成"""
+    return FileResult(pdf_path=pdf_file, success=False,
+                      message=f"{os.path.basename(pdf_file)} → 処理失敗: {str(error)}",
+                      metrics=metrics)
+
+def iter_results(pdf_files, split_mode, timestamp, config, workers=1, extraction=None,
+                 raw_paths=None, source_root=None, output_dir="outputs", profiler=None,
+                 limits=None, cancel=None, ordered=True, output=None, on_result=None):
+    """
+    PDFファイルを処理し、結果を入力順（ordered=False なら完了順）に返す
+
+    Args:
+        pdf_files (list | iterable): PDFファイルパスのリスト。反復子の場合は取り出しながら処理する
+        split_mode (SplitMode | TextSplitter): 分割モード
+        timestamp (str): 出力ファイル名に付ける日付
+        config (CompiledFormatter): 整形ルール
+        workers (int): ワーカー数（1なら現在のプロセスで逐次処理。limits で上限を設定した場合は
+            1ワーカーのプロセスで処理）
+        extraction (ExtractionSettings, optional): 抽出設定（抽出方式、ページ並列抽出の閾値など）
+        raw_paths (dict, optional): PDFファイルパス -> 抽出テキストの保存先
+        source_root (str, optional): 探索を開始したフォルダ
+        output_dir (str, optional): 出力先フォルダ
+        profiler (FileProfiler, optional): 指定した場合は選択されたファイルの処理を計測
+        limits (WorkerSettings, optional): ワーカーの処理時間・メモリ使用量の上限。
+            上限を設定した場合は1ワーカーでも別プロセスで処理し、超えたワーカーを停止する
+        cancel (threading.Event, optional): セットされたら新しいファイルの処理を始めず、
+            処理中のファイルが終わった時点で終了する
+        ordered (bool, optional): 結果を pdf_files の順に返す。False なら並列処理で
+            完了した順に返す（逐次処理では常に pdf_files の順）
+        output (OutputSettings, optional): 出力先の設定（指定しない場合は出力ファイルに保存）
+        on_result (callable, optional): 1ファイルの結果が出た時点で（入力順に並べる前に）
+            結果を渡して呼ぶ関数
+
+    Yields:
+        FileResult: 処理結果（中止した場合、処理しなかったファイルの結果は返さない）
+    """
+    raw_paths = {} if raw_paths is None else raw_paths
+    extraction = extraction or ExtractionSettings()
+    if workers <= 1 and (limits is None or not limits.is_enabled()):
+        # 前のファイルの書き出しを待たずに次のファイルの抽出を始め、
+        # 次のファイルを書き出しスレッドへ渡し終えてから前の結果を返す
+        writer = get_writer()
+        previous = None
+        for pdf_file in pdf_files:
+            if cancel is not None and cancel.is_set():
+                break
+            stats_path = profiler.select(pdf_file) if profiler is not None else None
+            args = (pdf_file, split_mode, timestamp, config)
+            kwargs = dict(raw_path=raw_paths.get(pdf_file), source_root=source_root,
+                          output_dir=output_dir, extraction=extraction, output=output)
+            if stats_path is None:
+                result = process_pdf(*args, writer=writer, **kwargs)
+            else:
+                # 計測するファイルは前のファイルの書き出しを待ってから、分割・保存まで
+                # このスレッドで実行して計測に含める
+                if previous is not None:
+                    yield _finish(previous, on_result)
+                    previous = None
+                result = run_profiled(stats_path, _run_inline, process_pdf, *args, **kwargs)
+            if previous is not None:
+                yield _finish(previous, on_result)
+            previous = result
+        if previous is not None:
+            yield _finish(previous, on_result)
+        return
+
+    yield from _iter_parallel_results(pdf_files, split_mode, timestamp, config, workers,
+                                      extraction, raw_paths, source_root, output_dir, profiler,
+                                      limits, cancel, ordered, output, on_result)
+
+def _finish(result, on_result=None):
+    """書き出しを待って結果を確定し、on_result を呼ぶ"""
+    result = result() if callable(result) else result
+    if on_result is not None:
+        on_result(result)
+    return result
+
+def _run_inline(func, *args, **kwargs):
+    """
+    書き出しスレッドを使わずに、分割・保存までこのスレッドで実行（プロファイル用）
+
+    func は writer 引数を受け取る process_pdf / process_text
+    """
+    result = func(*args, writer=InlineWriter(), **kwargs)
+    return result() if callable(result) else result
+
+def _submit(executor, stats_path, func, *args, writes=False):
+    """
+    タスクを投入（stats_path を指定した場合はワーカーで計測しながら実行）
+
+    writes=True のタスク（出力を書き出す process_pdf / process_text）を計測する場合は、
+    分割・保存もワーカーのタスクのスレッドで実行して計測に含める
+    """
+    if stats_path is None:
+        return executor.submit(func, *args)
+    if writes:
+        return executor.submit(run_profiled, stats_path, _run_inline, func, *args)
+    return executor.submit(run_profiled, stats_path, func, *args)
+
+def _create_executor(workers, limits=None):
+    """
+    ワーカープロセスのプールを生成
+
+    上限を設定した場合は、上限を超えたワーカーだけを停止して入れ替えられる WorkerPool を使う
+    """
+    # 逐次処理やCLIの起動時にはプロセスプール関連のモジュールを読み込まない
+    if limits is not None and limits.is_enabled():
+        from src.supervisor import WorkerPool
+        return WorkerPool(workers, limits.timeout_seconds, limits.memory_limit_mb,
+                          limits.max_tasks_per_worker)
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers)
+
+def _iter_parallel_results(pdf_files, split_mode, timestamp, config, workers, extraction,
+                           raw_paths, source_root=None, output_dir="outputs", profiler=None,
+                           limits=None, cancel=None, ordered=True, output=None, on_result=None):
+    """
+    プロセスプールでPDFファイルを並列処理する
+
+    大きなPDFは同じプール上でページ範囲ごとのタスクに分割するため、
+    1ファイルだけ巨大なフォルダでも全ワーカーが使われる。
+    ファイル単位のタスクは同時投入数を制限し、ページ範囲タスクが
+    残りのファイルの後ろで待たされないようにする。
+    反復子を渡した場合は、空きができるたびに次のファイルを取り出す。
+    上限を超えて停止したワーカーのタスクは、そのファイルの失敗として返す。
+    cancel がセットされたら開始前のタスクを取り消し、実行中のファイルの結果だけを返して終了する
+    """
+    queue = enumerate(pdf_files)
+    if isinstance(pdf_files, (list, tuple)):
+        # 一覧が確定している場合は大きいファイルから着手すると全体の終了が揃いやすい
+        queue = iter(sorted(queue, key=lambda item: -os.path.getsize(item[1])))
+    max_in_flight = workers * 2
+
+    files = {}     # ファイル番号 -> PDFファイルパス（結果を返すまで保持）
+    pending = {}   # future -> (ファイル番号, 種別, チャンク番号)
+    chunks = {}    # ファイル番号 -> ページ範囲ごとのテキスト
+    results = {}
+    # ページ範囲ごとに抽出したファイルの計測: ファイル番号 -> [投入時刻, ページ数, 抽出秒数の合計]
+    fan_out = {}
+    # プロファイル対象のファイル: ファイル番号 -> 計測結果の保存先
+    profile_paths = {}
+    next_index = 0
+    cancelled = False
+    # 中止の確認間隔（中止しない場合はタスクの完了まで待つ）
+    poll_seconds = None if cancel is None else CANCEL_POLL_SECONDS
+
+    def finish(index, result):
+        results[index] = result
+        if on_result is not None:
+            on_result(result)
+
+    with _create_executor(workers, limits) as executor:
+
+        def submit_files():
+            while len(pending) < max_in_flight:
+                if cancel is not None and cancel.is_set():
+                    return
+                item = next(queue, None)
+                if item is None:
+                    return
+                index, pdf_file = item
+                files[index] = pdf_file
+                fan_out[index] = [time.perf_counter(), None, 0.0]
+                stats_path = profiler.select(pdf_file) if profiler is not None else None
+                if stats_path is not None:
+                    profile_paths[index] = stats_path
+                future = _submit(executor, stats_path, process_pdf, pdf_file, split_mode,
+                                 timestamp, config, extraction.page_parallel_threshold,
+                                 raw_paths.get(pdf_file), source_root, output_dir, extraction,
+                                 output, writes=True)
+                pending[future] = (index, "file", None)
+
+        submit_files()
+        while pending:
+            done, _ = wait(pending, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            if not cancelled and cancel is not None and cancel.is_set():
+                # 開始前のタスクを取り消す（取り消したタスクは次の wait で完了として返る）
+                cancelled = True
+                for future in pending:
+                    future.cancel()
+            for future in done:
+                index, kind, chunk_no = pending.pop(future)
+                pdf_file = files[index]
+
+                if future.cancelled():
+                    # 取り消したファイルは結果を返さない
+                    chunks.pop(index, None)
+                    fan_out.pop(index, None)
+                    continue
+
+                if kind == "file":
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = _error_result(pdf_file, e)
+                    if isinstance(result, int) and cancelled:
+                        # ページ範囲ごとの抽出を始める前に中止した
+                        fan_out.pop(index, None)
+                    elif isinstance(result, int):
+                        # ページ範囲ごとに分割して同じプールへ投入
+                        ranges = get_page_ranges(result, extraction.page_chunk_size)
+                        chunks[index] = [None] * len(ranges)
+                        fan_out[index][1] = result
+                        stats_path = profile_paths.get(index)
+                        for no, (start, end) in enumerate(ranges):
+                            chunk_future = _submit(executor, stats_path and f"{stats_path}.{no}",
+                                                   _timed_extract_page_range, pdf_file, start, end,
+                                                   extraction.extractor)
+                            pending[chunk_future] = (index, "chunk", no)
+                    else:
+                        finish(index, result)
+                        fan_out.pop(index, None)
+
+                elif kind == "chunk":
+                    if index not in chunks:
+                        # 他のチャンクで失敗済み
+                        continue
+                    try:
+                        chunks[index][chunk_no], seconds = future.result()
+                        fan_out[index][2] += seconds
+                    except Exception as e:
+                        finish(index, _error_result(pdf_file, e))
+                        chunks.pop(index, None)
+                        fan_out.pop(index, None)
+                        continue
+                    if all(text is not None for text in chunks[index]):
+                        raw_text = "".join(chunks.pop(index))
+                        stats_path = profile_paths.get(index)
+                        text_future = _submit(executor, stats_path and f"{stats_path}.text",
+                                              process_text, pdf_file, raw_text, split_mode,
+                                              timestamp, config, raw_paths.get(pdf_file),
+                                              source_root, output_dir, output, writes=True)
+                        pending[text_future] = (index, "text", None)
+
+                else:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = _error_result(pdf_file, e)
+                    started, page_count, extract_seconds = fan_out.pop(index)
+                    if result.metrics is not None:
+                        # 抽出は各ワーカーの合計秒数、全体は投入から完了までの経過秒数
+                        result.metrics.pages = page_count
+                        result.metrics.extract_seconds = extract_seconds
+                        result.metrics.total_seconds = time.perf_counter() - started
+                    finish(index, result)
+
+            submit_files()
+
+            while True:
+                index = next_index if ordered else next(iter(results), None)
+                if index not in results:
+                    break
+                files.pop(index, None)
+                profile_paths.pop(index, None)
+                yield results.pop(index)
+                next_index += 1
+
+        # 中止した場合は取り消したファイルの後ろに残った結果を返す
+        for index in sorted(results):
+            yield results.pop(index)
+
+def process_folder(folder_path, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                   rebuild_cache=False, recursive=False, include=None, exclude=None, profiler=None,
+                   extractor=None, resume=False, summary=None):
     """
     指定フォルダ内のすべてのPDFファイルを処理
 
     Args:
         folder_path (str): 処理するPDFファイルが含まれるフォルダパス
-        split_mode (SplitMode): 分割モード（全体・半分・三分割）
+        split_mode (SplitMode | TextSplitter): 分割モード（全体・半分・三分割・N分割・サイズごと）。
+            SplitMode の場合は分割数・分割位置の調整を設定ファイルの [split] から決める
+        workers (int, optional): 並列ワーカー数。0でCPU数に合わせて自動、1で逐次処理。
+            指定しない場合は設定ファイルの値を使用
+        use_cache (bool, optional): 結果キャッシュを使うかどうか。指定しない場合は設定ファイルの値を使用
+        rebuild_cache (bool, optional): キャッシュを使わずに全件処理し、結果でキャッシュを作り直す
+        recursive (bool, optional): サブフォルダも探索し、フォルダ構成を出力先に再現する。
+            見つけたファイルから順に処理を始める
+        include (list, optional): 対象にするファイルのパターン（fnmatch 形式）
+        exclude (list, optional): 除外するファイル・フォルダのパターン（fnmatch 形式）
+        profiler (FileProfiler, optional): 処理を計測するプロファイラ。指定しない場合は
+            設定ファイルの [profile] に従う
+        extractor (str, optional): 抽出方式の名前。指定しない場合は設定ファイルの値を使用
+        resume (bool, optional): 前回までの実行記録で処理済みの文書（PDFが変わっておらず、
+            出力も残っているもの）を飛ばす
+        summary (BatchSummary, optional): 集計先。キャッシュのヒット数・ミス数や飛ばした件数も
+            必要な場合に指定する
 
     Returns:
         tuple: (成功数, 失敗数)
     """
+    if summary is None:
+        summary = BatchSummary()
+    for _ in iter_process_folder(folder_path, split_mode, workers, use_cache, rebuild_cache,
+                                 recursive, include, exclude, profiler, extractor,
+                                 summary=summary, resume=resume):
+        pass
+    return summary.success_count, summary.error_count
+
+def iter_process_folder(folder_path, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                        rebuild_cache=False, recursive=False, include=None, exclude=None,
+                        profiler=None, extractor=None, cancel=None, ordered=True, summary=None,
+                        resume=False):
+    """
+    指定フォルダ内のすべてのPDFファイルを処理し、1ファイル終わるごとに通知を返す
+
+    引数は process_folder と同じ（cancel, ordered, summary は iter_process_files を参照）
+
+    Yields:
+        FileEvent: 1ファイル分の処理完了の通知
+    """
     if not os.path.isdir(folder_path):
         raise ValueError(f"指定されたパスはフォルダではありません: {folder_path}")
 
+    scanner = PdfScanner(folder_path, recursive, include, exclude)
+    if recursive:
+        # 探索しながら処理する
+        pdf_files = iter(scanner)
+        source_root = folder_path
+    else:
+        # PDFファイル一覧を取得（ログの順序を安定させるためソート）
+        pdf_files = sorted(scanner)
+        source_root = None
+        if not pdf_files:
+            logger.warning(f"フォルダ内にPDFファイルが見つかりません: {folder_path}")
+            return
+
+    yield from iter_process_files(pdf_files, split_mode, workers, use_cache, rebuild_cache,
+                                  source_root=source_root, profiler=profiler, extractor=extractor,
+                                  cancel=cancel, ordered=ordered, summary=summary, resume=resume)
+
+    logger.info(scanner.summary())
+    if recursive and scanner.file_count == 0:
+        logger.warning(f"フォルダ内にPDFファイルが見つかりません: {folder_path}")
+
+def process_files(pdf_files, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                  rebuild_cache=False, settings=None, source_root=None, profiler=None,
+                  extractor=None, resume=False, summary=None):
+    """
+    指定したPDFファイルを処理
+
+    Args:
+        pdf_files (list | iterable): PDFファイルパスのリスト（この順にログを出力）。
+            反復子の場合は取り出しながら処理する
+        split_mode (SplitMode | TextSplitter): 分割モード（全体・半分・三分割・N分割・サイズごと）。
+            SplitMode の場合は分割数・分割位置の調整を設定ファイルの [split] から決める
+        workers (int, optional): 並列ワーカー数。0でCPU数に合わせて自動、1で逐次処理。
+            指定しない場合は設定ファイルの値を使用
+        use_cache (bool, optional): 結果キャッシュを使うかどうか。指定しない場合は設定ファイルの値を使用
+        rebuild_cache (bool, optional): キャッシュを使わずに全件処理し、結果でキャッシュを作り直す
+        settings (AppSettings, optional): アプリケーション設定。指定しない場合は設定ファイルから読み込み
+        source_root (str, optional): 探索を開始したフォルダ（指定した場合はフォルダ構成を出力先に再現）
+        profiler (FileProfiler, optional): 処理を計測するプロファイラ。指定しない場合は
+            設定ファイルの [profile] に従う
+        extractor (str, optional): 抽出方式の名前。指定しない場合は設定ファイルの値を使用
+        resume (bool, optional): process_folder を参照
+        summary (BatchSummary, optional): process_folder を参照
+
+    Returns:
+        tuple: (成功数, 失敗数)
+    """
+    if summary is None:
+        summary = BatchSummary()
+    for _ in iter_process_files(pdf_files, split_mode, workers, use_cache, rebuild_cache,
+                                settings, source_root, profiler, extractor, summary=summary,
+                                resume=resume):
+        pass
+    return summary.success_count, summary.error_count
+
+def iter_process_files(pdf_files, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                       rebuild_cache=False, settings=None, source_root=None, profiler=None,
+                       extractor=None, cancel=None, ordered=True, summary=None, resume=False):
+    """
+    指定したPDFファイルを処理し、1ファイル終わるごとに通知を返す
+
+    並列処理でもワーカーの結果を受け取るたびに返すため、GUIなどの進捗表示に使える。
+    途中で cancel をセットすると、新しいファイルの処理を始めずに、処理中のファイルが
+    終わった時点で終了する（キャッシュの保存・処理時間の集計は通常どおり行う）
+
+    Args:
+        pdf_files (list | iterable): PDFファイルパスのリスト。反復子の場合は取り出しながら処理する
+        cancel (threading.Event, optional): 処理を中止するためのイベント
+        ordered (bool, optional): 通知を pdf_files の順に返す（ログの順序もこの順になる）。
+            False なら並列処理で完了した順に返し、大きなファイルの完了を待たずに進捗を返す
+        summary (BatchSummary, optional): 集計先。処理しながら更新し、終了時にキャッシュの
+            ヒット数・ミス数を設定する（各通知の summary はその時点の写し）
+        その他の引数は process_files と同じ
+
+    Yields:
+        FileEvent: 1ファイル分の処理完了の通知
+    """
+    if settings is None:
+        settings = load_settings()
+    if workers is None:
+        workers = settings.workers
+    if use_cache is None:
+        use_cache = settings.cache.enabled
+    if profiler is None and settings.profile.enabled:
+        profiler = get_profiler(settings)
+    if summary is None:
+        summary = BatchSummary()
+    extraction = settings.extraction
+    if extractor is not None:
+        extraction = extraction.model_copy(update={"extractor": extractor})
+    # 分割数・分割位置の調整は [split] に従い、ワーカーへは分割方法として渡す
+    if not isinstance(split_mode, TextSplitter):
+        split_mode = TextSplitter.from_settings(split_mode, settings)
+
     # 実行日時
     timestamp = datetime.now().strftime('%Y%m%d')
 
-    # PDFファイル一覧を取得
-    pdf_files = glob.glob(os.path.join(folder_path, "*.pdf"))
+    # 整形ルールは1実行につき1回だけ構築してワーカーに渡す
+    formatting = settings.formatting.model_dump()
+    config = CompiledFormatter(formatting)
+    settings_hash = hash_settings(formatting, settings.version, extraction.extractor)
 
-    if not pdf_files:
-        logger.warning(f"フォルダ内にPDFファイルが見つかりません: {folder_path}")
-        return 0, 0
+    # まとめて保存する出力先（files なら None）。キャッシュから復元した出力もここに追加する
+    store = get_output_store(settings.output, settings.output_dir)
+
+    # 処理が終わった文書の記録。同じ設定で処理した前回までの記録があれば処理済みの文書を飛ばす
+    run_key = get_run_key(settings_hash, split_mode, settings.output, settings.output_dir)
+    if resume:
+        pdf_files = _skip_completed(pdf_files, run_key, settings.journal.resume_days, store,
+                                    summary)
+    total = len(pdf_files) if isinstance(pdf_files, (list, tuple)) else None
+    journal = None
+    if settings.journal.enabled:
+        try:
+            journal = RunJournal(get_journal_file_path(), run_key, store,
+                                 settings.journal.sync_documents, settings.journal.sync_seconds)
+        except OSError as e:
+            logger.warning(f"実行記録ファイルを開けません: {str(e)}")
+
+    cache = None
+    raw_store = None
+    if use_cache:
+        cache = ResultCache(settings.cache.cache_dir, settings_hash,
+                            settings.cache.max_size_mb, rebuild=rebuild_cache, store=store)
+        raw_store = get_raw_store(settings, extraction.extractor)
+
+    # 全文検索の索引（整形の終わった文書を別スレッドでまとめて追加する）
+    indexer = None
+    if settings.search.enabled:
+        indexer = SearchIndexer(get_search_index(settings), store,
+                                settings.search.batch_documents, settings.search.batch_mb)
 
-    success_count = 0
-    error_count = 0
+    # ファイルごとの処理時間をログフォルダに記録
+    recorder = None
+    if settings.metrics.enabled:
+        try:
+            recorder = MetricsRecorder(get_metrics_file_path())
+        except OSError as e:
+            logger.warning(f"処理時間の記録ファイルを開けません: {str(e)}")
 
-    for pdf_file in pdf_files:
+    def record(result):
+        """処理が終わった文書を、入力順に並べるのを待たずに実行記録に書き込む"""
+        if not result.success:
+            return
         try:
-            # ファイル名（拡張子なし）
-            file_name = os.path.splitext(os.path.basename(pdf_file))[0]
+            journal.record(result, _known_hash(cache, result.pdf_path))
+        except OSError as e:
+            logger.warning(f"実行記録に書き込めません: {result.pdf_path} ({str(e)})")
+
+    # ファイルごとの成功は DEBUG で出力し、INFO では一定間隔で件数だけを出力する
+    started = time.perf_counter()
+    last_progress = started
+    done = 0
+    try:
+        for result in _iter_cached_results(pdf_files, split_mode, timestamp, config, workers,
+                                           extraction, cache, raw_store, rebuild_cache,
+                                           source_root, settings.output_dir, profiler,
+                                           settings.worker, cancel, ordered, settings.output,
+                                           record if journal is not None else None):
+            if result.success:
+                logger.debug(result.message)
+                summary.success_count += 1
+            else:
+                logger.error(result.message)
+                summary.error_count += 1
+            if recorder is not None:
+                recorder.record(result)
+            if indexer is not None and result.success:
+                indexer.add(result.pdf_path, result.output_paths)
+
+            now = time.perf_counter()
+            if now - last_progress >= settings.log_progress_seconds:
+                logger.info(f"処理中: {summary.success_count + summary.error_count}件 "
+                            f"(成功={summary.success_count}, 失敗={summary.error_count})")
+                last_progress = now
+
+            done += 1
+            yield FileEvent(name=os.path.basename(result.pdf_path),
+                            status=_event_status(result), done=done, total=total,
+                            elapsed_seconds=now - started, result=result,
+                            summary=summary.model_copy())
+    finally:
+        if cancel is not None and cancel.is_set():
+            logger.warning(f"処理を中止しました: {done}件処理済み")
+        if cache is not None:
+            cache.save()
+            summary.cache_hits = cache.hits
+            summary.cache_misses = cache.misses
+        if recorder is not None:
+            recorder.close()
+            for line in recorder.summary_lines(settings.metrics.slowest_files):
+                logger.info(line)
+        if profiler is not None:
+            _save_profile(profiler)
+        if store is not None:
+            # キャッシュから復元して、まだ書き込んでいない出力を書き込む
+            store.commit()
+        if journal is not None:
+            journal.close()
+        if indexer is not None:
+            indexer.close()
+            logger.info(f"検索索引を更新しました: {indexer.documents}件, "
+                        f"{indexer.parts}パートを追加, {indexer.seconds:.2f}秒")
+
+def _skip_completed(pdf_files, run_key, days, store, summary):
+    """
+    実行記録で処理済みの文書を除いたファイルを返す（飛ばした件数を summary に加える）
+
+    Args:
+        pdf_files (list | iterable): PDFファイルパスのリストまたは反復子
+        run_key (str): get_run_key() の結果
+        days (int): 読み込む記録の日数
+        store (OutputStore | None): 出力先
+        summary (BatchSummary): 集計先
 
-            # PDFをテキストに変換
-            raw_text = read_pdf_text(pdf_file)
+    Returns:
+        list | iterator: 処理するファイル（リストを渡した場合はリスト）
+    """
+    completed = load_completed(run_key, days)
 
-            if not raw_text:
-                logger.error(f"{file_name}.pdf → PDFの内容を読み取れません")
-                error_count += 1
+    def is_done(pdf_file):
+        entry = completed.get(os.path.abspath(pdf_file))
+        return entry is not None and is_completed(entry, pdf_file, store)
+
+    if isinstance(pdf_files, (list, tuple)):
+        remaining = [pdf_file for pdf_file in pdf_files if not is_done(pdf_file)]
+        summary.skipped_count += len(pdf_files) - len(remaining)
+        logger.info(f"再開: 処理済みの{len(pdf_files) - len(remaining)}件を飛ばします "
+                    f"(残り{len(remaining)}件)")
+        return remaining
+
+    def iter_remaining():
+        for pdf_file in pdf_files:
+            if is_done(pdf_file):
+                summary.skipped_count += 1
                 continue
+            yield pdf_file
+
+    logger.info(f"再開: 実行記録の{len(completed)}件と照合しながら処理します")
+    return iter_remaining()
+
+def _known_hash(cache, pdf_file):
+    """結果キャッシュが計算済みのPDFの内容のハッシュ値（サイズ, 更新日時, ハッシュ値）"""
+    if cache is None:
+        return None
+    return cache.files.get(os.path.abspath(pdf_file))
+
+def _event_status(result):
+    """処理結果から通知の status を決める"""
+    if not result.success:
+        return "error"
+    if result.metrics is not None and result.metrics.source == "cache":
+        return "cached"
+    return "success"
+
+def _save_profile(profiler):
+    """プロファイルの計測結果を保存してログに出力"""
+    try:
+        paths = profiler.report()
+    except Exception as e:
+        logger.error(f"プロファイル結果の保存エラー: {str(e)}")
+        return
+
+    if paths is None:
+        logger.warning("プロファイル: 計測したファイルがありません（キャッシュから復元したファイルは計測しません）")
+    else:
+        logger.info(f"プロファイル: {len(profiler.profiled)}ファイルを計測 → {paths[0]}, {paths[1]}")
+
+def get_profiler(settings, limit=None, file_pattern=None):
+    """
+    設定に従ってプロファイラを生成（結果はログフォルダに保存）
+
+    Args:
+        settings (AppSettings): アプリケーション設定
+        limit (int, optional): 計測するファイル数。指定しない場合は設定ファイルの値を使用
+        file_pattern (str, optional): 計測するファイル名またはパターン。
+            指定しない場合は設定ファイルの値を使用
+
+    Returns:
+        FileProfiler: プロファイラ
+    """
+    profile = settings.profile
+    return FileProfiler(os.path.dirname(get_log_file_path()),
+                        profile.limit if limit is None else limit,
+                        profile.file if file_pattern is None else file_pattern,
+                        profile.sort, profile.top)
+
+def get_raw_store(settings, extractor=None):
+    """
+    設定に従って抽出テキストの保存先を生成
+
+    Args:
+        settings (AppSettings): アプリケーション設定
+        extractor (str, optional): 抽出方式の名前。指定しない場合は設定ファイルの値を使用
+
+    Returns:
+        RawTextStore: 抽出テキストの保存先
+    """
+    return RawTextStore(os.path.join(settings.cache.cache_dir, "raw"), settings.cache.raw_max_size_mb,
+                        extractor or settings.extraction.extractor)
+
+def get_search_index(settings):
+    """
+    設定に従って全文検索の索引を生成
+
+    Args:
+        settings (AppSettings): アプリケーション設定
+
+    Returns:
+        SearchIndex: 全文検索の索引
+    """
+    return SearchIndex(settings.search.index_file, settings.search.ngram)
+
+def _restored_metrics(pdf_file, result, started):
+    """キャッシュから復元した結果の計測値を生成"""
+    try:
+        input_bytes = os.path.getsize(pdf_file)
+    except OSError:
+        input_bytes = 0
+    try:
+        output_bytes = sum(os.path.getsize(path) for path in result.output_paths)
+    except OSError:
+        # 出力先にまとめて保存した場合は出力ファイルがない
+        output_bytes = 0
+    return FileMetrics(source="cache", input_bytes=input_bytes, output_bytes=output_bytes,
+                       total_seconds=time.perf_counter() - started)
+
+def _iter_cached_results(pdf_files, split_mode, timestamp, config, workers, extraction, cache,
+                         raw_store=None, rebuild=False, source_root=None, output_dir="outputs",
+                         profiler=None, limits=None, cancel=None, ordered=True, output=None,
+                         on_result=None):
+    """
+    キャッシュにある結果を復元し、残りのファイルだけを処理して結果を入力順に返す
+
+    ordered=False の場合は、復元した結果は確認した時点で、処理した結果は完了した順に返す
+    整形結果がなくても抽出テキストが保存済みなら、抽出を省略して整形だけ行う。
+    pdf_files が反復子の場合は、処理側が次のファイルを必要とした時点で
+    取り出してキャッシュを確認する
+
+    Args:
+        pdf_files (list | iterable): PDFファイルパスのリスト
+        split_mode (SplitMode | TextSplitter): 分割モード
+        timestamp (str): 出力ファイル名に付ける日付
+        config (CompiledFormatter): 整形ルール
+        workers (int): 指定ワーカー数
+        extraction (ExtractionSettings): 抽出設定
+        cache (ResultCache | None): 結果キャッシュ（Noneならキャッシュを使わない）
+        raw_store (RawTextStore, optional): 抽出テキストの保存先
+        rebuild (bool, optional): 保存済みの抽出テキストを使わずに抽出し直す
+        source_root (str, optional): 探索を開始したフォルダ
+        output_dir (str, optional): 出力先フォルダ
+        profiler (FileProfiler, optional): 処理を計測するプロファイラ
+        limits (WorkerSettings, optional): ワーカーの処理時間・メモリ使用量の上限
+        cancel (threading.Event, optional): セットされたら新しいファイルの確認・処理を始めない
+        ordered (bool, optional): 結果を pdf_files の順に返すかどうか
+        output (OutputSettings, optional): 出力先の設定
+        on_result (callable, optional): 1ファイルの結果が出た時点で（入力順に並べる前に）
+            結果を渡して呼ぶ関数（キャッシュから復元した結果を含む）
+
+    Yields:
+        FileResult: 処理結果
+    """
+    # 入力順の待ち行列: キャッシュから復元した結果、または処理待ちのファイルパス
+    # （ordered=False の場合は復元した結果だけを積む）
+    order = deque()
+    keys = {}
+    raw_paths = {}
+
+    def iter_pending():
+        """キャッシュにないファイルを返し、復元できた結果は待ち行列に積む"""
+        for pdf_file in pdf_files:
+            if cancel is not None and cancel.is_set():
+                return
+            if cache is not None:
+                started = time.perf_counter()
+                try:
+                    content_hash = cache.get_content_hash(pdf_file)
+                except OSError:
+                    # 読めないファイルは通常の処理でエラーとして扱う
+                    content_hash = None
+
+                if content_hash is not None:
+                    key = cache.get_key(content_hash, split_mode)
+                    result = cache.restore(key, pdf_file, timestamp,
+                                           get_output_dir(pdf_file, source_root, output_dir),
+                                           split_mode)
+                    if result is not None:
+                        result.metrics = _restored_metrics(pdf_file, result, started)
+                        if on_result is not None:
+                            on_result(result)
+                        order.append(result)
+                        continue
+
+                    keys[pdf_file] = key
+                    if raw_store is not None:
+                        raw_path = raw_store.get_path(content_hash)
+                        if rebuild and os.path.exists(raw_path):
+                            os.remove(raw_path)
+                        raw_paths[pdf_file] = raw_path
 
-            # テキスト整形
-            formatted_text = format_text(raw_text)
+            if ordered:
+                order.append(pdf_file)
+            yield pdf_file
 
-            # 分割して保存
-            parts = split_text(formatted_text, split_mode)
+    pending = iter_pending()
+    if isinstance(pdf_files, (list, tuple)):
+        # 一覧が確定している場合は先にキャッシュを確認し、残りを大きい順に並列処理できるようにする
+        pending = list(pending)
+        workers = resolve_workers(workers, len(pending))
+        if workers > 1:
+            logger.info(f"並列処理: {workers}ワーカー, {len(pending)}ファイル")
+    else:
+        workers = resolve_workers(workers, None)
+        if workers > 1:
+            logger.info(f"並列処理: {workers}ワーカー")
 
-            # 保存
-            for i, part in enumerate(parts):
-                part_suffix = "" if len(parts) == 1 else f"_part{i+1}"
-                output_filename = f"{file_name}_{timestamp}整形後{part_suffix}.txt"
+    results = iter_results(pending, split_mode, timestamp, config, workers, extraction,
+                           raw_paths, source_root, output_dir, profiler, limits, cancel, ordered,
+                           output, on_result)
+    try:
+        while True:
+            while order and isinstance(order[0], FileResult):
+                yield order.popleft()
 
-                # 保存
-                output_path = os.path.join("outputs", output_filename)
-                save_text(part, output_path)
+            result = next(results, None)
+            if result is None:
+                break
 
-            # ログ記録
-            split_info = "" if split_mode == SplitMode.FULL else f" ({split_mode.value}分割保存)"
-            logger.info(f"{file_name}.pdf → 成功{split_info}")
-            success_count += 1
+            pdf_file = result.pdf_path
+            if ordered:
+                # この結果より前に入力されたファイルの復元結果を先に返す
+                # （中止して処理しなかったファイルは飛ばす）
+                while order[0] != pdf_file:
+                    head = order.popleft()
+                    if isinstance(head, FileResult):
+                        yield head
+                order.popleft()
 
-        except Exception as e:
-            logger.error(f"{os.path.basename(pdf_file)} → 処理失敗: {str(e)}")
-            error_count += 1
+            if result.success and pdf_file in keys:
+                cache.store(keys.pop(pdf_file), result)
+            raw_paths.pop(pdf_file, None)
+            yield result
 
-    return success_count, error_count
\ No newline at end of file
+        while order:
+            head = order.popleft()
+            if isinstance(head, FileResult):
+                yield head
+    finally:
+        # プロセスプールを確実に終了させる
+        results.close()
@@ -0,0 +1,512 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+キャッシュモジュール - 整形結果の再利用
+"""
+
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+from src.logger import setup_logger
+from src.utils import ensure_dir, get_output_path, get_success_message
+from src.extractor import EXTRACTORS, get_extractor
+from src.schema import SplitMode, FileResult
+from src.splitter import get_splitter
+from src.store import to_store_text
+
+logger = setup_logger()
+
+# キャッシュの保存形式を変えた場合に古いエントリを無効にするための番号
+CACHE_FORMAT = 1
+
+# 索引を保存するときのロックの待ち時間と、異常終了したプロセスのロックとみなすまでの秒数
+INDEX_LOCK_TIMEOUT = 30
+INDEX_LOCK_STALE_SECONDS = 60
+# 索引にないエントリのフォルダを削除するまでの秒数（同じキャッシュフォルダを使う
+# 実行中のほかのプロセスが保存して、まだ索引に書き込んでいないエントリは消さない）
+ORPHAN_SECONDS = 86400
+
+def hash_file(file_path, block_size=1 << 20):
+    """
+    ファイル内容のハッシュ値を計算
+
+    Args:
+        file_path (str): ファイルパス
+        block_size (int, optional): 一度に読み込むバイト数
+
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_settings(formatting, version, extractor="pdfplumber"):
+    """
+    整形設定・抽出方式とツールのバージョンからハッシュ値を計算
+
+    Args:
+        formatting (dict): 整形設定
+        version (str): ツールのバージョン
+        extractor (str, optional): 抽出方式の名前
+
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    data = json.dumps({"formatting": formatting, "version": version, "extractor": extractor,
+                       "format": CACHE_FORMAT},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    PDFごとの整形結果のキャッシュ
+
+    PDFの内容・整形設定・分割モード・ツールのバージョンが同じなら、前回の
+    出力ファイルをコピーして抽出と整形を省略する。内容のハッシュはサイズと
+    更新日時が変わらない限り再計算しない。合計サイズが上限を超えた場合は
+    最後に使われた時刻が古いエントリから削除する。
+    索引の読み書きは親プロセスだけで行う。同じキャッシュフォルダを複数のプロセスが
+    使う場合に備え、保存時はロックファイルを作成してからディスク上の索引に
+    このプロセスでの変更を反映する。
+    出力先（OutputStore）を指定した場合は、出力を出力先から読み取ってキャッシュし、
+    復元した出力は出力先に追加する
+    """
+
+    def __init__(self, cache_dir, settings_hash, max_size_mb=1024, rebuild=False, store=None):
+        """
+        Args:
+            cache_dir (str): キャッシュディレクトリ
+            settings_hash (str): hash_settings() の結果
+            max_size_mb (int, optional): キャッシュの合計サイズの上限（MB）
+            rebuild (bool, optional): 既存のエントリを使わずに作り直す
+            store (OutputStore, optional): 出力先（指定しない場合は出力ファイル）
+        """
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = f"{self.index_path}.lock"
+        self.settings_hash = settings_hash
+        self.max_size = max_size_mb * 1024 * 1024
+        self.rebuild = rebuild
+        self.output_store = store
+
+        self.hits = 0
+        self.misses = 0
+
+        # files: PDFの絶対パス -> [サイズ, 更新日時(ns), 内容のハッシュ]
+        # entries: キー -> {"parts": 出力のパート番号, "size": バイト数, "used": 最終使用時刻}
+        self.files, self.entries = self._load_index()
+
+        # 保存時にディスク上の索引に反映する、このプロセスでの変更
+        self._changed_files = set()
+        self._changed_entries = set()
+        self._removed_entries = set()
+
+    def _load_index(self):
+        """
+        索引ファイルを読み込む（壊れている場合は空のキャッシュとして扱う）
+
+        Returns:
+            tuple: (files, entries)
+        """
+        if not os.path.exists(self.index_path):
+            return {}, {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index.get("files", {}), index.get("entries", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"キャッシュ索引を読み込めません。空のキャッシュとして扱います: {str(e)}")
+            return {}, {}
+
+    def get_content_hash(self, pdf_file):
+        """
+        PDFファイルの内容のハッシュ値を求める
+
+        サイズと更新日時が前回と同じなら、ファイルを読まずに前回の値を返す
+
+        Args:
+            pdf_file (str): PDFファイルのパス
+
+        Returns:
+            str: 内容のハッシュ値
+        """
+        path = os.path.abspath(pdf_file)
+        stat = os.stat(path)
+
+        known = self.files.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+
+        content_hash = hash_file(path)
+        self.files[path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        self._changed_files.add(path)
+        return content_hash
+
+    def get_key(self, content_hash, split_mode):
+        """
+        PDFファイルのキャッシュキーを求める
+
+        Args:
+            content_hash (str): get_content_hash() の結果
+            split_mode (SplitMode | TextSplitter): 分割モード
+
+        Returns:
+            str: キャッシュキー
+        """
+        key = f"{content_hash}:{self.settings_hash}:{get_splitter(split_mode).cache_tag}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def restore(self, key, pdf_file, timestamp, output_dir="outputs", split_mode=SplitMode.FULL):
+        """
+        キャッシュから出力ファイルを復元
+
+        メッセージは同じ内容の別名のファイルから保存したエントリでも、このファイルの名前で作る
+
+        Args:
+            key (str): キャッシュキー
+            pdf_file (str): PDFファイルのパス
+            timestamp (str): 出力ファイル名に付ける日付
+            output_dir (str, optional): 出力先フォルダ
+            split_mode (SplitMode | TextSplitter, optional): 分割モード（get_key() に渡したもの）
+
+        Returns:
+            FileResult | None: 処理結果（キャッシュにない場合はNone）
+        """
+        entry = None if self.rebuild else self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        file_name = os.path.splitext(os.path.basename(pdf_file))[0]
+        output_paths = []
+        parts = []
+        try:
+            for part in entry["parts"]:
+                output_path = get_output_path(file_name, timestamp, part, output_dir,
+                                              create_dir=self.output_store is None)
+                if self.output_store is None:
+                    shutil.copyfile(self._entry_path(key, part), output_path)
+                else:
+                    with open(self._entry_path(key, part), "rb") as f:
+                        parts.append((part, output_path, to_store_text(f.read())))
+                output_paths.append(output_path)
+        except OSError as e:
+            logger.warning(f"キャッシュを復元できません。再処理します: {file_name}.pdf ({str(e)})")
+            self._remove_entry(key)
+            self.misses += 1
+            return None
+
+        if parts:
+            document_path = get_output_path(file_name, timestamp, None, output_dir, create_dir=False)
+            self.output_store.add(document_path, parts)
+        entry["used"] = time.time()
+        self._changed_entries.add(key)
+        self.hits += 1
+        return FileResult(pdf_path=pdf_file, success=True,
+                          message=f"{get_success_message(file_name, split_mode)} (キャッシュ)",
+                          output_paths=output_paths)
+
+    def store(self, key, result):
+        """
+        処理結果の出力ファイルをキャッシュに保存
+
+        Args:
+            key (str): キャッシュキー
+            result (FileResult): 成功した処理結果
+        """
+        # 出力が1ファイルなら分割なし、複数ならパート番号は1から
+        count = len(result.output_paths)
+        parts = [None] if count == 1 else list(range(1, count + 1))
+
+        entry_dir = ensure_dir(os.path.join(self.entries_dir, key))
+        size = 0
+        try:
+            for output_path, part in zip(result.output_paths, parts):
+                entry_path = self._entry_path(key, part)
+                if self.output_store is None:
+                    shutil.copyfile(output_path, entry_path)
+                else:
+                    text = self.output_store.read(output_path)
+                    if text is None:
+                        raise OSError(f"出力先に保存されていません: {output_path}")
+                    # 出力ファイルと同じく、改行はこの環境の改行コードで保存する
+                    with open(entry_path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                size += os.path.getsize(entry_path)
+        except OSError as e:
+            logger.warning(f"キャッシュに保存できません: {str(e)}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        self.entries[key] = {"parts": parts, "size": size, "used": time.time()}
+        self._changed_entries.add(key)
+        self._removed_entries.discard(key)
+
+    def save(self):
+        """
+        ディスク上の索引にこのプロセスでの変更を反映し、古いエントリを削除して保存
+
+        同じキャッシュフォルダを使うほかのプロセスが保存したエントリは残す。
+        索引にないエントリのフォルダ（ORPHAN_SECONDS 以上前のもの）も削除する
+
+        Returns:
+            bool: 保存成功したかどうか
+        """
+        try:
+            ensure_dir(self.cache_dir)
+            self._lock_index()
+            try:
+                self._merge_index()
+
+                # 最後に使われた時刻の新しい順に、上限サイズまで残す
+                total = 0
+                for key, entry in sorted(self.entries.items(), key=lambda item: -item[1]["used"]):
+                    total += entry["size"]
+                    if total > self.max_size:
+                        self._remove_entry(key)
+
+                # 同じキャッシュフォルダを使う複数のプロセスが同時に保存しても一時ファイルが重ならないようにする
+                temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"files": self.files, "entries": self.entries}, f, ensure_ascii=False)
+                os.replace(temp_path, self.index_path)
+            finally:
+                self._unlock_index()
+        except OSError as e:
+            logger.error(f"キャッシュ索引の保存エラー: {str(e)}")
+            return False
+
+        self._changed_files.clear()
+        self._changed_entries.clear()
+        self._removed_entries.clear()
+        self._remove_orphans()
+        return True
+
+    def _merge_index(self):
+        """ディスク上の最新の索引に、このプロセスで追加・使用・削除したエントリを反映する"""
+        files, entries = self._load_index()
+        for path in self._changed_files:
+            files[path] = self.files[path]
+        for key in self._changed_entries:
+            entry = self.entries[key]
+            # 読み込んだ後にほかのプロセスが削除したエントリは戻さない
+            if key not in entries and not os.path.isdir(os.path.join(self.entries_dir, key)):
+                continue
+            if key in entries:
+                entry["used"] = max(entry["used"], entries[key]["used"])
+            entries[key] = entry
+        for key in self._removed_entries:
+            entries.pop(key, None)
+        self.files = files
+        self.entries = entries
+
+    def _lock_index(self):
+        """
+        索引のロックファイルを作成（ほかのプロセスが保存中なら待つ）
+
+        Raises:
+            OSError: INDEX_LOCK_TIMEOUT 秒待ってもロックを取得できない場合
+        """
+        deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return
+            except FileExistsError:
+                pass
+
+            try:
+                stale = time.time() - os.path.getmtime(self.lock_path) > INDEX_LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                continue
+            if stale:
+                # 名前を変えてから取り除き、確認してから取り除くまでに作り直されたロックは消さない
+                stale_path = f"{self.lock_path}.{os.getpid()}.stale"
+                try:
+                    os.rename(self.lock_path, stale_path)
+                except FileNotFoundError:
+                    continue
+                if time.time() - os.path.getmtime(stale_path) <= INDEX_LOCK_STALE_SECONDS:
+                    try:
+                        os.link(stale_path, self.lock_path)
+                    except OSError:
+                        pass
+                os.remove(stale_path)
+                continue
+
+            if time.monotonic() > deadline:
+                raise OSError(f"キャッシュ索引のロックを取得できません: {self.lock_path}")
+            time.sleep(0.05)
+
+    def _unlock_index(self):
+        """索引のロックファイルを削除"""
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_orphans(self):
+        """索引にないエントリのフォルダ（中断した保存や、ほかのプロセスが上書きした索引の残り）を削除"""
+        if not os.path.isdir(self.entries_dir):
+            return
+        limit = time.time() - ORPHAN_SECONDS
+        with os.scandir(self.entries_dir) as it:
+            for entry in it:
+                if entry.name in self.entries or not entry.is_dir():
+                    continue
+                try:
+                    if entry.stat().st_mtime > limit:
+                        continue
+                except OSError:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _entry_path(self, key, part):
+        """エントリ内のパートのファイルパス"""
+        return os.path.join(self.entries_dir, key, "full.txt" if part is None else f"part{part}.txt")
+
+    def _remove_entry(self, key):
+        """エントリを索引とディスクから削除"""
+        self.entries.pop(key, None)
+        self._changed_entries.discard(key)
+        self._removed_entries.add(key)
+        shutil.rmtree(os.path.join(self.entries_dir, key), ignore_errors=True)
+
+class RawTextStore:
+    """
+    PDFから抽出したテキストの保存先
+
+    整形設定だけを変えた再実行では抽出を省略し、保存済みのテキストを整形し直す。
+    PDFの内容のハッシュと、抽出方式・PDFライブラリのバージョンごとに gzip 圧縮した
+    1ファイルとして保存するため、索引を持たずワーカープロセスから直接読み書きできる
+    """
+
+    SUFFIX = ".txt.gz"
+
+    def __init__(self, raw_dir, max_size_mb=4096, extractor="pdfplumber"):
+        """
+        Args:
+            raw_dir (str): 保存先ディレクトリ
+            max_size_mb (int, optional): 合計サイズの上限（MB）。prune() で使用
+            extractor (str, optional): 抽出方式の名前
+        """
+        self.raw_dir = raw_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.tag = get_extractor(extractor).cache_tag
+        # 他の抽出方式で抽出したものも、ライブラリのバージョンが同じなら残す
+        self.current_tags = {get_extractor(name).cache_tag for name in EXTRACTORS}
+
+    def get_path(self, content_hash):
+        """
+        PDFの抽出テキストの保存先パスを求める
+
+        Args:
+            content_hash (str): PDFの内容のハッシュ値
+
+        Returns:
+            str: 保存先のファイルパス
+        """
+        return os.path.join(self.raw_dir, f"{content_hash}_{self.tag}{self.SUFFIX}")
+
+    def list_entries(self):
+        """
+        保存済みのテキストを一覧
+
+        Returns:
+            list: (ファイルパス, サイズ, 最終使用時刻, 抽出方式とバージョン (使えない場合はNone))
+                のリスト
+        """
+        if not os.path.isdir(self.raw_dir):
+            return []
+
+        entries = []
+        with os.scandir(self.raw_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    tag = None
+                    if entry.name.endswith(self.SUFFIX):
+                        tag = entry.name[:-len(self.SUFFIX)].partition("_")[2]
+                    entries.append((entry.path, stat.st_size, stat.st_mtime,
+                                    tag if tag in self.current_tags else None))
+        return entries
+
+    def prune(self, max_age_days=None):
+        """
+        使えない・古いテキストを削除し、合計サイズを上限以下にする
+
+        別バージョンのPDFライブラリで抽出したものと書きかけの一時ファイルは常に削除する
+
+        Args:
+            max_age_days (float, optional): この日数より長く使われていないものを削除
+
+        Returns:
+            tuple: (削除した件数, 削除したバイト数)
+        """
+        now = time.time()
+        removed = 0
+        removed_size = 0
+        total = 0
+
+        # 最後に使われた時刻の新しい順に、上限サイズまで残す
+        for path, size, used, usable in sorted(self.list_entries(), key=lambda e: -e[2]):
+            expired = max_age_days is not None and now - used > max_age_days * 86400
+            if usable and not expired and total + size <= self.max_size:
+                total += size
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+                removed_size += size
+            except OSError as e:
+                logger.warning(f"抽出テキストを削除できません: {path} ({str(e)})")
+
+        return removed, removed_size
+
+def iter_raw_text(raw_path):
+    """
+    保存済みの抽出テキストを行ごとに返す
+
+    Args:
+        raw_path (str): RawTextStore.get_path() のパス
+
+    Yields:
+        str: 抽出テキストの行（改行文字付き）
+    """
+    # 最終使用時刻として更新日時を使う
+    os.utime(raw_path)
+    with gzip.open(raw_path, "rt", encoding="utf-8", newline="") as f:
+        yield from f
+
+def tee_raw_text(pages, raw_path):
+    """
+    抽出したページをそのまま返しながら、圧縮して保存する
+
+    最後のページまで読み終えた場合だけ保存先に置くため、途中で失敗した抽出は残らない
+
+    Args:
+        pages (iterable): ページごとのテキスト
+        raw_path (str): RawTextStore.get_path() のパス
+
+    Yields:
+        str: ページのテキスト
+    """
+    ensure_dir(os.path.dirname(raw_path))
+    temp_path = f"{raw_path}.{os.getpid()}.tmp"
+    try:
+        with gzip.open(temp_path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+            for page in pages:
+                f.write(page)
+                yield page
+        os.replace(temp_path, raw_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
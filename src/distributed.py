@@ -0,0 +1,481 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分散処理モジュール - 共有フォルダのリースファイルによる複数ホストでの分担処理
+
+同じ共有フォルダ（NASなど）を使う複数のホスト・プロセスの main.py が、キュー用のフォルダに
+文書ごとのリースファイルを作成して処理する文書を取り合う。リースはハードリンク（使えない
+ファイルシステムでは排他的な作成）で作成するため、同じ文書を取得できるのは1つのワーカー
+だけになる。処理中のリースは一定間隔で更新日時を更新し（ハートビート）、lease_seconds の
+あいだ更新のないリースは停止したワーカーのものとみなし、ほかのワーカーが名前を変えて
+取り除いてから取得し直す。処理が終わった文書は完了の記録を作成してからリースを削除する。
+共有フォルダのほかにブローカーなどのサービスは使わない
+
+キュー用フォルダの構成:
+    leases/<文書のキー>.lease      処理中の文書（内容は取得したワーカー）
+    done/<文書のキー>.<版>          完了した文書（版はPDFのサイズ・更新日時と設定から求める）
+    failed/<文書のキー>.<版>        失敗した文書
+    workers/<ワーカーID>            ワーカーごとの時計（共有フォルダの時刻を求めるのに使う）
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+from datetime import datetime
+from src.batch import iter_process_files
+from src.cache import hash_settings
+from src.journal import get_run_key
+from src.scanner import PdfScanner
+from src.splitter import TextSplitter
+from src.utils import ensure_dir
+from src.logger import setup_logger
+from src.settings import load_settings
+from src.schema import SplitMode, BatchSummary
+
+logger = setup_logger()
+
+LEASE_SUFFIX = ".lease"
+
+def get_document_key(pdf_file, folder_path):
+    """
+    文書のキー（探索フォルダからの相対パスのハッシュ値）
+
+    ホストごとに共有フォルダのマウント先が異なっても同じ文書は同じキーになる
+
+    Args:
+        pdf_file (str): PDFファイルのパス
+        folder_path (str): 探索を開始したフォルダ
+
+    Returns:
+        str: キー
+    """
+    rel_path = os.path.relpath(pdf_file, folder_path).replace(os.sep, "/")
+    return hashlib.sha256(rel_path.encode("utf-8")).hexdigest()[:32]
+
+class LeaseQueue:
+    """
+    共有フォルダのリースファイルによる作業キュー
+
+    ファイルの更新日時は共有フォルダ側の時計で記録されるため、リースの期限切れは
+    ワーカーごとの時計ファイルから求めた共有フォルダの時刻で判定する（ホスト間の時計のずれの影響を受けない）
+    """
+
+    def __init__(self, queue_dir, folder_path, run_key, lease_seconds=120.0, heartbeat_seconds=15.0,
+                 worker_id=None):
+        """
+        Args:
+            queue_dir (str): キュー用の共有フォルダ
+            folder_path (str): 処理する文書を探索するフォルダ（文書のキーの基準）
+            run_key (str): get_run_key() の結果（設定が異なる実行の完了の記録は使わない）
+            lease_seconds (float, optional): ハートビートのないリースを期限切れとみなす秒数
+            heartbeat_seconds (float, optional): リースを更新する間隔（秒）
+            worker_id (str, optional): ワーカーID（指定しない場合は「ホスト名-プロセスID」）
+        """
+        if heartbeat_seconds >= lease_seconds:
+            raise ValueError(f"ハートビートの間隔はリースの期限より短くしてください: "
+                             f"heartbeat_seconds={heartbeat_seconds}, lease_seconds={lease_seconds}")
+        self.queue_dir = queue_dir
+        self.folder_path = folder_path
+        self.run_key = run_key
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_dir = ensure_dir(os.path.join(queue_dir, "leases"))
+        self.done_dir = ensure_dir(os.path.join(queue_dir, "done"))
+        self.failed_dir = ensure_dir(os.path.join(queue_dir, "failed"))
+        self.clock_path = os.path.join(ensure_dir(os.path.join(queue_dir, "workers")), self.worker_id)
+
+        # 取得した件数・期限切れのリースを取得し直した件数
+        self.claimed = 0
+        self.reclaimed = 0
+        # ほかのワーカー・以前の実行で完了していた文書のキー
+        self.finished_elsewhere = set()
+
+        # 処理中の文書: PDFファイルのパス -> (文書のキー, 完了の記録のファイル名)
+        self.held = {}
+        # ほかのワーカーに取得し直されたリースのPDFファイルのパス
+        self.lost = set()
+        self._lock = threading.Lock()
+        self._clock_offset = 0.0
+        self._touch_clock()
+        self.started = self.now()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name="LeaseHeartbeat", daemon=True)
+        self._thread.start()
+
+    def now(self):
+        """共有フォルダの時計での現在時刻（ファイルの更新日時と比べる）"""
+        return time.time() + self._clock_offset
+
+    def scan(self, pdf_files):
+        """
+        完了していない文書を数える
+
+        Args:
+            pdf_files (list): PDFファイルパスのリスト
+
+        Returns:
+            tuple: (完了していない文書数, そのうちリースがないか期限切れで今すぐ取得できる文書数)
+        """
+        done = set(os.listdir(self.done_dir))
+        failed = self._recent_failures()
+        leases = set(os.listdir(self.lease_dir))
+        remaining = 0
+        claimable = 0
+        for pdf_file in pdf_files:
+            key = get_document_key(pdf_file, self.folder_path)
+            try:
+                name = self._record_name(key, pdf_file)
+            except OSError:
+                # 探索後に削除されたファイル
+                continue
+            if name in done or name in failed:
+                continue
+            remaining += 1
+            if key + LEASE_SUFFIX not in leases or self._is_expired(self._lease_path(key)):
+                claimable += 1
+        return remaining, claimable
+
+    def iter_claimed(self, pdf_files):
+        """
+        リースを取得できた文書を返す（ほかのワーカーが処理中・完了済みの文書は飛ばす）
+
+        取り出された時点でリースを取得するため、処理側が次の文書を必要とするまで取得しない。
+        ワーカーごとに異なる位置から順に試し、同じ文書の取り合いを減らす
+
+        Args:
+            pdf_files (list): PDFファイルパスのリスト
+
+        Yields:
+            str: リースを取得したPDFファイルのパス（処理後に complete() を呼ぶ）
+        """
+        pdf_files = list(pdf_files)
+        if pdf_files:
+            start = int(hashlib.sha256(self.worker_id.encode("utf-8")).hexdigest(), 16) % len(pdf_files)
+            pdf_files = pdf_files[start:] + pdf_files[:start]
+
+        done = set(os.listdir(self.done_dir))
+        failed = self._recent_failures()
+        for pdf_file in pdf_files:
+            key = get_document_key(pdf_file, self.folder_path)
+            try:
+                name = self._record_name(key, pdf_file)
+            except OSError:
+                continue
+            if name in done:
+                self.finished_elsewhere.add(key)
+                continue
+            if name in failed or not self._claim(key, pdf_file):
+                continue
+            # 一覧を読んでからリースを取得するまでに、ほかのワーカーが処理を終えていないか確かめる
+            if os.path.exists(os.path.join(self.done_dir, name)):
+                self._release(key)
+                self.finished_elsewhere.add(key)
+                continue
+            with self._lock:
+                self.held[pdf_file] = (key, name)
+            self.claimed += 1
+            yield pdf_file
+
+    def complete(self, result):
+        """
+        処理結果を完了（失敗）の記録に書き込み、リースを削除する
+
+        失敗した文書は、このワーカーより後に起動したワーカーだけが処理し直す
+
+        Args:
+            result (FileResult): iter_claimed() が返した文書の処理結果
+        """
+        with self._lock:
+            held = self.held.pop(result.pdf_path, None)
+            self.lost.discard(result.pdf_path)
+        if held is None:
+            return
+        key, name = held
+        record = {
+            "worker": self.worker_id,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "pdf": os.path.relpath(result.pdf_path, self.folder_path).replace(os.sep, "/"),
+            "success": result.success,
+            "message": result.message,
+            "outputs": result.output_paths,
+        }
+        record_dir = self.done_dir if result.success else self.failed_dir
+        try:
+            self._write_record(os.path.join(record_dir, name), record)
+            if result.success:
+                try:
+                    os.remove(os.path.join(self.failed_dir, name))
+                except FileNotFoundError:
+                    pass
+        except OSError as e:
+            logger.error(f"完了の記録を書き込めません: {result.pdf_path} ({str(e)})")
+        self._release(key)
+
+    def close(self):
+        """ハートビートを止め、処理を終えなかった文書のリースを削除してほかのワーカーに譲る"""
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            held = list(self.held.values())
+            self.held.clear()
+        for key, _ in held:
+            self._release(key)
+        try:
+            os.remove(self.clock_path)
+        except OSError:
+            pass
+
+    def _lease_path(self, key):
+        """文書のリースファイルのパス"""
+        return os.path.join(self.lease_dir, key + LEASE_SUFFIX)
+
+    def _record_name(self, key, pdf_file):
+        """完了の記録のファイル名（PDFのサイズ・更新日時か設定が変わると別の名前になる）"""
+        stat = os.stat(pdf_file)
+        version = f"{self.run_key}:{stat.st_size}:{stat.st_mtime_ns}"
+        return f"{key}.{hashlib.sha256(version.encode('utf-8')).hexdigest()[:16]}"
+
+    def _recent_failures(self):
+        """このワーカーの起動後に失敗した文書の記録のファイル名"""
+        failed = set()
+        for entry in os.scandir(self.failed_dir):
+            try:
+                if entry.stat().st_mtime >= self.started and not entry.name.endswith(".tmp"):
+                    failed.add(entry.name)
+            except OSError:
+                continue
+        return failed
+
+    def _is_expired(self, lease_path):
+        """リースの更新日時が lease_seconds より古いかどうか（削除済みならTrue）"""
+        try:
+            return self.now() - os.stat(lease_path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return True
+
+    def _read_owner(self, lease_path):
+        """リースを取得したワーカーID（読めない場合はNone）"""
+        try:
+            with open(lease_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("worker")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _claim(self, key, pdf_file):
+        """
+        文書のリースを取得する
+
+        リースが期限切れなら名前を変えて取り除いてから取得し直す。名前の変更に成功するのは
+        1つのワーカーだけのため、同じリースを複数のワーカーが取り除くことはない
+        """
+        lease_path = self._lease_path(key)
+        if self._create_lease(lease_path, pdf_file):
+            return True
+        if not self._is_expired(lease_path):
+            return False
+
+        stale_path = f"{lease_path}.{self.worker_id}.stale"
+        try:
+            os.rename(lease_path, stale_path)
+        except OSError:
+            # ほかのワーカーが先に取り除いた
+            return False
+        try:
+            if not self._is_expired(stale_path):
+                # 期限を確認してから名前を変えるまでに、持ち主が更新したか別のワーカーが取得し直した
+                try:
+                    os.link(stale_path, lease_path)
+                except OSError:
+                    pass
+                return False
+            owner = self._read_owner(stale_path)
+        finally:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+
+        if not self._create_lease(lease_path, pdf_file):
+            return False
+        logger.warning(f"期限切れのリースを取得し直しました: {os.path.basename(pdf_file)} "
+                       f"(停止したワーカー: {owner or '不明'})")
+        self.reclaimed += 1
+        return True
+
+    def _create_lease(self, lease_path, pdf_file):
+        """リースファイルを作成（既にある場合はFalse）"""
+        data = json.dumps({
+            "worker": self.worker_id,
+            "pdf": os.path.relpath(pdf_file, self.folder_path).replace(os.sep, "/"),
+            "claimed": datetime.now().isoformat(timespec="seconds"),
+        }, ensure_ascii=False)
+        # 内容を書き終えた一時ファイルをリンクするため、ほかのワーカーが書きかけのリースを読むことはない
+        temp_path = f"{lease_path}.{self.worker_id}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        try:
+            os.link(temp_path, lease_path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # ハードリンクを作れないファイルシステムでは排他的に作成する
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            return True
+        finally:
+            os.remove(temp_path)
+
+    def _release(self, key):
+        """このワーカーのリースを削除（ほかのワーカーに取得し直されていた場合は削除しない）"""
+        lease_path = self._lease_path(key)
+        if self._read_owner(lease_path) == self.worker_id:
+            try:
+                os.remove(lease_path)
+            except FileNotFoundError:
+                pass
+
+    def _write_record(self, path, record):
+        """記録を一時ファイルに書いてから名前を変えて作成"""
+        temp_path = f"{path}.{self.worker_id}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _touch_clock(self):
+        """ワーカーの時計ファイルを更新し、共有フォルダの時刻と手元の時刻の差を求める"""
+        with open(self.clock_path, "a", encoding="utf-8"):
+            pass
+        # 時刻を指定しない更新は、共有フォルダ側の時計で記録される
+        os.utime(self.clock_path)
+        self._clock_offset = os.stat(self.clock_path).st_mtime - time.time()
+
+    def _heartbeat(self):
+        """処理中の文書のリースを一定間隔で更新する（別スレッド）"""
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self._touch_clock()
+            except OSError as e:
+                logger.warning(f"ワーカーの時計ファイルを更新できません: {str(e)}")
+            with self._lock:
+                held = [(pdf_file, key) for pdf_file, (key, _) in self.held.items()
+                        if pdf_file not in self.lost]
+            for pdf_file, key in held:
+                lease_path = self._lease_path(key)
+                if self._read_owner(lease_path) != self.worker_id:
+                    # 更新が遅れて期限切れとみなされた。処理は続け、完了の記録は書き込む
+                    logger.warning(f"リースがほかのワーカーに取得し直されました: {os.path.basename(pdf_file)}")
+                    with self._lock:
+                        self.lost.add(pdf_file)
+                    continue
+                try:
+                    os.utime(lease_path)
+                except OSError as e:
+                    logger.warning(f"リースを更新できません: {os.path.basename(pdf_file)} ({str(e)})")
+
+def process_folder_distributed(folder_path, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                               rebuild_cache=False, recursive=False, include=None, exclude=None,
+                               extractor=None, queue_dir=None, settings=None):
+    """
+    共有フォルダ内のPDFファイルを、同じキュー用フォルダを使うほかのワーカーと分担して処理
+
+    フォルダを1回探索し、リースを取得できた文書だけを処理する（ほかのワーカーが処理中・
+    完了済みの文書は飛ばす）。取得できる文書がなくなった時点で残りの文書がほかのワーカーの
+    処理中なら poll_seconds ごとに確認し、期限切れになったリース（停止したワーカーの文書）を
+    取得し直して処理する。すべての文書が完了するか、このワーカーの起動後に失敗した時点で終了する
+
+    Args:
+        folder_path (str): 処理するPDFが含まれる共有フォルダのパス
+        split_mode (SplitMode | TextSplitter): 分割モード
+        workers (int, optional): このワーカーの並列ワーカー数。指定しない場合は設定ファイルの値を使用
+        use_cache (bool, optional): 結果キャッシュを使うかどうか。指定しない場合は設定ファイルの値を使用
+            （cache_dir はほかのワーカーと共有してもよい。索引はほかのワーカーの変更と併せて保存する）
+        rebuild_cache (bool, optional): キャッシュを使わずに処理し、結果でキャッシュを作り直す
+        recursive (bool, optional): サブフォルダも探索し、フォルダ構成を出力先に再現する
+        include (list, optional): 対象にするファイルのパターン（fnmatch 形式）
+        exclude (list, optional): 除外するファイル・フォルダのパターン（fnmatch 形式）
+        extractor (str, optional): 抽出方式の名前。指定しない場合は設定ファイルの値を使用
+        queue_dir (str, optional): キュー用の共有フォルダ。指定しない場合は [distributed] queue_dir
+            （空なら出力先フォルダの .queue）
+        settings (AppSettings, optional): アプリケーション設定。指定しない場合は設定ファイルから読み込み
+
+    Returns:
+        BatchSummary: このワーカーの処理結果（skipped_count はほかのワーカー・以前の実行で完了していた文書数）
+    """
+    if not os.path.isdir(folder_path):
+        raise ValueError(f"指定されたパスはフォルダではありません: {folder_path}")
+    if settings is None:
+        settings = load_settings()
+    if settings.output.sink == "sqlite":
+        raise ValueError('分散処理では [output] sink = "sqlite" は使えません'
+                         '（共有フォルダ上のSQLiteには複数のホストから安全に書き込めません）。'
+                         'files か jsonl を指定してください')
+    distributed = settings.distributed
+    queue_dir = queue_dir or distributed.queue_dir or os.path.join(settings.output_dir, ".queue")
+
+    scanner = PdfScanner(folder_path, recursive, include, exclude)
+    pdf_files = sorted(scanner)
+    logger.info(scanner.summary())
+    if not pdf_files:
+        logger.warning(f"フォルダ内にPDFファイルが見つかりません: {folder_path}")
+        return BatchSummary()
+    source_root = folder_path if recursive else None
+
+    # 完了の記録は処理結果が同じになる設定ごとに分ける（出力先のパスはホストごとに異なるため含めない）
+    if not isinstance(split_mode, TextSplitter):
+        split_mode = TextSplitter.from_settings(split_mode, settings)
+    settings_hash = hash_settings(settings.formatting.model_dump(), settings.version,
+                                  extractor or settings.extraction.extractor)
+    run_key = get_run_key(settings_hash, split_mode, settings.output)
+
+    queue = LeaseQueue(queue_dir, folder_path, run_key, distributed.lease_seconds,
+                       distributed.heartbeat_seconds)
+    logger.info(f"分散処理を開始: {len(pdf_files)}ファイル, キュー {os.path.abspath(queue_dir)} "
+                f"(ワーカー {queue.worker_id})")
+    total = BatchSummary()
+    try:
+        while True:
+            claimed = queue.claimed
+            summary = BatchSummary()
+            for event in iter_process_files(queue.iter_claimed(pdf_files), split_mode, workers,
+                                            use_cache, rebuild_cache, settings, source_root,
+                                            extractor=extractor, ordered=False, summary=summary):
+                queue.complete(event.result)
+            total.success_count += summary.success_count
+            total.error_count += summary.error_count
+            total.cache_hits += summary.cache_hits
+            total.cache_misses += summary.cache_misses
+
+            # 残りがすべてほかのワーカーの処理中なら、完了するか期限切れになるまで待つ
+            # （取得できるはずの文書を1件も取得できなかった場合も、すぐには試し直さない）
+            retry = queue.claimed > claimed
+            waiting = None
+            while True:
+                remaining, claimable = queue.scan(pdf_files)
+                if not remaining or (claimable and retry):
+                    break
+                if remaining != waiting:
+                    logger.info(f"ほかのワーカーの処理待ち: {remaining}件")
+                    waiting = remaining
+                time.sleep(distributed.poll_seconds)
+                retry = True
+            if not remaining:
+                break
+    finally:
+        queue.close()
+
+    total.skipped_count = len(queue.finished_elsewhere)
+    logger.info(f"分散処理: このワーカーで{queue.claimed}件を処理, "
+                f"ほかのワーカー・以前の実行で完了済み{total.skipped_count}件, "
+                f"期限切れのリースを取得し直した件数 {queue.reclaimed}件")
+    return total
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+抽出モジュール - PDFからのテキスト抽出方式
+
+pdfplumber: 文字ごとの配置を計算してから行を組み立てる（従来どおり、最も忠実）
+pdfminer:   pdfminer のレイアウト解析で行だけを求める（テキストのみ、高速）
+auto:       pdfminer で抽出し、テキストがない・文字化けしたページだけ pdfplumber で抽出し直す
+
+どの方式もPDFライブラリはページを読み取るときに読み込む。
+PDFライブラリは開いている間、解析済みのオブジェクトを保持し続けるため、
+プロセスのRSSが上限を超えた場合は残りのページを一定ページ数ごとに開き直して抽出する
+"""
+
+import gc
+import re
+from abc import ABC, abstractmethod
+from itertools import islice
+from src.metrics import get_rss_mb
+
+# 文字化けとみなす文字（対応する文字がないグリフ、置換文字、制御文字）
+GARBLED_PATTERN = re.compile(r"\(cid:\d+\)|[\ufffd\x00-\x08\x0b\x0c\x0e-\x1f]")
+# この割合以上が GARBLED_PATTERN に一致するページは文字化けとみなす
+GARBLED_RATIO = 0.1
+
+def _get_package_version(name):
+    """インストールされているパッケージのバージョン（パッケージ自体は読み込まない）"""
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+def is_garbled(text):
+    """
+    抽出したテキストが文字化けしているかどうか
+
+    Args:
+        text (str): ページのテキスト
+
+    Returns:
+        bool: 文字化けしているかどうか
+    """
+    if not text:
+        return False
+    garbled = sum(len(match) for match in GARBLED_PATTERN.findall(text))
+    return garbled / len(text) >= GARBLED_RATIO
+
+class PdfExtractor(ABC):
+    """
+    抽出方式の基底クラス
+
+    ワーカープロセスには名前だけを渡し、get_extractor() で取得し直す
+    """
+
+    name = ""
+
+    @property
+    @abstractmethod
+    def cache_tag(self):
+        """抽出テキストの保存名に付ける、抽出方式とライブラリのバージョン"""
+
+    @abstractmethod
+    def page_count(self, pdf_path):
+        """
+        PDFファイルのページ数を取得
+
+        Args:
+            pdf_path (str): PDFファイルのパス
+
+        Returns:
+            int: ページ数
+        """
+
+    @abstractmethod
+    def iter_page_texts(self, pdf_path, start=0, end=None):
+        """
+        ページごとのテキストを返す
+
+        Args:
+            pdf_path (str): PDFファイルのパス
+            start (int, optional): 開始ページ（0始まり）
+            end (int, optional): 終了ページ（含まない）。省略時は最終ページまで
+
+        Yields:
+            str: ページのテキスト（末尾に改行付き。テキストのないページは空文字列）
+        """
+
+    def iter_pages(self, pdf_path, start=0, end=None, memory_limit_mb=None, window_pages=100):
+        """
+        テキストのあるページだけを返す
+
+        memory_limit_mb を指定した場合は、ページごとにプロセスのRSSを確認し、
+        上限を超えたら省メモリ抽出に切り替える。省メモリ抽出では window_pages ページ
+        ごとにPDFを開き直し、解析済みのオブジェクトを保持しない
+
+        Args:
+            pdf_path (str): PDFファイルのパス
+            start (int, optional): 開始ページ（0始まり）
+            end (int, optional): 終了ページ（含まない）。省略時は最終ページまで
+            memory_limit_mb (float, optional): 省メモリ抽出に切り替えるRSS（MB）。
+                0なら最初から省メモリ抽出、Noneなら切り替えない
+            window_pages (int, optional): 省メモリ抽出で一度に開くページ数
+
+        Yields:
+            str: ページのテキスト（末尾に改行付き）
+        """
+        try:
+            position = start
+            low_memory = memory_limit_mb == 0
+            if not low_memory:
+                texts = self.iter_page_texts(pdf_path, start, end)
+                try:
+                    for text in texts:
+                        position += 1
+                        if text:
+                            yield text
+                        if memory_limit_mb and (get_rss_mb() or 0) > memory_limit_mb:
+                            low_memory = True
+                            break
+                finally:
+                    texts.close()
+            if not low_memory:
+                return
+
+            # 開いていたPDFの解析結果を解放してから、残りのページを少しずつ開き直す
+            gc.collect()
+            if end is None:
+                end = self.page_count(pdf_path)
+            window_pages = max(1, window_pages)
+            while position < end:
+                window_end = min(position + window_pages, end)
+                for text in self.iter_page_texts(pdf_path, position, window_end):
+                    if text:
+                        yield text
+                position = window_end
+                gc.collect()
+        except Exception as e:
+            raise ValueError(f"PDFファイルの読み込みに失敗しました: {str(e)}")
+
+class PdfplumberExtractor(PdfExtractor):
+    """pdfplumber による抽出（文字の配置から行を組み立てる）"""
+
+    name = "pdfplumber"
+
+    @property
+    def cache_tag(self):
+        # 抽出方式を選べるようになる前の保存名と同じ
+        return f"pdfplumber-{_get_package_version('pdfplumber')}"
+
+    def page_count(self, pdf_path):
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_page_texts(self, pdf_path, start=0, end=None):
+        import pdfplumber
+        if end is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages[start:]:
+                    yield self.page_text(page)
+        else:
+            # 範囲外のページのオブジェクトは生成しない
+            with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+                for page in pdf.pages:
+                    yield self.page_text(page)
+
+    @staticmethod
+    def page_text(page):
+        """
+        pdfplumber のページのテキスト（末尾に改行付き、テキストがなければ空文字列）
+
+        ページの文字・レイアウトの解析結果はPDFを閉じるまで保持されるため、
+        テキストを取り出したら破棄する
+        """
+        try:
+            page_text = page.extract_text()
+        finally:
+            page.close()
+        return page_text + "\n" if page_text else ""
+
+class PdfminerExtractor(PdfExtractor):
+    """
+    pdfminer による抽出（テキストのみ）
+
+    文字ごとの情報を保持せず、レイアウト解析も行の組み立てまでにとどめる。
+    boxes_flow=None でテキストボックスの階層的な並べ替えを省略し、
+    上から下・左から右の順に並べる
+    """
+
+    name = "pdfminer"
+    # pdfminer の LAParams に渡すレイアウト解析のパラメータ
+    LAPARAMS = {"line_margin": 0.5, "char_margin": 2.0, "word_margin": 0.1,
+                "boxes_flow": None, "detect_vertical": False, "all_texts": False}
+
+    @property
+    def cache_tag(self):
+        return f"pdfminer-{_get_package_version('pdfminer.six')}"
+
+    def page_count(self, pdf_path):
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        with open(pdf_path, "rb") as f:
+            document = PDFDocument(PDFParser(f))
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+    def iter_page_texts(self, pdf_path, start=0, end=None):
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextBox
+
+        with open(pdf_path, "rb") as f:
+            document = PDFDocument(PDFParser(f))
+            manager = PDFResourceManager(caching=True)
+            device = PDFPageAggregator(manager, laparams=LAParams(**self.LAPARAMS))
+            interpreter = PDFPageInterpreter(manager, device)
+            for page in islice(PDFPage.create_pages(document), start, end):
+                interpreter.process_page(page)
+                # テキストボックスの各行は改行で終わる
+                yield "".join(item.get_text() for item in device.get_result()
+                              if isinstance(item, LTTextBox))
+
+class AutoExtractor(PdfExtractor):
+    """
+    pdfminer で抽出し、テキストがない・文字化けしたページだけ pdfplumber で抽出し直す
+
+    pdfplumber はフォールバックが必要になったときに初めてファイルを開く
+    """
+
+    name = "auto"
+
+    def __init__(self):
+        self.fast = PdfminerExtractor()
+        self.fallback = PdfplumberExtractor()
+
+    @property
+    def cache_tag(self):
+        return f"auto-{self.fast.cache_tag}-{self.fallback.cache_tag}"
+
+    def page_count(self, pdf_path):
+        return self.fast.page_count(pdf_path)
+
+    def iter_page_texts(self, pdf_path, start=0, end=None):
+        pdf = None
+        try:
+            for index, text in enumerate(self.fast.iter_page_texts(pdf_path, start, end), start):
+                if not text.strip() or is_garbled(text):
+                    if pdf is None:
+                        import pdfplumber
+                        pdf = pdfplumber.open(pdf_path)
+                    text = self.fallback.page_text(pdf.pages[index])
+                yield text
+        finally:
+            if pdf is not None:
+                pdf.close()
+
+# 抽出方式の名前 -> クラス（[extraction] extractor と --extractor で選択）
+EXTRACTORS = {
+    "pdfplumber": PdfplumberExtractor,
+    "pdfminer": PdfminerExtractor,
+    "auto": AutoExtractor,
+}
+
+_extractors = {}
+
+def get_extractor(name="pdfplumber"):
+    """
+    抽出方式を取得（プロセスごとに1回だけ生成）
+
+    Args:
+        name (str, optional): 抽出方式の名前（EXTRACTORS のキー）
+
+    Returns:
+        PdfExtractor: 抽出方式
+    """
+    if name not in EXTRACTORS:
+        raise ValueError(f"不明な抽出方式です: {name}")
+    if name not in _extractors:
+        _extractors[name] = EXTRACTORS[name]()
+    return _extractors[name]
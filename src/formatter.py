@@ -6,27 +6,42 @@
 """
 
 import re
+from itertools import islice
 from src.logger import setup_logger
 from src.settings import load_settings
 
 logger = setup_logger()
 
+# 設定ファイル由来の整形ルールと、構築に使った設定（設定が読み込み直されたら構築し直す）
+_default_formatter = None
+_default_settings = None
+
+# 一括処理エンジンで一度に連結する行数と、連結に使う区切り文字（入力に含まれる場合は1行ずつ処理）
+BULK_LINES = 1024
+BULK_SEPARATOR = '\x00'
+
 def format_text(text, config=None):
     """
     テキストを整形処理する
 
     Args:
         text (str): 整形前のテキスト
-        config (dict, optional): 整形設定。指定しない場合は設定ファイルから読み込み
+        config (dict | CompiledFormatter, optional): 整形設定または構築済みの整形ルール。
+            指定しない場合は設定ファイルから読み込み
 
     Returns:
         str: 整形後のテキスト
     """
+    global _default_formatter, _default_settings
+
     if not config:
         settings = load_settings()
-        config = settings.get('formatting', {})
+        if _default_formatter is None or settings is not _default_settings:
+            _default_formatter = CompiledFormatter(settings.get('formatting', {}))
+            _default_settings = settings
+        config = _default_formatter
 
-    logger.info("テキスト整形開始")
+    logger.debug("テキスト整形開始")
 
     if not text:
         logger.warning("空のテキストが入力されました")
@@ -34,70 +49,364 @@ def format_text(text, config=None):
 
     # 行ごとに分割
     sentences = text.splitlines()
-    result_lines = []
 
-    # 整形フラグ
-    is_first_line = True
-    in_quote = False
+    result = ''.join(StreamFormatter(config).format_lines(sentences))
+
+    logger.debug(f"テキスト整形完了: {len(sentences)}行 -> {len(result.splitlines())}行")
+    return result
+
+class CompiledFormatter:
+    """
+    構築済みの整形ルール
+
+    is_bullet_point / insert_line_breaks は呼び出しのたびに設定から記号リストや
+    改行文字を組み立て直すため、1実行につき1回だけ設定を解釈してここに保持する。
+    ピクル化できるのでワーカープロセスにもそのまま渡せる
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): 整形設定
+        """
+        self.remove_tab = config.get('remove_tab', True)
+        self.remove_space = config.get('remove_space', True) and not config.get('english_mode', False)
+        self.paragraph_break = config.get('paragraph_break', False)
+        self.quote_break_inside = config.get('quote_break_inside', False)
+
+        # 箇条書き記号
+        bullet_symbols = config.get('bullet_symbols', ['・', '●', '〇', '■', '□', '◆', '◇', '▲', '△', '▼', '▽'])
+        custom_bullets = config.get('custom_bullets', [])
+        if isinstance(custom_bullets, str):
+            custom_bullets = custom_bullets.split(',')
+        self.bullets = frozenset(list(bullet_symbols) + list(custom_bullets))
+
+        # 改行対象の文字と置換後の文字列
+        break_chars = []
+        if config.get('break_at_kuten', True):
+            break_chars.append('。')
+        if config.get('break_at_dot', False):
+            break_chars.append('．')
+        custom_breaks = config.get('custom_break_chars', [])
+        if isinstance(custom_breaks, str):
+            custom_breaks = custom_breaks.split(',')
+        break_chars.extend(custom_breaks)
+        # str.translate や正規表現の一括置換より、文字ごとの str.replace の方が
+        # 通常の行では高速なため、置換表を順に適用する
+        self.break_replacements = tuple((char, char + '\n') for char in break_chars)
+
+        # 英文用のピリオド処理
+        self.english_pattern = re.compile(r'\. +([A-Z])') if config.get('english_mode', False) else None
+
+        # 「」内も改行する場合に改行を」「で区切り直すかどうか
+        self.close_quote_inside = self.quote_break_inside and config.get('add_closing_quote', True)
+
+        # 一括処理エンジン（engine = "fast" の場合のみ）。行ごとの置換の呼び出しが
+        # 処理時間の大半を占めるため、BULK_LINES 行ずつ連結して空白の削除と改行の挿入を
+        # まとめて行い、行ごとには「」・箇条書きの状態の判定だけを行う
+        self.bulk = config.get('engine', 'legacy') == 'fast' and _is_single_pass_safe(break_chars)
+        self.quote_pattern = None
+        if self.bulk and self.close_quote_inside:
+            self._compile_quote_pattern(break_chars)
+
+    def _compile_quote_pattern(self, break_chars):
+        """
+        「」内の改行挿入を1回の走査で行う正規表現を構築
+
+        Args:
+            break_chars (list): 改行対象の文字（1文字ずつ、重複なし）
+        """
+        char_class = '[' + ''.join(re.escape(char) for char in break_chars) + ']' if break_chars else None
+
+        # 改行を」「で区切り直して空の「」を除き、」の後で改行する3回の置換を、
+        # 次の対応表による1回の置換で行う
+        #   改行文字 + 」 -> 改行文字 + 」\n（直後の」と空の「」が打ち消し合う）
+        #   改行文字     -> 改行文字 + 」\n「
+        #   英文のピリオド -> .」\n「
+        #   「」         -> 空文字列
+        #   」           -> 」\n
+        quote_branches = [f'{char_class}」?'] if char_class else []
+        if self.english_pattern is not None:
+            quote_branches.append(r'\. +(?=[A-Z])')
+        quote_branches.extend(['「」', '」'])
+        self.quote_pattern = re.compile('|'.join(quote_branches))
+
+        table = {'「」': '', '」': '」\n'}
+        for char in break_chars:
+            table[char] = char + '」\n「'
+            table[char + '」'] = char + '」\n'
+        self.quote_table = table
+
+    def _replace_quote(self, match):
+        """quote_pattern の一致箇所を置換後の文字列に変換（対応表にない一致は英文のピリオド）"""
+        return self.quote_table.get(match.group(), '.」\n「')
+
+    def is_bullet_point(self, line):
+        """
+        行が箇条書きかどうかを判定
+
+        Args:
+            line (str): 判定する行
+
+        Returns:
+            bool: 箇条書きならTrue
+        """
+        return len(line) > 0 and line[0] in self.bullets
+
+    def insert_line_breaks(self, text, in_quote):
+        """
+        改行を挿入（insert_line_breaks と同じ結果）
+
+        Args:
+            text (str): 改行を挿入するテキスト
+            in_quote (bool): 「」内かどうか
+
+        Returns:
+            str: 改行挿入後のテキスト
+        """
+        # 既存の改行は」「の対応を崩すため、従来どおり順に置換する
+        if in_quote and self.quote_pattern is not None and '\n' not in text:
+            return self.quote_pattern.sub(self._replace_quote, text)
+
+        for char, replacement in self.break_replacements:
+            if char in text:
+                text = text.replace(char, replacement)
+
+        if self.english_pattern is not None:
+            text = self.english_pattern.sub(r'.\n\1', text)
+
+        if in_quote and self.close_quote_inside:
+            text = text.replace('\n', '」「')
+            text = text.replace('「」', '')
+            text = text.replace('」', '」\n')
+
+        return text
+
+def _is_single_pass_safe(break_chars):
+    """
+    改行文字を1回の走査で置換しても順次置換と同じ結果になるかどうか
 
-    for line in sentences:
+    複数文字・重複した改行文字や、空白・改行・「」（と、一括処理で行の区切りに使う文字）を
+    改行文字にした場合は置換の順序や行の区切りで結果が変わるため、従来どおり1行ずつ置換する
+
+    Args:
+        break_chars (list): 改行対象の文字
+
+    Returns:
+        bool: 一括置換できる場合はTrue
+    """
+    return (len(set(break_chars)) == len(break_chars)
+            and all(len(char) == 1 and char not in ' \n「」' + BULK_SEPARATOR for char in break_chars))
+
+class StreamFormatter:
+    """
+    行単位の逐次整形処理
+
+    format_text と同じ規則で1行ずつ整形し、確定した部分から出力する。
+    「」内かどうか・先頭行かどうかの状態を保持するため、ページごとに
+    行を渡しても全文をまとめて整形した場合と同じ結果になる
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict | CompiledFormatter): 整形設定または構築済みの整形ルール
+        """
+        if not isinstance(config, CompiledFormatter):
+            config = CompiledFormatter(config)
+        self.rules = config
+
+        # 整形フラグ
+        self.is_first_line = True
+        self.in_quote = False
+
+        # 直前の出力行（次の行の内容によって末尾に改行が付くため保留する）
+        self._pending = None
+
+    def format_lines(self, lines):
+        """
+        行の反復子を整形し、確定した出力文字列を順に返す
+
+        Args:
+            lines (iterable): 整形前の行（改行文字を含まない）
+
+        Yields:
+            str: 整形後のテキスト片（連結すると format_text の結果と一致）
+        """
+        if self.rules.bulk:
+            lines = iter(lines)
+            while True:
+                chunk = list(islice(lines, BULK_LINES))
+                if not chunk:
+                    break
+                output = self._feed_bulk(chunk)
+                if output:
+                    yield output
+        else:
+            for line in lines:
+                output = self.feed(line)
+                if output:
+                    yield output
+
+        output = self.close()
+        if output:
+            yield output
+
+    def feed(self, line):
+        """
+        1行を整形する
+
+        Args:
+            line (str): 整形前の行
+
+        Returns:
+            str: この行の入力で確定した出力（まだ確定しない場合は空文字列）
+        """
+        rules = self.rules
         processed_line = line.strip()
 
         # 空行はスキップ
         if len(processed_line) <= 2:
-            result_lines.append("")
-            continue
+            return self._append("")
 
         # タブの削除
-        if config.get('remove_tab', True):
+        if rules.remove_tab:
             processed_line = processed_line.replace('\t', '')
 
         # スペースの削除
-        if config.get('remove_space', True) and not config.get('english_mode', False):
+        if rules.remove_space:
             processed_line = processed_line.replace(' ', '').replace('　', '')
 
         # 箇条書きの処理
-        if is_bullet_point(processed_line, config):
-            if result_lines and not result_lines[-1].endswith('\n'):
-                result_lines[-1] += '\n'
-            result_lines.append(processed_line)
-            continue
+        if rules.is_bullet_point(processed_line):
+            self._end_previous_line()
+            return self._append(processed_line)
 
         # 段落処理
-        if config.get('paragraph_break', False):
-            if not is_first_line and len(processed_line) > 2 and (processed_line[0] == ' ' or processed_line[0] == '　'):
-                if result_lines and not result_lines[-1].endswith('\n'):
-                    result_lines[-1] += '\n'
+        if rules.paragraph_break:
+            if not self.is_first_line and len(processed_line) > 2 and (processed_line[0] == ' ' or processed_line[0] == '　'):
+                self._end_previous_line()
                 # 字下げを追加（全角スペース2つ）
                 processed_line = '　　' + processed_line.lstrip()
 
-        is_first_line = False
+        self.is_first_line = False
 
         # 「」の処理
         if processed_line.startswith('「'):
-            in_quote = True
-            if result_lines and not result_lines[-1].endswith('\n'):
-                result_lines[-1] += '\n'
+            self.in_quote = True
+            self._end_previous_line()
 
         # 改行処理
-        processed_line = insert_line_breaks(processed_line, in_quote, config)
+        processed_line = rules.insert_line_breaks(processed_line, self.in_quote)
 
         # 「」内の処理
-        if in_quote and '」' in processed_line:
-            if not config.get('quote_break_inside', False):
+        if self.in_quote and '」' in processed_line:
+            if not rules.quote_break_inside:
                 # 「」内は改行しない設定の場合
                 processed_line = processed_line.replace('」\n', '」')
                 processed_line += '\n'
 
-            in_quote = False
-
-        result_lines.append(processed_line)
-
-    # 結果を結合
-    result = '\n'.join(result_lines)
-
-    logger.info(f"テキスト整形完了: {len(sentences)}行 -> {len(result.splitlines())}行")
-    return result
+            self.in_quote = False
+
+        return self._append(processed_line)
+
+    def _feed_bulk(self, lines):
+        """
+        複数行をまとめて整形する（feed を1行ずつ呼んだ場合と同じ結果）
+
+        Args:
+            lines (list): 整形前の行
+
+        Returns:
+            str: これらの行の入力で確定した出力
+        """
+        rules = self.rules
+        stripped = [line.strip() for line in lines]
+        text = BULK_SEPARATOR.join(stripped)
+        if text.count(BULK_SEPARATOR) != len(stripped) - 1:
+            return ''.join(self.feed(line) for line in lines)
+
+        # 空白の削除と改行の挿入を連結したテキストに対して行い、行ごとに分け直す
+        if rules.remove_tab:
+            text = text.replace('\t', '')
+        if rules.remove_space:
+            text = text.replace(' ', '').replace('　', '')
+        cleaned = text.split(BULK_SEPARATOR)
+        for char, replacement in rules.break_replacements:
+            if char in text:
+                text = text.replace(char, replacement)
+        if rules.english_pattern is not None:
+            text = rules.english_pattern.sub(r'.\n\1', text)
+        broken = text.split(BULK_SEPARATOR)
+
+        # feed と同じ判定を、状態をローカル変数に持って行う
+        bullets = rules.bullets
+        paragraph_break = rules.paragraph_break
+        close_quote_inside = rules.close_quote_inside
+        quote_break_inside = rules.quote_break_inside
+        pending = self._pending
+        in_quote = self.in_quote
+        is_first_line = self.is_first_line
+        output = []
+        for line, processed_line, broken_line in zip(stripped, cleaned, broken):
+            if len(line) <= 2:
+                broken_line = ""
+            elif processed_line and processed_line[0] in bullets:
+                broken_line = processed_line
+                if pending is not None and not pending.endswith('\n'):
+                    pending += '\n'
+            else:
+                if (paragraph_break and not is_first_line and len(processed_line) > 2
+                        and processed_line[0] in ' 　'):
+                    if pending is not None and not pending.endswith('\n'):
+                        pending += '\n'
+                    processed_line = '　　' + processed_line.lstrip()
+                    broken_line = None
+                is_first_line = False
+
+                if processed_line.startswith('「'):
+                    in_quote = True
+                    if pending is not None and not pending.endswith('\n'):
+                        pending += '\n'
+
+                if broken_line is None or (in_quote and close_quote_inside):
+                    broken_line = rules.insert_line_breaks(processed_line, in_quote)
+
+                if in_quote and '」' in broken_line:
+                    if not quote_break_inside:
+                        broken_line = broken_line.replace('」\n', '」') + '\n'
+                    in_quote = False
+
+            if pending is not None:
+                output.append(pending + '\n')
+            pending = broken_line
+
+        self._pending = pending
+        self.in_quote = in_quote
+        self.is_first_line = is_first_line
+        return ''.join(output)
+
+    def close(self):
+        """
+        保留中の最終行を出力する
+
+        Returns:
+            str: 残りの出力
+        """
+        output = self._pending or ""
+        self._pending = None
+        return output
+
+    def _append(self, line):
+        """行を追加し、確定した直前の行を区切りの改行付きで返す"""
+        output = "" if self._pending is None else self._pending + '\n'
+        self._pending = line
+        return output
+
+    def _end_previous_line(self):
+        """直前の行の末尾に改行を付ける"""
+        if self._pending is not None and not self._pending.endswith('\n'):
+            self._pending += '\n'
 
 def is_bullet_point(line, config):
     """
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+実行記録モジュール - 処理済みの文書の記録と再開
+
+処理が終わった文書を1件ずつログフォルダの journal.jsonl に追記する（元のPDFのサイズ・
+更新日時・内容のハッシュ値と出力パス）。1件ごとに OS へ書き出すため、プロセスが
+強制終了されても記録は失われない。fsync は一定の件数・秒数ごとにまとめて行う。
+--resume では同じ設定で処理した記録を読み、PDFが変わっておらず出力も残っている
+文書を処理済みとして飛ばす
+"""
+
+import os
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta
+from src.cache import hash_file
+from src.splitter import get_splitter
+from src.logger import setup_logger, get_log_dir
+
+logger = setup_logger()
+
+# ログフォルダ（log/日付/）の中の記録ファイル名
+JOURNAL_FILE = "journal.jsonl"
+
+def get_run_key(settings_hash, split_mode, output, output_dir=None):
+    """
+    処理結果が同じになる設定の組み合わせを表すキー（同じキーの記録だけを再開に使う）
+
+    Args:
+        settings_hash (str): hash_settings() の結果（整形設定・抽出方式・バージョン）
+        split_mode (SplitMode | TextSplitter): 分割モード
+        output (OutputSettings): 出力先の設定
+        output_dir (str, optional): 出力先フォルダ（共有フォルダのようにホストごとにパスが
+            異なる場合は指定しない）
+
+    Returns:
+        str: キー
+    """
+    key = json.dumps([settings_hash, get_splitter(split_mode).cache_tag, output.sink,
+                      output_dir and os.path.abspath(output_dir)], ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+class RunJournal:
+    """
+    処理済みの文書の記録（追記のみ）
+
+    1件ごとに OS へ書き出し、sync_documents 件ごと、または前回の fsync から
+    sync_seconds 秒が経った時点で fsync する
+    """
+
+    def __init__(self, journal_path, run_key, store=None, sync_documents=100, sync_seconds=1.0):
+        """
+        Args:
+            journal_path (str): 記録ファイルのパス
+            run_key (str): get_run_key() の結果
+            store (OutputStore, optional): 出力先（指定しない場合は出力ファイルのサイズも記録する）
+            sync_documents (int, optional): fsync するまでの件数
+            sync_seconds (float, optional): fsync するまでの秒数
+        """
+        self.journal_path = journal_path
+        self.run_key = run_key
+        self.store = store
+        self.sync_documents = sync_documents
+        self.sync_seconds = sync_seconds
+        self.syncs = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        self._file = open(journal_path, "ab")
+
+    def record(self, result, known_hash=None):
+        """
+        処理が終わった文書を記録
+
+        Args:
+            result (FileResult): 成功した処理結果
+            known_hash (list, optional): 計算済みの [サイズ, 更新日時, 内容のハッシュ値]
+                （結果キャッシュの値。PDFのサイズ・更新日時が同じ場合だけ使い、それ以外は計算する）
+        """
+        pdf_path = os.path.abspath(result.pdf_path)
+        stat = os.stat(pdf_path)
+        if known_hash and known_hash[0] == stat.st_size and known_hash[1] == stat.st_mtime_ns:
+            content_hash = known_hash[2]
+        else:
+            content_hash = hash_file(pdf_path)
+        entry = {
+            "run": self.run_key,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "pdf": pdf_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash,
+            "outputs": [os.path.abspath(path) for path in result.output_paths],
+            # 出力先にまとめて保存した場合は出力ファイルがないため記録しない
+            "output_sizes": (None if self.store is not None
+                             else [os.path.getsize(path) for path in result.output_paths]),
+        }
+        self._file.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._file.flush()
+        self._unsynced += 1
+        if (self._unsynced >= self.sync_documents
+                or time.monotonic() - self._last_sync >= self.sync_seconds):
+            self.sync()
+
+    def sync(self):
+        """記録をディスクに書き込む"""
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """残りの記録をディスクに書き込んで閉じる"""
+        self.sync()
+        self._file.close()
+
+def load_completed(run_key, days=7, log_dir=None):
+    """
+    過去 days 日分のログフォルダの記録から、同じ設定で処理済みの文書を読み込む
+
+    書きかけの行（強制終了した場合の最後の行）は無視する
+
+    Args:
+        run_key (str): get_run_key() の結果
+        days (int, optional): 読み込む日数（今日を含む）
+        log_dir (str, optional): ログフォルダ（指定しない場合は get_log_dir()）
+
+    Returns:
+        dict: PDFの絶対パス -> 記録（同じPDFの記録が複数ある場合は最後のもの）
+    """
+    log_dir = log_dir or get_log_dir()
+    oldest = (datetime.now() - timedelta(days=days - 1)).strftime('%Y%m%d')
+    completed = {}
+    if not os.path.isdir(log_dir):
+        return completed
+    for name in sorted(os.listdir(log_dir)):
+        journal_path = os.path.join(log_dir, name, JOURNAL_FILE)
+        if not (name.isdigit() and name >= oldest and os.path.exists(journal_path)):
+            continue
+        with open(journal_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("run") == run_key:
+                    completed[entry["pdf"]] = entry
+    return completed
+
+def is_completed(entry, pdf_file, store=None):
+    """
+    記録した文書を処理し直す必要がないかを確かめる
+
+    PDFのサイズ・更新日時が記録と同じなら読まずに同じ内容とみなし、更新日時だけが
+    異なる場合は内容のハッシュ値で比べる。出力ファイルは残っていてサイズが記録と
+    同じこと（出力先にまとめて保存した場合は出力先にあること）を確かめる
+
+    Args:
+        entry (dict): load_completed() の記録
+        pdf_file (str): PDFファイルのパス
+        store (OutputStore, optional): 出力先
+
+    Returns:
+        bool: 処理済みとして飛ばせる場合はTrue
+    """
+    try:
+        stat = os.stat(pdf_file)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"] and hash_file(pdf_file) != entry["sha256"]:
+            return False
+
+        sizes = entry.get("output_sizes")
+        for number, path in enumerate(entry["outputs"]):
+            if store is not None:
+                if not store.contains(path):
+                    return False
+            elif sizes is None or os.path.getsize(path) != sizes[number]:
+                return False
+    except (OSError, KeyError, IndexError, TypeError):
+        return False
+    return bool(entry["outputs"])
@@ -7,6 +7,7 @@
 
 import os
 import sys
+import multiprocessing
 from datetime import datetime
 from loguru import logger
 from src.utils import ensure_dir
@@ -34,31 +35,75 @@ def get_log_file_path():
     ensure_dir(log_dir)
     return os.path.join(log_dir, "実行ログ.txt")
 
-def setup_logger():
+def get_metrics_file_path():
+    """
+    現在の日付に対応する処理時間の記録ファイルパスを取得（ログファイルと同じフォルダ）
+
+    Returns:
+        str: 記録ファイル（JSON Lines）のパス
+    """
+    return os.path.join(os.path.dirname(get_log_file_path()), "metrics.jsonl")
+
+def get_journal_file_path():
+    """
+    現在の日付に対応する実行記録ファイルパスを取得（ログファイルと同じフォルダ）
+
+    Returns:
+        str: 記録ファイル（JSON Lines）のパス
+    """
+    return os.path.join(os.path.dirname(get_log_file_path()), "journal.jsonl")
+
+# setup_logger() で設定済みのログレベル（未設定ならNone）
+_configured_level = None
+
+CONSOLE_FORMAT = ("<level>{level: <8}</level> | <green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+                  "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+FILE_FORMAT = "[{time:YYYY-MM-DD HH:mm:ss}] {level} - {message}"
+
+def setup_logger(level=None):
     """
     ロガーを設定する
 
+    出力先の設定はプロセスごとに1回だけ行い、2回目以降は設定済みのロガーを
+    そのまま返す（level を指定し、設定済みのレベルと異なる場合だけ設定し直す）。
+    ファイル出力はキュー経由で書き込むため、fork で生成されたワーカープロセスの
+    ログも親プロセスが1つのファイルにまとめて書き込む。spawn で生成された
+    ワーカープロセスではファイルを開かず、警告以上を標準エラーに出力する
+
+    Args:
+        level (str, optional): ログレベル（DEBUG, INFO, WARNING, ERROR）。
+            指定しない場合は初回は INFO、2回目以降は変更しない
+
     Returns:
         Logger: 設定済みのロガーオブジェクト
     """
+    global _configured_level
+
+    if _configured_level is not None and (level is None or level == _configured_level):
+        return logger
+    level = level or _configured_level or "INFO"
+    _configured_level = level
+
     # 既存のハンドラをクリア
     logger.remove()
 
+    if multiprocessing.parent_process() is not None:
+        # spawn で生成されたワーカープロセス（処理結果は親プロセスがログに出力する）
+        logger.add(sys.stderr, format=CONSOLE_FORMAT, level="WARNING")
+        return logger
+
     # コンソール出力の設定
-    logger.add(
-        sys.stderr,
-        format="<level>{level: <8}</level> | <green>{time:YYYY-MM-DD HH:mm:ss}</green> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level="INFO"
-    )
+    logger.add(sys.stderr, format=CONSOLE_FORMAT, level=level)
 
     # ファイル出力の設定
     log_file = get_log_file_path()
     logger.add(
         log_file,
-        format="[{time:YYYY-MM-DD HH:mm:ss}] {level} - {message}",
-        level="INFO",
+        format=FILE_FORMAT,
+        level=level,
         rotation="1 day",
-        compression="zip"
+        compression="zip",
+        enqueue=True
     )
 
-    return logger
\ No newline at end of file
+    return logger
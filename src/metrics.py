@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+処理時間の計測モジュール - ファイルごとの段階別処理時間の記録と集計
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from src.schema import FileMetrics
+
+# 集計表に表示する段階（FileMetrics の項目名, 表示名）
+STAGES = [
+    ("extract_seconds", "抽出"),
+    ("format_seconds", "整形"),
+    ("split_seconds", "分割"),
+    ("save_seconds", "保存"),
+    ("total_seconds", "全体"),
+]
+
+def get_peak_rss_mb():
+    """
+    このプロセスの最大RSS（MB）を取得
+
+    Returns:
+        float | None: 最大RSS（取得できない環境ではNone）
+    """
+    try:
+        import resource
+    except ImportError:
+        return _get_windows_peak_rss_mb()
+
+    # Linux は KB、macOS はバイト単位
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    unit = 1 if sys.platform == "darwin" else 1024
+    return round(peak * unit / (1024 * 1024), 1)
+
+def get_rss_mb():
+    """
+    このプロセスの現在のRSS（MB）を取得
+
+    Returns:
+        float | None: 現在のRSS（取得できない環境ではNone）
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident = int(f.read().split()[1])
+        return resident * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _get_windows_rss_mb()
+
+def get_process_rss_mb(pid):
+    """
+    指定したプロセス（ワーカープロセスなど）の現在のRSS（MB）を取得
+
+    Args:
+        pid (int): プロセスID
+
+    Returns:
+        float | None: 現在のRSS（終了済みのプロセスや取得できない環境ではNone）
+    """
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident = int(f.read().split()[1])
+        return resident * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        if os.name != "nt":
+            return None
+        return _get_windows_rss_mb(pid)
+
+def _get_windows_peak_rss_mb():
+    """Windows の最大ワーキングセット（MB）"""
+    counters = _get_windows_memory_counters()
+    if counters is None:
+        return None
+    return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+
+def _get_windows_rss_mb(pid=None):
+    """Windows の現在のワーキングセット（MB）"""
+    counters = _get_windows_memory_counters(pid)
+    if counters is None:
+        return None
+    return counters.WorkingSetSize / (1024 * 1024)
+
+def _get_windows_memory_counters(pid=None):
+    """Windows のプロセスのメモリ使用量（pid を省略した場合はこのプロセス、取得できない環境ではNone）"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        if pid is None:
+            process = kernel32.GetCurrentProcess()
+        else:
+            # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+            process = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+            if not process:
+                return None
+        try:
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                                            counters.cb):
+                return None
+        finally:
+            if pid is not None:
+                kernel32.CloseHandle(process)
+        return counters
+    except (ImportError, AttributeError, OSError):
+        return None
+
+class FileTimer:
+    """
+    PDF1ファイル分の段階別処理時間の計測
+
+    抽出・整形・書き出しは反復子を通じて交互に進むため、各反復子の
+    次の値を取り出している時間だけを段階ごとに合計する
+    """
+
+    def __init__(self, pdf_file, source="pdf"):
+        """
+        Args:
+            pdf_file (str): PDFファイルのパス
+            source (str, optional): 入力元（FileMetrics.source を参照）
+        """
+        self.start = time.perf_counter()
+        self.source = source
+        self.pages = 0
+        self.extract_seconds = 0.0
+        self.format_seconds = 0.0
+        try:
+            self.input_bytes = os.path.getsize(pdf_file)
+        except OSError:
+            self.input_bytes = 0
+
+    def iter_pages(self, pages):
+        """
+        ページを取り出す時間を抽出時間として計測
+
+        Args:
+            pages (iterable): ページごとのテキスト（保存済みの抽出テキストの場合は行）
+
+        Yields:
+            str: pages の各要素
+        """
+        pages = iter(pages)
+        while True:
+            start = time.perf_counter()
+            page = next(pages, None)
+            self.extract_seconds += time.perf_counter() - start
+            if page is None:
+                return
+            self.pages += 1
+            yield page
+
+    def iter_formatted(self, chunks):
+        """
+        整形結果を取り出す時間から、その間の抽出時間を除いて整形時間として計測
+
+        Args:
+            chunks (iterable): 整形済みのテキスト片
+
+        Yields:
+            str: chunks の各要素
+        """
+        chunks = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            extracted = self.extract_seconds
+            chunk = next(chunks, None)
+            self.format_seconds += (time.perf_counter() - start) - (self.extract_seconds - extracted)
+            if chunk is None:
+                return
+            yield chunk
+
+    def finish(self, write_stats=None):
+        """
+        計測結果を生成
+
+        Args:
+            write_stats (dict, optional): 書き出しスレッドの計測結果
+                （split_seconds, save_seconds, output_bytes, finished）
+
+        Returns:
+            FileMetrics: 処理時間・サイズ
+        """
+        write_stats = write_stats or {}
+        end = write_stats.get("finished", time.perf_counter())
+        return FileMetrics(
+            source=self.source,
+            pages=self.pages if self.source == "pdf" else None,
+            input_bytes=self.input_bytes,
+            output_bytes=write_stats.get("output_bytes", 0),
+            extract_seconds=self.extract_seconds,
+            format_seconds=self.format_seconds,
+            split_seconds=write_stats.get("split_seconds", 0.0),
+            save_seconds=write_stats.get("save_seconds", 0.0),
+            total_seconds=end - self.start,
+            peak_rss_mb=get_peak_rss_mb(),
+        )
+
+def percentile(values, rate):
+    """
+    ソート済みの値の百分位数（最近傍順位法）
+
+    Args:
+        values (list): 昇順にソートした値
+        rate (float): 0〜100
+
+    Returns:
+        float: 百分位数
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * rate // 100))
+    return values[int(rank) - 1]
+
+class MetricsRecorder:
+    """
+    1回の実行分のファイルごとの処理時間の記録
+
+    処理結果を受け取るたびに JSON Lines で追記し、終了時に段階ごとの
+    百分位数と処理に時間がかかったファイルを集計する
+    """
+
+    def __init__(self, metrics_path):
+        """
+        Args:
+            metrics_path (str): 記録ファイル（JSON Lines）のパス
+        """
+        self.metrics_path = metrics_path
+        self.run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.records = []
+        os.makedirs(os.path.dirname(metrics_path) or ".", exist_ok=True)
+        self._file = open(metrics_path, "a", encoding="utf-8")
+
+    def record(self, result):
+        """
+        処理結果の計測値を記録（計測値のない結果は無視）
+
+        Args:
+            result (FileResult): 処理結果
+        """
+        if result.metrics is None:
+            return
+        self.records.append((result.pdf_path, result.metrics))
+        line = {"run": self.run_id, "time": datetime.now().isoformat(timespec="seconds"),
+                "file": result.pdf_path, "success": result.success}
+        line.update({key: round(value, 6) if isinstance(value, float) else value
+                     for key, value in result.metrics.model_dump().items()})
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """記録ファイルを閉じる"""
+        self._file.close()
+
+    def summary_lines(self, slowest=5):
+        """
+        集計表を行のリストで返す
+
+        Args:
+            slowest (int, optional): 処理に時間がかかったファイルの表示件数
+
+        Returns:
+            list: 集計表の行（記録がない場合は空）
+        """
+        if not self.records:
+            return []
+
+        lines = [f"処理時間の集計 ({len(self.records)}件, 秒):",
+                 f"  {'段階':<4}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>7}{'合計':>7}"]
+        for field, label in STAGES:
+            values = sorted(getattr(metrics, field) for _, metrics in self.records)
+            lines.append(f"  {label:<4}{percentile(values, 50):9.3f}{percentile(values, 90):9.3f}"
+                         f"{percentile(values, 99):9.3f}{values[-1]:9.3f}{sum(values):9.2f}")
+
+        pages = sum(metrics.pages or 0 for _, metrics in self.records)
+        input_mb = sum(metrics.input_bytes for _, metrics in self.records) / (1024 * 1024)
+        output_mb = sum(metrics.output_bytes for _, metrics in self.records) / (1024 * 1024)
+        peaks = [metrics.peak_rss_mb for _, metrics in self.records if metrics.peak_rss_mb]
+        peak_info = f", 最大RSS {max(peaks):.1f}MB" if peaks else ""
+        lines.append(f"  抽出 {pages}ページ, 入力 {input_mb:.1f}MB, 出力 {output_mb:.1f}MB{peak_info}")
+
+        if slowest > 0:
+            ranked = sorted(self.records, key=lambda record: -record[1].total_seconds)[:slowest]
+            lines.append(f"処理に時間がかかったファイル (上位{len(ranked)}件):")
+            for rank, (pdf_path, metrics) in enumerate(ranked, 1):
+                page_info = "" if metrics.pages is None else f", {metrics.pages}ページ"
+                lines.append(f"  {rank}. {os.path.basename(pdf_path)}: {metrics.total_seconds:.2f}秒 "
+                             f"(抽出 {metrics.extract_seconds:.2f} / 整形 {metrics.format_seconds:.2f}"
+                             f" / 分割 {metrics.split_seconds:.2f} / 保存 {metrics.save_seconds:.2f}"
+                             f"{page_info}, {metrics.source})")
+        return lines
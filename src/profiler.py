@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+プロファイルモジュール - 選択したファイルの処理の cProfile による計測
+"""
+
+import os
+import glob
+import shutil
+from datetime import datetime
+from src.scanner import match_patterns
+
+def run_profiled(stats_path, func, *args, **kwargs):
+    """
+    関数を cProfile で計測しながら実行し、結果を保存する
+
+    ワーカープロセスでも呼び出せるように、モジュールの関数として定義する
+
+    Args:
+        stats_path (str): 計測結果の保存先
+        func (callable): 実行する関数
+        *args: 関数の引数
+        **kwargs: 関数のキーワード引数
+
+    Returns:
+        関数の戻り値
+    """
+    # 計測しない実行では cProfile / pstats を読み込まない
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(stats_path)
+
+class FileProfiler:
+    """
+    選択したファイルの処理だけを計測するプロファイラ
+
+    処理するファイルのうち先頭の limit 件、または file_pattern に一致する
+    ファイルだけを、処理したプロセス（並列処理ではワーカー）で計測する。
+    それ以外のファイルは計測しないため、大量のファイルを処理する実行でも
+    全体の処理時間への影響が小さい。結果は report() でまとめて保存する
+    """
+
+    def __init__(self, profile_dir, limit=0, file_pattern="", sort="cumulative", top=50):
+        """
+        Args:
+            profile_dir (str): 結果の保存先フォルダ
+            limit (int, optional): 計測するファイル数（0で上限なし）
+            file_pattern (str, optional): 計測するファイル名またはパターン（fnmatch 形式）
+            sort (str, optional): テキストレポートの並び順（pstats の sort_stats のキー）
+            top (int, optional): テキストレポートに出力する関数の数
+        """
+        self.profile_dir = profile_dir
+        self.limit = limit
+        self.file_pattern = file_pattern
+        self.sort = sort
+        self.top = top
+
+        self.name = f"profile_{datetime.now().strftime('%H%M%S')}_{os.getpid()}"
+        self.parts_dir = os.path.join(profile_dir, self.name + "_parts")
+        self.profiled = []
+
+    def select(self, pdf_file):
+        """
+        ファイルを計測するかどうかを決め、計測する場合は結果の保存先を返す
+
+        Args:
+            pdf_file (str): これから処理するPDFファイルのパス
+
+        Returns:
+            str | None: 計測結果の保存先（計測しない場合はNone）
+        """
+        if self.file_pattern and not match_patterns(pdf_file.replace(os.sep, "/"),
+                                                    [self.file_pattern]):
+            return None
+        if self.limit and len(self.profiled) >= self.limit:
+            return None
+
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.profiled.append(pdf_file)
+        return os.path.join(self.parts_dir, f"{len(self.profiled):06d}.prof")
+
+    def report(self):
+        """
+        計測結果をまとめて .pstats とテキストレポートを保存
+
+        Returns:
+            tuple | None: (.pstats のパス, テキストレポートのパス)。計測したファイルがなければNone
+        """
+        parts = sorted(glob.glob(os.path.join(self.parts_dir, "*.prof*")))
+        try:
+            if not parts:
+                return None
+
+            import pstats
+            stats = pstats.Stats(parts[0])
+            for part in parts[1:]:
+                stats.add(part)
+
+            stats_path = os.path.join(self.profile_dir, self.name + ".pstats")
+            report_path = os.path.join(self.profile_dir, self.name + ".txt")
+            stats.dump_stats(stats_path)
+            with open(report_path, "w", encoding="utf-8") as f:
+                f.write(f"計測したファイル ({len(self.profiled)}件):\n")
+                for pdf_file in self.profiled:
+                    f.write(f"  {pdf_file}\n")
+                f.write("\n")
+                # 削除する一時ファイルの一覧は出力しない
+                stats.files = []
+                stats.stream = f
+                stats.sort_stats(self.sort).print_stats(self.top)
+            return stats_path, report_path
+        finally:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+進捗通知モジュール - 処理スレッドから画面への進捗の受け渡し
+
+処理スレッドは1ファイル終わるごとに通知を put() し、送信スレッドが一定間隔ごとに
+それまでの通知をまとめて1回だけ送る。PySimpleGUI の window.write_event_value は
+呼び出すたびにイベントループを起こすため、ファイル数の多いバッチでも画面の更新回数を
+一定に抑え、処理スレッドも画面の更新を待たない
+"""
+
+import time
+import threading
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+# 通知をまとめて送る最短間隔（秒）
+MIN_INTERVAL_SECONDS = 0.2
+
+class ProgressChannel:
+    """
+    通知をまとめて一定間隔で送る経路
+
+    send(key, events) には前回の送信から届いた通知のリストを渡す（届いた順）。
+    close() すると残りの通知を送ってから送信スレッドを終了する
+    """
+
+    def __init__(self, send, key, interval=MIN_INTERVAL_SECONDS):
+        """
+        Args:
+            send (callable): 送信先（window.write_event_value など）
+            key (str): 送信するイベントのキー
+            interval (float, optional): 送信の最短間隔（秒）
+        """
+        self.send = send
+        self.key = key
+        self.interval = interval
+        self._events = []
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="progress-channel", daemon=True)
+        self._thread.start()
+
+    def put(self, event):
+        """通知を追加（送信を待たずに戻る）"""
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify()
+
+    def close(self):
+        """残りの通知を送り、送信スレッドの終了を待つ"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._events and not self._closed:
+                    self._condition.wait()
+                events, self._events = self._events, []
+                closed = self._closed
+            if events:
+                self._send(events)
+            if closed:
+                return
+
+            # 次の送信まで間隔を空ける（その間に届いた通知は次の送信にまとめる）
+            deadline = time.monotonic() + self.interval
+            with self._condition:
+                while not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+    def _send(self, events):
+        try:
+            self.send(self.key, events)
+        except Exception as e:
+            # 画面が閉じられた後などは送れなくても処理を続ける
+            logger.debug(f"進捗を送れませんでした: {str(e)}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ファイル探索モジュール - フォルダ内のPDFファイルの列挙
+"""
+
+import os
+import time
+from fnmatch import fnmatchcase
+
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+def is_pdf_name(name):
+    """
+    ファイル名の拡張子が .pdf かどうか（大文字・小文字を区別しない）
+
+    Args:
+        name (str): ファイル名
+
+    Returns:
+        bool: PDFファイル名ならTrue
+    """
+    return name.lower().endswith(".pdf")
+
+def match_patterns(rel_path, patterns):
+    """
+    相対パスまたはファイル名がパターンのいずれかに一致するかどうか
+
+    パターンは fnmatch 形式で、大文字・小文字を区別しない。区切り文字は "/" で書く
+
+    Args:
+        rel_path (str): 探索フォルダからの相対パス（区切り文字は "/"）
+        patterns (list): パターンのリスト
+
+    Returns:
+        bool: いずれかに一致すればTrue
+    """
+    rel_path = rel_path.lower()
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatchcase(rel_path, pattern.lower()) or fnmatchcase(name, pattern.lower())
+               for pattern in patterns)
+
+class PdfScanner:
+    """
+    os.scandir によるPDFファイルの逐次探索
+
+    見つけたファイルから順に返すため、大きなフォルダツリーでも一覧の作成を
+    待たずに処理を始められる。各フォルダ内は名前順、サブフォルダは深さ優先で
+    たどる。除外パターンに一致したフォルダの中は探索しない。シンボリックリンクの
+    フォルダもたどるが、一度たどったフォルダ（デバイス番号・inode番号が同じもの）は
+    飛ばすため、上位フォルダへのリンクがあっても同じファイルを繰り返し返さない。
+    読み込めないフォルダ・エントリは警告を記録して飛ばす
+    """
+
+    def __init__(self, folder_path, recursive=False, include=None, exclude=None):
+        """
+        Args:
+            folder_path (str): 探索するフォルダパス
+            recursive (bool, optional): サブフォルダも探索するかどうか
+            include (list, optional): 対象にするパターン（指定しない場合はすべてのPDF）
+            exclude (list, optional): 除外するファイル・フォルダのパターン
+        """
+        self.folder_path = folder_path
+        self.recursive = recursive
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+
+        # 探索の統計（elapsed は呼び出し側の処理中を除いた探索だけの時間）
+        self.entry_count = 0
+        self.file_count = 0
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        """
+        PDFファイルのパスを見つけた順に返す
+
+        Yields:
+            str: PDFファイルのパス
+        """
+        self.entry_count = 0
+        self.file_count = 0
+        self.elapsed = 0.0
+        start = time.perf_counter()
+
+        stack = [(self.folder_path, "")]
+        visited = set()
+        try:
+            while stack:
+                dir_path, rel_dir = stack.pop()
+                try:
+                    st = os.stat(dir_path)
+                    if (st.st_dev, st.st_ino) in visited:
+                        continue
+                    visited.add((st.st_dev, st.st_ino))
+                    with os.scandir(dir_path) as it:
+                        entries = sorted(it, key=lambda entry: entry.name)
+                except OSError as e:
+                    if not rel_dir:
+                        raise
+                    logger.warning(f"フォルダを読み込めません。飛ばします: {dir_path} ({str(e)})")
+                    continue
+                self.entry_count += len(entries)
+
+                subdirs = []
+                for entry in entries:
+                    rel_path = rel_dir + entry.name
+                    if self.exclude and match_patterns(rel_path, self.exclude):
+                        continue
+
+                    try:
+                        is_dir = entry.is_dir()
+                        is_pdf = not is_dir and is_pdf_name(entry.name) and entry.is_file()
+                    except OSError as e:
+                        logger.warning(f"ファイル情報を取得できません。飛ばします: {entry.path} ({str(e)})")
+                        continue
+
+                    if is_dir:
+                        if self.recursive:
+                            subdirs.append((entry.path, rel_path + "/"))
+                    elif is_pdf:
+                        if self.include and not match_patterns(rel_path, self.include):
+                            continue
+                        self.file_count += 1
+                        self.elapsed += time.perf_counter() - start
+                        start = None
+                        yield entry.path
+                        start = time.perf_counter()
+
+                # 名前順にたどるため逆順に積む
+                stack.extend(reversed(subdirs))
+        finally:
+            if start is not None:
+                self.elapsed += time.perf_counter() - start
+
+    def summary(self):
+        """
+        探索の統計を文字列で返す
+
+        Returns:
+            str: 件数・時間・速度
+        """
+        rate = self.entry_count / self.elapsed if self.elapsed > 0 else 0
+        return (f"ファイル探索: PDF {self.file_count}件 / {self.entry_count}エントリ, "
+                f"{self.elapsed:.2f}秒 ({rate:,.0f}エントリ/秒)")
@@ -1 +1,289 @@
- 
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+スキーマ定義モジュール - 設定値・処理結果の型定義
+"""
+
+from enum import Enum
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+class SplitMode(str, Enum):
+    """分割モード"""
+    FULL = "full"
+    HALF = "half"
+    THIRD = "third"
+    # [split] parts 個に分割
+    PARTS = "parts"
+    # 1ファイルが [split] max_bytes バイト以下になるように分割
+    SIZE = "size"
+
+class SettingsModel(BaseModel):
+    """
+    設定モデルの基底クラス
+
+    既存の整形処理は設定を辞書として扱うため、dict互換の get() を提供する。
+    読み込んだ設定はプロセス内で共有するため変更できない
+    （値を変える場合は model_copy(update={...}) で新しいオブジェクトを作る）
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+class FormattingSettings(SettingsModel):
+    """整形設定 ([formatting])"""
+    break_at_kuten: bool = True
+    break_at_dot: bool = False
+    paragraph_break: bool = False
+    english_mode: bool = False
+    quote_break_inside: bool = False
+    add_closing_quote: bool = True
+    remove_tab: bool = True
+    remove_space: bool = True
+    bullet_symbols: List[str] = ["・", "●", "〇", "■", "□", "◆", "◇", "▲", "△", "▼", "▽"]
+    custom_bullets: List[str] = []
+    custom_break_chars: List[str] = []
+    # 整形の実装（legacy=1行ずつ置換, fast=複数行をまとめて空白の削除・改行の挿入を行う）
+    engine: Literal["legacy", "fast"] = "legacy"
+
+class ExtractionSettings(SettingsModel):
+    """PDF抽出設定 ([extraction])"""
+    # 抽出方式（"pdfplumber"=文字の配置から行を組み立てる, "pdfminer"=テキストのみの高速抽出,
+    # "auto"=pdfminer で抽出し、テキストがない・文字化けしたページだけ pdfplumber で抽出し直す）
+    extractor: Literal["pdfplumber", "pdfminer", "auto"] = "pdfplumber"
+    # このページ数以上のPDFはページ範囲ごとに並列抽出する（0で無効）
+    page_parallel_threshold: int = Field(200, ge=0)
+    # 1タスクあたりのページ数
+    page_chunk_size: int = Field(50, ge=1)
+    # 抽出中のプロセスのRSS（MB）がこの値を超えたら省メモリ抽出に切り替える（0で切り替えない）
+    memory_limit_mb: int = Field(2048, ge=0)
+    # 常に省メモリ抽出を行う
+    low_memory: bool = False
+    # 省メモリ抽出で一度に開くページ数（このページ数ごとにPDFを開き直す）
+    low_memory_window: int = Field(100, ge=1)
+
+    def get_memory_limit(self):
+        """
+        抽出方式の iter_pages() に渡す、省メモリ抽出に切り替えるRSS
+
+        Returns:
+            int | None: RSS（MB）。0なら最初から省メモリ抽出、Noneなら切り替えない
+        """
+        if self.low_memory:
+            return 0
+        return self.memory_limit_mb or None
+
+class SplitSettings(SettingsModel):
+    """分割設定 ([split])"""
+    # --split parts の分割数
+    parts: int = Field(4, ge=2)
+    # --split size の1ファイルあたりの上限（UTF-8のバイト数）
+    max_bytes: int = Field(1048576, ge=1024)
+    # 分割位置の調整（"line"=行数で区切る（従来どおり）, "sentence"=近くの文末で区切る,
+    # "paragraph"=近くの段落の区切り（なければ文末）で区切る。文末・段落では「」・箇条書きの途中で区切らない）
+    boundary: Literal["line", "sentence", "paragraph"] = "line"
+    # 分割位置を動かせる範囲（1ファイルの行数に対する割合）
+    snap_window: float = Field(0.1, ge=0, le=0.5)
+
+class OutputSettings(SettingsModel):
+    """出力先設定 ([output])"""
+    # 出力先（"files"=1パート1ファイル（従来どおり）, "jsonl"=圧縮JSONLのシャード,
+    # "sqlite"=SQLiteデータベース。jsonl / sqlite は出力先フォルダの store に保存し、--export で従来の形式に書き出せる）
+    sink: Literal["files", "jsonl", "sqlite"] = "files"
+    # jsonl の圧縮方式（zstd は zstandard パッケージが必要）
+    compression: Literal["gzip", "zstd"] = "gzip"
+    # まとめて書き込む文書数・テキストのサイズ（MB）の上限（書き出し待ちがなくなった時点でも書き込む）
+    batch_documents: int = Field(100, ge=1)
+    batch_mb: int = Field(16, ge=1)
+    # jsonl の1シャードの上限サイズ（MB）
+    shard_max_mb: int = Field(256, ge=1)
+
+class SearchSettings(SettingsModel):
+    """全文検索の索引設定 ([search])"""
+    # 整形の終わった文書を索引に追加する（--search で検索できる）
+    enabled: bool = False
+    index_file: str = "cache/search_index.sqlite3"
+    # 索引の n-gram の文字数（変更した場合は --search-index rebuild で作り直す）
+    ngram: int = Field(2, ge=1, le=4)
+    # まとめて索引に追加する文書数・テキストのサイズ（MB）の上限
+    batch_documents: int = Field(200, ge=1)
+    batch_mb: int = Field(32, ge=1)
+    # --search で表示する行数の上限
+    max_hits: int = Field(100, ge=1)
+
+class WorkerSettings(SettingsModel):
+    """ワーカープロセスの監視設定 ([worker]。既定はすべて0で、監視しない)"""
+    # 1タスク（ファイル、大きなPDFではページ範囲）の処理時間の上限（秒）。
+    # 超えたワーカーを停止してファイルを失敗として記録する（0で無制限）
+    timeout_seconds: float = Field(0.0, ge=0)
+    # ワーカーのRSS（MB）の上限。超えたワーカーを停止してファイルを失敗として記録する（0で無制限）
+    memory_limit_mb: int = Field(0, ge=0)
+    # このタスク数を処理したワーカーは新しいワーカーに入れ替える（0で入れ替えない）
+    max_tasks_per_worker: int = Field(0, ge=0)
+
+    def is_enabled(self):
+        """
+        監視付きのワーカーで処理するかどうか
+
+        Returns:
+            bool: いずれかの上限を設定している場合はTrue（逐次処理でも別プロセスで処理する）
+        """
+        return bool(self.timeout_seconds or self.memory_limit_mb or self.max_tasks_per_worker)
+
+class CacheSettings(SettingsModel):
+    """結果キャッシュ設定 ([cache])"""
+    enabled: bool = True
+    cache_dir: str = "cache"
+    # キャッシュの合計サイズの上限（MB）。超えた分は最後に使われた時刻が古い順に削除
+    max_size_mb: int = Field(1024, ge=0)
+    # 抽出テキストの保存先の合計サイズの上限（MB）。--raw-store prune で適用
+    raw_max_size_mb: int = Field(4096, ge=0)
+
+class WatchSettings(SettingsModel):
+    """フォルダ監視設定 ([watch])"""
+    # 走査間隔（秒）
+    interval: float = Field(5.0, gt=0)
+    # 更新からこの秒数が経つまでは書き込み中とみなして処理しない
+    settle_seconds: float = Field(2.0, ge=0)
+    # 1回にまとめて処理するファイル数の上限
+    batch_size: int = Field(100, ge=1)
+    # 処理済みファイルの記録
+    state_file: str = "cache/watch_state.json"
+
+class MetricsSettings(SettingsModel):
+    """処理時間の記録設定 ([metrics])"""
+    # ファイルごとの処理時間・サイズをログフォルダの metrics.jsonl に記録する
+    enabled: bool = True
+    # 実行終了時の集計に表示する、処理に時間がかかったファイルの件数
+    slowest_files: int = Field(5, ge=0)
+
+class JournalSettings(SettingsModel):
+    """実行記録設定 ([journal])"""
+    # 処理が終わった文書をログフォルダの journal.jsonl に記録する（--resume で使う）
+    enabled: bool = True
+    # この件数ごと、または前回からこの秒数が経ったら記録をディスクに書き込む（fsync）
+    sync_documents: int = Field(100, ge=1)
+    sync_seconds: float = Field(1.0, ge=0)
+    # --resume で読み込む記録の日数（今日を含む）
+    resume_days: int = Field(7, ge=1)
+
+class DistributedSettings(SettingsModel):
+    """分散処理設定 ([distributed])"""
+    # 文書の取得状況（リース・完了の記録）を置く共有フォルダ（空なら出力先フォルダの .queue）
+    queue_dir: str = ""
+    # この秒数のあいだハートビートのないリースは、停止したワーカーのものとみなして再取得する
+    lease_seconds: float = Field(120.0, gt=0)
+    # 処理中の文書のリースを更新する間隔（秒、lease_seconds より短くする）
+    heartbeat_seconds: float = Field(15.0, gt=0)
+    # 残りの文書がすべて他のワーカーの処理中の場合に、取得状況を確認し直す間隔（秒）
+    poll_seconds: float = Field(5.0, gt=0)
+
+class ProfileSettings(SettingsModel):
+    """プロファイル設定 ([profile])"""
+    # 処理を cProfile で計測し、結果をログフォルダに保存する（--profile でも有効化できる）
+    enabled: bool = False
+    # 計測するファイル数（処理した順に先頭から、0で上限なし）
+    limit: int = Field(10, ge=0)
+    # 計測するファイル名またはパターン（fnmatch 形式、空なら制限なし）
+    file: str = ""
+    # テキストレポートの並び順（cumulative, tottime, calls など）
+    sort: str = "cumulative"
+    # テキストレポートに出力する関数の数
+    top: int = Field(50, ge=1)
+
+class AppSettings(SettingsModel):
+    """アプリケーション設定"""
+    app_name: str = "PDFテキスト整形ツール"
+    version: str = "2.0.0"
+    output_dir: str = "outputs"
+    log_dir: str = "log"
+    # ログの出力レベル（DEBUG にするとファイルごとの成功も出力）
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
+    # 処理件数の途中経過を出力する間隔（秒）
+    log_progress_seconds: float = Field(10.0, gt=0)
+    # 並列ワーカー数（0はCPU数に合わせて自動、1は逐次処理）
+    workers: int = Field(0, ge=0)
+    formatting: FormattingSettings = FormattingSettings()
+    extraction: ExtractionSettings = ExtractionSettings()
+    split: SplitSettings = SplitSettings()
+    output: OutputSettings = OutputSettings()
+    search: SearchSettings = SearchSettings()
+    worker: WorkerSettings = WorkerSettings()
+    cache: CacheSettings = CacheSettings()
+    watch: WatchSettings = WatchSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    journal: JournalSettings = JournalSettings()
+    distributed: DistributedSettings = DistributedSettings()
+    profile: ProfileSettings = ProfileSettings()
+
+class FileMetrics(BaseModel):
+    """PDF1ファイル分の処理時間・サイズ"""
+    # 入力元（pdf=PDFから抽出, raw=保存済みの抽出テキスト, cache=結果キャッシュから復元）
+    source: Literal["pdf", "raw", "cache"] = "pdf"
+    # ページ数（保存済みの抽出テキストから整形した場合・キャッシュから復元した場合はNone）
+    pages: Optional[int] = None
+    input_bytes: int = 0
+    output_bytes: int = 0
+    # 段階ごとの秒数（抽出・整形は交互に進むため、それぞれの処理中の時間だけを合計）
+    extract_seconds: float = 0.0
+    format_seconds: float = 0.0
+    split_seconds: float = 0.0
+    save_seconds: float = 0.0
+    total_seconds: float = 0.0
+    # 処理したプロセスのその時点までの最大RSS（MB、取得できない環境ではNone）
+    peak_rss_mb: Optional[float] = None
+
+class FileResult(BaseModel):
+    """PDF1ファイル分の処理結果"""
+    pdf_path: str
+    success: bool
+    message: str
+    output_paths: List[str] = []
+    metrics: Optional[FileMetrics] = None
+
+class SearchHit(BaseModel):
+    """全文検索で見つかった1行"""
+    # 出力ファイルのパス（[output] sink が jsonl / sqlite の場合は --export で書き出す場合のパス）
+    path: str
+    # 元のPDFのパス（--search-index rebuild で出力から作り直した場合はNone）
+    source: Optional[str] = None
+    # 分割番号（分割しない場合はNone）
+    part: Optional[int] = None
+    # パートの中の行番号（1から）
+    line: int
+    text: str
+
+class BatchSummary(BaseModel):
+    """フォルダ1回分の処理結果の集計"""
+    success_count: int = 0
+    error_count: int = 0
+    # 結果キャッシュを使った場合のヒット数・ミス数
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # --resume で処理済みとして飛ばした件数
+    skipped_count: int = 0
+
+class FileEvent(BaseModel):
+    """PDF1ファイルの処理完了の通知（iter_process_files が1ファイルごとに返す）"""
+    name: str
+    # 処理結果（success=成功, error=失敗, cached=結果キャッシュから復元）
+    status: Literal["success", "error", "cached"]
+    # 完了した件数（このファイルを含む）と全件数（探索しながら処理する場合はNone）
+    done: int
+    total: Optional[int] = None
+    # 処理を始めてからの経過秒数
+    elapsed_seconds: float = 0.0
+    # 段階ごとの秒数は result.metrics、書き出したファイルは result.output_paths
+    result: FileResult
+    # この時点までの集計
+    summary: BatchSummary = BatchSummary()
+
+    @property
+    def remaining_seconds(self):
+        """これまでの平均処理時間から見積もった残りの秒数（全件数が不明な場合はNone）"""
+        if not self.total or not self.done:
+            return None
+        return self.elapsed_seconds / self.done * max(self.total - self.done, 0)
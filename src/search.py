@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+全文検索モジュール - 整形結果の文字 n-gram 索引
+
+日本語は空白で単語に区切れないため、文字 n-gram（既定は2文字）ごとに、その n-gram を含む
+パートの番号の一覧（転置索引）を SQLite に保存する。検索語の n-gram をすべて含むパートだけを
+読み出し、行ごとに検索語を含むかを確かめて、文書・パート・行番号を返す。
+検索語・テキストは NFKC で正規化し、英字の大文字・小文字を区別しない
+
+索引はまとめて追加した文書ごとに1つのセグメント（n-gram -> パート番号の配列）として書き込み、
+同じ段のセグメントが MERGE_FACTOR 個たまったら1つにまとめる（LSM 方式）。
+整形の終わった文書は SearchIndexer が別スレッドで読み取り、まとめて索引に追加する
+"""
+
+import os
+import re
+import time
+import queue
+import hashlib
+import operator
+import threading
+import unicodedata
+from array import array
+from src.logger import setup_logger
+from src.store import STORE_DIR
+
+logger = setup_logger()
+
+# 他のプロセスが書き込み中の場合にSQLiteのロックを待つ最大秒数
+SQLITE_TIMEOUT = 60.0
+# 同じ段のセグメントがこの数だけたまったら1つにまとめる
+MERGE_FACTOR = 10
+# パートを読み出すときに1回の問い合わせで指定する数
+FETCH_SIZE = 500
+# 出力ファイル名の分割番号
+PART_PATTERN = re.compile(r"_part(\d+)\.txt$")
+
+def normalize(text):
+    """検索用にテキストを正規化（NFKC・小文字化）"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+def ngrams(text, n):
+    """
+    正規化したテキストに含まれる n-gram の集合（改行をまたぐものは除く）
+
+    Args:
+        text (str): 正規化したテキスト
+        n (int): n-gram の文字数
+
+    Returns:
+        set: n-gram の集合
+    """
+    if n == 1:
+        grams = set(text)
+    elif n == 2:
+        grams = set(map(operator.add, text, text[1:]))
+    else:
+        grams = set(map("".join, zip(*[text[i:] for i in range(n)])))
+    return {gram for gram in grams if "\n" not in gram}
+
+def part_of(path):
+    """出力ファイル名から分割番号を求める（分割しない場合はNone）"""
+    match = PART_PATTERN.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+def _find_lines(blob, normalized, term):
+    """
+    正規化した検索語を含む行を返す（1行に複数回現れても1回だけ）
+
+    Args:
+        blob (bytes): zlib 圧縮したテキスト（検索語が見つかった場合だけ展開する）
+        normalized (str): 正規化したテキスト
+        term (str): 正規化した検索語
+
+    Yields:
+        tuple: (行番号（1から）, 行)
+    """
+    import zlib
+    position = normalized.find(term)
+    if position < 0:
+        return
+    lines = zlib.decompress(blob).decode("utf-8").split("\n")
+    if normalized.count("\n") != len(lines) - 1:
+        # 正規化で行数が変わった場合は正規化後の行を返す
+        lines = normalized.split("\n")
+    line_number = 1
+    counted = 0
+    while position >= 0:
+        line_number += normalized.count("\n", counted, position)
+        counted = position
+        yield line_number, lines[line_number - 1]
+        end = normalized.find("\n", position)
+        if end < 0:
+            return
+        position = normalized.find(term, end + 1)
+
+class SearchIndex:
+    """
+    SQLite に保存した文字 n-gram の転置索引
+
+    parts:    パートごとの出力パス・元のPDF・分割番号・内容のハッシュ・zlib 圧縮したテキスト
+              （検索時に正規化しなくて済むよう、正規化したテキストも保存する）
+    postings: (n-gram, セグメント) ごとのパート番号の配列
+    複数のプロセスから使えるよう WAL モードで開き、追加は1回分を1トランザクションで書き込む
+    """
+
+    def __init__(self, index_file, ngram=2):
+        """
+        Args:
+            index_file (str): 索引ファイルのパス
+            ngram (int, optional): n-gram の文字数
+        """
+        self.index_file = index_file
+        self.ngram = ngram
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        """索引ファイルに接続（初回だけ。表がなければ作成）"""
+        if self._connection is None:
+            import sqlite3
+            directory = os.path.dirname(self.index_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.index_file, timeout=SQLITE_TIMEOUT,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS parts ("
+                               "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL, "
+                               "source TEXT, part INTEGER, digest TEXT NOT NULL, text BLOB NOT NULL, "
+                               "normalized BLOB NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS segments ("
+                               "id INTEGER PRIMARY KEY, level INTEGER NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS postings ("
+                               "gram TEXT NOT NULL, segment INTEGER NOT NULL, ids BLOB NOT NULL, "
+                               "PRIMARY KEY (gram, segment)) WITHOUT ROWID")
+            # 置き換えたパートの番号（セグメントをまとめるときに取り除く）
+            connection.execute("CREATE TABLE IF NOT EXISTS deleted (id INTEGER PRIMARY KEY)")
+            connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('ngram', ?)",
+                               (str(self.ngram),))
+            stored = int(connection.execute(
+                "SELECT value FROM meta WHERE key = 'ngram'").fetchone()[0])
+            if stored != self.ngram:
+                connection.close()
+                raise ValueError(f"索引の n-gram の文字数 ({stored}) が設定 ({self.ngram}) と異なります。"
+                                 f"--search-index rebuild で作り直してください")
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        """索引ファイルを閉じる"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add(self, records):
+        """
+        パートをまとめて索引に追加（1つのセグメントとして書き込む）
+
+        同じ出力パスのパートは置き換える。内容が変わっていないパートは追加しない
+
+        Args:
+            records (list): (出力パス, 元のPDFのパス, 分割番号, テキスト) のリスト
+
+        Returns:
+            int: 追加したパートの数
+        """
+        import zlib
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                postings = {}
+                added = 0
+                for path, source, part, text in records:
+                    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+                    row = connection.execute("SELECT id, digest FROM parts WHERE path = ?",
+                                             (path,)).fetchone()
+                    if row is not None:
+                        if row[1] == digest:
+                            continue
+                        connection.execute("DELETE FROM parts WHERE id = ?", (row[0],))
+                        connection.execute("INSERT OR IGNORE INTO deleted (id) VALUES (?)", (row[0],))
+                    normalized = normalize(text)
+                    part_id = connection.execute(
+                        "INSERT INTO parts (path, source, part, digest, text, normalized) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, source, part, digest, zlib.compress(text.encode("utf-8"), 1),
+                         zlib.compress(normalized.encode("utf-8"), 1))).lastrowid
+                    for gram in ngrams(normalized, self.ngram):
+                        postings.setdefault(gram, []).append(part_id)
+                    added += 1
+
+                if postings:
+                    segment = connection.execute(
+                        "INSERT INTO segments (level) VALUES (0)").lastrowid
+                    connection.executemany(
+                        "INSERT INTO postings (gram, segment, ids) VALUES (?, ?, ?)",
+                        [(gram, segment, array("I", ids).tobytes())
+                         for gram, ids in postings.items()])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            if added:
+                self._merge()
+            return added
+
+    def _merge(self):
+        """同じ段のセグメントが MERGE_FACTOR 個以上あれば1つにまとめる（上の段も繰り返す）"""
+        connection = self._connect()
+        level = 0
+        while True:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                segments = [row[0] for row in connection.execute(
+                    "SELECT id FROM segments WHERE level = ? ORDER BY id", (level,))]
+                if len(segments) < MERGE_FACTOR:
+                    connection.execute("COMMIT")
+                    return
+                total = connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+                deleted = {row[0] for row in connection.execute("SELECT id FROM deleted")}
+                merged = connection.execute(
+                    "INSERT INTO segments (level) VALUES (?)", (level + 1,)).lastrowid
+
+                placeholders = ",".join("?" * len(segments))
+                postings = []
+
+                def append(gram, ids):
+                    if deleted:
+                        ids = array("I", [i for i in ids if i not in deleted])
+                    if ids:
+                        postings.append((gram, merged, ids.tobytes()))
+
+                current = None
+                ids = array("I")
+                for gram, blob in connection.execute(
+                        f"SELECT gram, ids FROM postings WHERE segment IN ({placeholders}) "
+                        f"ORDER BY gram, segment", segments):
+                    if gram != current:
+                        append(current, ids)
+                        current = gram
+                        ids = array("I")
+                    ids.frombytes(blob)
+                append(current, ids)
+
+                connection.execute(f"DELETE FROM postings WHERE segment IN ({placeholders})", segments)
+                connection.execute(f"DELETE FROM segments WHERE id IN ({placeholders})", segments)
+                connection.executemany("INSERT INTO postings (gram, segment, ids) VALUES (?, ?, ?)",
+                                       postings)
+                if total == len(segments):
+                    # すべてのセグメントから置き換え前のパートを取り除いた
+                    connection.execute("DELETE FROM deleted")
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            level += 1
+
+    def search(self, query, limit=100):
+        """
+        検索語を含む行を探す
+
+        Args:
+            query (str): 検索語（1行の中の文字列として探す）
+            limit (int, optional): 返す行数の上限
+
+        Returns:
+            tuple: (SearchHit のリスト, 確かめたパートの数)
+        """
+        import zlib
+        from src.schema import SearchHit
+        term = normalize(query).strip()
+        if not term:
+            return [], 0
+
+        with self._lock:
+            connection = self._connect()
+            if len(term) < self.ngram:
+                # n-gram より短い検索語は索引を使えないため、すべてのパートを確かめる
+                candidates = [row[0] for row in connection.execute("SELECT id FROM parts ORDER BY id")]
+            else:
+                candidates = None
+                lists = []
+                for gram in ngrams(term, self.ngram):
+                    ids = set()
+                    for (blob,) in connection.execute("SELECT ids FROM postings WHERE gram = ?",
+                                                      (gram,)):
+                        ids.update(array("I", blob))
+                    if not ids:
+                        return [], 0
+                    lists.append(ids)
+                lists.sort(key=len)
+                candidates = set(lists[0])
+                for ids in lists[1:]:
+                    candidates &= ids
+                candidates = sorted(candidates)
+
+            hits = []
+            checked = 0
+            for start in range(0, len(candidates), FETCH_SIZE):
+                chunk = candidates[start:start + FETCH_SIZE]
+                rows = connection.execute(
+                    f"SELECT id, path, source, part, text, normalized FROM parts "
+                    f"WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id", chunk).fetchall()
+                for _, path, source, part, text, normalized in rows:
+                    checked += 1
+                    normalized = zlib.decompress(normalized).decode("utf-8")
+                    for line_number, line in _find_lines(text, normalized, term):
+                        hits.append(SearchHit(path=path, source=source, part=part,
+                                              line=line_number, text=line))
+                        if len(hits) >= limit:
+                            return hits, checked
+            return hits, checked
+
+    def info(self):
+        """
+        索引の件数・サイズ
+
+        Returns:
+            dict: parts, sources, segments, postings, size_bytes, ngram
+        """
+        with self._lock:
+            connection = self._connect()
+            count = lambda sql: connection.execute(sql).fetchone()[0]
+            size = sum(os.path.getsize(self.index_file + suffix) for suffix in ("", "-wal")
+                       if os.path.exists(self.index_file + suffix))
+            return {
+                "parts": count("SELECT COUNT(*) FROM parts"),
+                "sources": count("SELECT COUNT(DISTINCT source) FROM parts"),
+                "segments": count("SELECT COUNT(*) FROM segments"),
+                "postings": count("SELECT COUNT(*) FROM postings"),
+                "size_bytes": size,
+                "ngram": self.ngram,
+            }
+
+    def clear(self):
+        """索引ファイルを削除して空にする"""
+        with self._lock:
+            self.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.index_file + suffix):
+                    os.remove(self.index_file + suffix)
+
+class SearchIndexer:
+    """
+    整形の終わった文書を別スレッドで索引に追加する
+
+    add() は出力パスを受け取るだけで戻り、索引スレッドが出力（出力ファイルまたは
+    OutputStore）を読み取って batch_documents 件・batch_mb MB ごとにまとめて追加する。
+    索引への追加に失敗しても処理は止めず、ログに出力する
+    """
+
+    def __init__(self, index, store=None, batch_documents=200, batch_mb=32):
+        """
+        Args:
+            index (SearchIndex): 追加先の索引
+            store (OutputStore, optional): 出力先（指定しない場合は出力ファイルを読む）
+            batch_documents (int, optional): まとめて追加する文書数
+            batch_mb (int, optional): まとめて追加するテキストのサイズ（MB）
+        """
+        self.index = index
+        self.store = store
+        self.batch_documents = batch_documents
+        self.batch_bytes = batch_mb * 1024 * 1024
+        self.documents = 0
+        self.parts = 0
+        self.seconds = 0.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SearchIndexer", daemon=True)
+        self._thread.start()
+
+    def add(self, source, output_paths):
+        """
+        1文書分の出力を索引に追加する（追加を待たずに戻る）
+
+        Args:
+            source (str): 元のPDFのパス
+            output_paths (list): 出力ファイルのパス
+        """
+        self._queue.put((source, list(output_paths)))
+
+    def close(self):
+        """残りの文書を索引に追加し、索引スレッドの終了を待つ"""
+        self._queue.put(None)
+        self._thread.join()
+        self.index.close()
+
+    def _read(self, path):
+        """出力パスのテキストを読み取る（読み取れない場合はNone）"""
+        if self.store is not None:
+            return self.store.read(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _run(self):
+        records = []
+        size = 0
+        documents = 0
+        while True:
+            item = self._queue.get()
+            if item is not None:
+                source, output_paths = item
+                for path in output_paths:
+                    text = self._read(path)
+                    if text is None:
+                        logger.warning(f"索引に追加する出力を読み取れません: {path}")
+                        continue
+                    records.append((os.path.abspath(path), source and os.path.abspath(source),
+                                    part_of(path), text))
+                    size += len(text)
+                documents += 1
+            if records and (item is None or documents >= self.batch_documents
+                            or size >= self.batch_bytes):
+                self._flush(records, documents)
+                records = []
+                size = 0
+                documents = 0
+            if item is None:
+                return
+
+    def _flush(self, records, documents):
+        """読み取った文書をまとめて索引に追加"""
+        start = time.perf_counter()
+        try:
+            self.parts += self.index.add(records)
+            self.documents += documents
+        except Exception as e:
+            logger.error(f"検索索引への追加エラー: {str(e)}")
+        self.seconds += time.perf_counter() - start
+
+def iter_output_texts(output_dir, store=None):
+    """
+    出力先フォルダの出力（または OutputStore に保存したパート）を返す
+
+    Yields:
+        tuple: (出力ファイルのパス, テキスト)
+    """
+    if store is not None:
+        for name, text in store.iter_parts():
+            yield os.path.join(output_dir, *name.split("/")), text
+        return
+    for dir_path, dir_names, file_names in os.walk(output_dir):
+        dir_names[:] = sorted(name for name in dir_names
+                              if not (dir_path == output_dir and name == STORE_DIR))
+        for file_name in sorted(file_names):
+            if not file_name.endswith(".txt"):
+                continue
+            path = os.path.join(dir_path, file_name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    yield path, f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"索引に追加する出力を読み取れません: {path} ({str(e)})")
+
+def rebuild_index(index, output_dir, store=None, batch_documents=200):
+    """
+    索引を空にして、出力先フォルダにある出力から作り直す（元のPDFのパスは記録しない）
+
+    Args:
+        index (SearchIndex): 作り直す索引
+        output_dir (str): 出力先フォルダ
+        store (OutputStore, optional): 出力先（指定しない場合は出力ファイルを読む）
+        batch_documents (int, optional): まとめて索引に追加するパートの数
+
+    Returns:
+        int: 追加したパートの数
+    """
+    index.clear()
+    added = 0
+    records = []
+    for path, text in iter_output_texts(output_dir, store):
+        records.append((os.path.abspath(path), None, part_of(path), text))
+        if len(records) >= batch_documents:
+            added += index.add(records)
+            records = []
+    if records:
+        added += index.add(records)
+    return added
@@ -6,6 +6,7 @@
 """
 
 import os
+import threading
 import toml
 from src.schema import AppSettings
 from src.logger import setup_logger
@@ -22,27 +23,81 @@ def get_config_path():
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_dir, "config", "settings.toml")
 
+# 読み込み済みの設定: (設定ファイルのパス, (サイズ, 更新日時(ns)) または None, AppSettings)
+_cached = None
+_cache_lock = threading.Lock()
+
+def _get_config_stat(config_path):
+    """設定ファイルのサイズと更新日時（存在しない場合はNone）"""
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
 def load_settings():
     """
     設定ファイルから設定を読み込む
 
+    プロセス内で読み込んだ設定を保持し、設定ファイルのサイズ・更新日時が
+    前回から変わっていなければ読み込まずに同じオブジェクトを返す。
+    設定は変更できないため、呼び出し側で共有してもよい
+
     Returns:
         AppSettings: アプリケーション設定
     """
+    global _cached
+
     config_path = get_config_path()
+    with _cache_lock:
+        stat = _get_config_stat(config_path)
+        if _cached is not None and _cached[0] == config_path and _cached[1] == stat:
+            return _cached[2]
+
+        settings = _read_settings(config_path, stat is not None)
+        # デフォルト設定ファイルを保存した場合は保存後の状態を記録する
+        _cached = (config_path, _get_config_stat(config_path), settings)
+        return settings
+
+def reload_settings():
+    """
+    設定ファイルの変更の有無にかかわらず設定を読み込み直す
+
+    Returns:
+        AppSettings: アプリケーション設定
+    """
+    clear_settings_cache()
+    return load_settings()
+
+def clear_settings_cache():
+    """読み込み済みの設定を破棄し、次の load_settings() で読み込み直す"""
+    global _cached
+    with _cache_lock:
+        _cached = None
+
+def _read_settings(config_path, exists):
+    """
+    設定ファイルを読み込んで検証する
 
+    Args:
+        config_path (str): 設定ファイルのパス
+        exists (bool): 設定ファイルが存在するかどうか
+
+    Returns:
+        AppSettings: アプリケーション設定
+    """
     # デフォルト設定
     settings = AppSettings()
 
     # 設定ファイルが存在すれば読み込み
-    if os.path.exists(config_path):
+    if exists:
         try:
             with open(config_path, "r", encoding="utf-8") as f:
                 config_data = toml.load(f)
 
             # Pydanticモデルにデータを渡す
             settings = AppSettings(**config_data)
-            logger.info(f"設定ファイルを読み込みました: {config_path}")
+            logger.debug(f"設定ファイルを読み込みました: {config_path}")
         except Exception as e:
             logger.error(f"設定ファイル読み込みエラー: {str(e)}")
     else:
@@ -70,9 +125,10 @@ def save_settings(settings):
 
         # 設定ファイルに書き込み
         with open(config_path, "w", encoding="utf-8") as f:
-            toml.dump(settings.dict(), f)
+            toml.dump(settings.model_dump(), f)
 
         logger.info(f"設定ファイルを保存しました: {config_path}")
+        clear_settings_cache()
         return True
     except Exception as e:
         logger.error(f"設定ファイル保存エラー: {str(e)}")
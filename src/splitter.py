@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分割モジュール - 整形済みテキストの分割位置の決定
+
+テキストを行のリストに分解せず、改行の位置（オフセット）だけを走査して分割位置を求め、
+各パートは元のテキストの範囲として取り出す。文字列（str）のほか、一時ファイルを
+メモリマップした bytes 互換のバッファ（UTF-8）も同じ手順で扱える。
+
+分割方式:
+    full:  分割しない
+    half / third / parts: 行数で2・3・N等分する（従来の半分・三分割と同じ位置）
+    size:  1パートが max_bytes バイト（UTF-8）以下になるように先頭から区切る
+
+boundary に "sentence" / "paragraph" を指定すると、求めた位置の近く（1パートの
+行数の snap_window の範囲）にある文末・段落の区切りへ分割位置を動かし、
+「」の途中や箇条書きの途中で分割しないようにする
+"""
+
+from src.schema import SplitMode
+
+# 改行を数えるときに一度に取り出す長さ（文字数またはバイト数）
+SCAN_BLOCK = 1024 * 1024
+# 文末とみなす行末の文字
+SENTENCE_ENDS = ("。", "．", ".", "！", "？", "!", "?", "」", "』", "）", ")")
+# 引用の開始・終了
+QUOTE_OPEN = ("「", "『")
+QUOTE_CLOSE = ("」", "』")
+# 段落の始まりとみなす字下げ
+INDENT = ("　",)
+# 行頭・行末から取り除く空白（str と bytes で同じ結果になるよう ASCII の空白だけ）
+BLANKS = " \t\r"
+# 分割位置の選び方を変えた場合に、以前の結果キャッシュ・実行記録を使わないための番号
+SNAP_FORMAT = 2
+
+class TextSplitter:
+    """
+    分割モードと分割位置の調整方法
+
+    ワーカープロセスへは分割モードの代わりにこのオブジェクトを渡す
+    """
+
+    def __init__(self, mode=SplitMode.FULL, parts=2, max_bytes=1024 * 1024, boundary="line",
+                 snap_window=0.1, bullets=(), sentence_ends=SENTENCE_ENDS):
+        """
+        Args:
+            mode (SplitMode): 分割モード
+            parts (int, optional): parts モードの分割数
+            max_bytes (int, optional): size モードの1パートあたりの上限（UTF-8のバイト数）
+            boundary (str, optional): 分割位置の調整（"line"=調整しない, "sentence"=文末,
+                "paragraph"=段落の区切り、なければ文末）
+            snap_window (float, optional): 分割位置を動かせる範囲（1パートの行数に対する割合）
+            bullets (iterable, optional): 箇条書きの記号（連続する箇条書きの間では分割しない）
+            sentence_ends (iterable, optional): 文末とみなす行末の文字
+        """
+        self.mode = SplitMode(mode)
+        self.parts = {SplitMode.HALF: 2, SplitMode.THIRD: 3}.get(self.mode, max(2, parts))
+        self.max_bytes = max(16, max_bytes)
+        self.boundary = boundary
+        self.snap_window = snap_window
+        self.bullets = tuple(bullets)
+        self.sentence_ends = tuple(sentence_ends)
+        self._tokens = {}
+
+    @classmethod
+    def from_settings(cls, mode, settings):
+        """
+        設定ファイルの [split] と箇条書きの記号から生成
+
+        Args:
+            mode (SplitMode): 分割モード
+            settings (AppSettings): アプリケーション設定
+
+        Returns:
+            TextSplitter: 分割方法
+        """
+        formatting = settings.formatting
+        return cls(mode, settings.split.parts, settings.split.max_bytes, settings.split.boundary,
+                   settings.split.snap_window,
+                   bullets=list(formatting.bullet_symbols) + list(formatting.custom_bullets),
+                   sentence_ends=SENTENCE_ENDS + tuple(formatting.custom_break_chars))
+
+    @property
+    def value(self):
+        """分割モードの名前"""
+        return self.mode.value
+
+    @property
+    def label(self):
+        """処理結果のメッセージに表示する分割方法（例: "half", "4", "1048576バイトごと"）"""
+        if self.mode == SplitMode.PARTS:
+            return str(self.parts)
+        if self.mode == SplitMode.SIZE:
+            return f"{self.max_bytes}バイトごと"
+        return self.mode.value
+
+    @property
+    def cache_tag(self):
+        """結果キャッシュのキーに含める分割方法（従来の分割と同じ出力なら分割モードの名前のまま）"""
+        if self.mode in (SplitMode.FULL, SplitMode.HALF, SplitMode.THIRD) and self.boundary == "line":
+            return self.mode.value
+        size = self.max_bytes if self.mode == SplitMode.SIZE else self.parts
+        tag = f"{self.mode.value}-{size}-{self.boundary}"
+        if self.boundary != "line":
+            tag += f"-{self.snap_window:g}-{SNAP_FORMAT}-" + "".join(self.bullets + self.sentence_ends)
+        return tag
+
+    def needs_split(self, line_count, size):
+        """
+        分割して保存するかどうか
+
+        Args:
+            line_count (int): 行数（最後の改行の後ろに文字がなければ数えない）
+            size (int): テキストの大きさ（UTF-8のバイト数）
+
+        Returns:
+            bool: 分割する場合はTrue（Falseなら分割せずにそのまま保存する）
+        """
+        if self.mode == SplitMode.FULL:
+            return False
+        if self.mode == SplitMode.SIZE:
+            return size > self.max_bytes
+        return line_count > 1
+
+    def find_cuts(self, buf, line_count=None):
+        """
+        分割位置を求める
+
+        Args:
+            buf (str | bytes-like): 分割するテキスト（bytes 互換の場合はUTF-8）
+            line_count (int, optional): 行数（分かっている場合は数え直さない）
+
+        Returns:
+            list: 各パートの開始位置と末尾の位置 [0, ..., len(buf)]
+        """
+        if self.mode == SplitMode.SIZE:
+            return self._find_size_cuts(buf)
+
+        if line_count is None:
+            line_count = count_lines(buf)
+        # 従来の半分・三分割と同じく、先頭から行数 // N 行ずつ区切って余りを最後のパートに入れる
+        per_part = line_count // self.parts
+        targets = [per_part * no for no in range(1, self.parts)]
+        cuts = [0] + _find_line_starts(buf, targets, self._token(buf, "\n")) + [len(buf)]
+        if self.boundary != "line":
+            window = int(per_part * self.snap_window)
+            quotes = [0, 0]
+            for no in range(1, len(cuts) - 1):
+                if cuts[no] > 0:
+                    low, high = _line_window(buf, cuts[no], window, window)
+                    cuts[no] = self._snap(buf, cuts[no], max(cuts[no - 1] + 1, low),
+                                          min(cuts[no + 1] - 1, high), quotes)
+        return cuts
+
+    def iter_parts(self, buf, line_count=None):
+        """
+        パートごとの範囲を返す
+
+        各パートは末尾の改行を除いた範囲（従来の分割と同じく、パート内の行を改行で連結した内容）
+
+        Args:
+            buf (str | bytes-like): 分割するテキスト
+            line_count (int, optional): 行数
+
+        Yields:
+            tuple: (開始位置, 終了位置)
+        """
+        newline = self._token(buf, "\n")
+        cuts = self.find_cuts(buf, line_count)
+        for start, end in zip(cuts, cuts[1:]):
+            if end > start and buf[end - 1:end] == newline:
+                end -= 1
+            yield start, end
+
+    def _find_size_cuts(self, buf):
+        """size モードの分割位置（max_bytes 以内で最後の行の区切り、なければ文字の区切り）"""
+        newline = self._token(buf, "\n")
+        cuts = [0]
+        start = 0
+        quotes = [0, 0]
+        while True:
+            limit = _byte_limit(buf, start, self.max_bytes)
+            if limit >= len(buf):
+                break
+            # パートの末尾の改行は出力しないため、改行は上限の位置にあってもよい
+            position = buf.rfind(newline, start, limit + 1)
+            if position > start:
+                cut = position + 1
+                if self.boundary != "line":
+                    window = int(_count(buf, (newline,), start, cut) * self.snap_window)
+                    low, _ = _line_window(buf, cut, window, 0)
+                    cut = self._snap(buf, cut, max(start + 1, low), cut, quotes, latest=True)
+            else:
+                # 1行が上限より長い場合は行の途中で分割する
+                cut = limit
+            cuts.append(cut)
+            start = cut
+        cuts.append(len(buf))
+        return cuts
+
+    def _snap(self, buf, cut, low, high, quotes, latest=False):
+        """
+        分割位置を low 〜 high の範囲の文末・段落の区切りへ動かす
+
+        Args:
+            buf (str | bytes-like): テキスト
+            cut (int): 行数・サイズで求めた分割位置（行頭）
+            low (int): 動かせる範囲の先頭
+            high (int): 動かせる範囲の末尾
+            quotes (list): [位置, その位置までに閉じていない「」の数]。前の分割位置で数えた
+                ところから続けて数え、範囲の先頭の値に更新する
+            latest (bool, optional): 範囲内で最も後ろの区切りを選ぶ（Falseなら cut に最も近い区切り。
+                近さは行数で比べるため、str でもUTF-8のバッファでも同じ区切りを選ぶ）
+
+        Returns:
+            int: 分割位置（適した区切りがなければ cut のまま）
+        """
+        if low > high:
+            return cut
+        newline, blanks = self._token(buf, "\n"), self._token(buf, BLANKS)
+        quote_open, quote_close = self._token(buf, QUOTE_OPEN), self._token(buf, QUOTE_CLOSE)
+        indent, bullets = self._token(buf, INDENT), self._token(buf, self.bullets)
+        sentence_ends = self._token(buf, self.sentence_ends)
+
+        # 範囲の先頭の行までに閉じていない「」の数
+        line_start = buf.rfind(newline, 0, low) + 1
+        if line_start < quotes[0]:
+            quotes[:] = [0, 0]
+        depth = max(0, quotes[1] + _count(buf, quote_open, quotes[0], line_start)
+                    - _count(buf, quote_close, quotes[0], line_start))
+        quotes[:] = [line_start, depth]
+
+        # 区切りと cut の距離は行数で比べる（line_no は line_start の行からの行番号）
+        if cut >= line_start:
+            cut_line = _count(buf, (newline,), line_start, cut)
+        else:
+            cut_line = -_count(buf, (newline,), cut, line_start)
+        line_no = 0
+
+        best = {"paragraph": None, "sentence": None}
+        while True:
+            line_end = buf.find(newline, line_start)
+            if line_end < 0 or line_end + 1 > high:
+                break
+            line = buf[line_start:line_end]
+            depth = max(0, depth + _count(line, quote_open) - _count(line, quote_close))
+            position = line_start = line_end + 1
+            line_no += 1
+            if position < low or depth > 0:
+                continue
+
+            next_line = buf[position:position + 64]
+            if (bullets and line.lstrip(blanks).startswith(bullets)
+                    and next_line.lstrip(blanks).startswith(bullets)):
+                continue  # 箇条書きの途中
+            if not line.strip(blanks) or next_line.startswith(indent):
+                kinds = ("paragraph", "sentence")
+            elif line.rstrip(blanks).endswith(sentence_ends):
+                kinds = ("sentence",)
+            else:
+                continue
+            for kind in kinds:
+                current = best[kind]
+                distance = abs(line_no - cut_line)
+                if current is None or latest or distance < current[1]:
+                    best[kind] = (position, distance)
+
+        for kind in ("paragraph", "sentence"):
+            if kind == "paragraph" and self.boundary != "paragraph":
+                continue
+            if best[kind] is not None:
+                return best[kind][0]
+        return cut
+
+    def _token(self, buf, value):
+        """buf の型（str / bytes）に合わせた区切り文字"""
+        as_bytes = not isinstance(buf, str)
+        key = (as_bytes, value if isinstance(value, str) else tuple(value))
+        if key not in self._tokens:
+            if isinstance(value, str):
+                token = value.encode("utf-8") if as_bytes else value
+            else:
+                token = tuple(item.encode("utf-8") if as_bytes else item for item in value if item)
+            self._tokens[key] = token
+        return self._tokens[key]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tokens"] = {}
+        return state
+
+def get_splitter(split_mode):
+    """
+    分割モードから分割方法を取得
+
+    Args:
+        split_mode (SplitMode | str | TextSplitter): 分割モード（TextSplitter ならそのまま返す）
+
+    Returns:
+        TextSplitter: 分割方法（区切り位置は調整しない）
+    """
+    if isinstance(split_mode, TextSplitter):
+        return split_mode
+    return TextSplitter(split_mode)
+
+def count_lines(buf):
+    """
+    行数を数える（最後の改行の後ろに文字がなければ、その行は数えない）
+
+    Args:
+        buf (str | bytes-like): テキスト
+
+    Returns:
+        int: 行数
+    """
+    newline = "\n" if isinstance(buf, str) else b"\n"
+    if not len(buf):
+        return 0
+    count = sum(buf[start:start + SCAN_BLOCK].count(newline)
+                for start in range(0, len(buf), SCAN_BLOCK))
+    return count + (buf[-1:] != newline)
+
+def _count(buf, tokens, start=0, end=None):
+    """start 〜 end の範囲に tokens のいずれかが現れる回数（SCAN_BLOCK ずつ数える）"""
+    end = len(buf) if end is None else end
+    if not tokens or start >= end:
+        return 0
+    if end - start <= SCAN_BLOCK:
+        block = buf[start:end]
+        return sum(block.count(token) for token in tokens)
+    total = 0
+    for block_start in range(start, end, SCAN_BLOCK):
+        # ブロックの境界で区切り文字（bytes では複数バイト）が分かれないように重ねて取り出す
+        block = buf[block_start:min(block_start + SCAN_BLOCK, end)]
+        total += sum(block.count(token) for token in tokens)
+        for token in tokens:
+            boundary = block_start + SCAN_BLOCK
+            if len(token) > 1 and boundary < end:
+                span = buf[boundary - len(token) + 1:min(boundary + len(token) - 1, end)]
+                total += span.count(token)
+    return total
+
+def _line_window(buf, cut, before, after):
+    """
+    行頭 cut から前後に指定した行数だけ離れた行頭の位置
+
+    分割位置を動かせる範囲を行数で決めるため、str でもUTF-8のバッファでも同じ位置になる
+
+    Args:
+        buf (str | bytes-like): テキスト
+        cut (int): 行頭の位置
+        before (int): 前に離れる行数
+        after (int): 後ろに離れる行数
+
+    Returns:
+        tuple: (前の行頭, 後ろの行頭)
+    """
+    newline = "\n" if isinstance(buf, str) else b"\n"
+    low = cut
+    for _ in range(before):
+        if low == 0:
+            break
+        low = buf.rfind(newline, 0, low - 1) + 1
+    high = cut
+    for _ in range(after):
+        position = buf.find(newline, high)
+        if position < 0:
+            break
+        high = position + 1
+    return low, high
+
+def _find_line_starts(buf, targets, newline):
+    """
+    指定した行番号（0始まり）の行頭の位置
+
+    Args:
+        buf (str | bytes-like): テキスト
+        targets (list): 昇順の行番号
+        newline (str | bytes): 改行
+
+    Returns:
+        list: 各行の行頭の位置
+    """
+    offsets = []
+    position = line = 0
+    for target in targets:
+        while line < target:
+            block_end = min(position + SCAN_BLOCK, len(buf))
+            count = buf[position:block_end].count(newline)
+            if line + count < target:
+                line += count
+                position = block_end
+                continue
+            while line < target:
+                position = buf.find(newline, position) + 1
+                line += 1
+        offsets.append(position)
+    return offsets
+
+def _byte_limit(buf, start, max_bytes):
+    """
+    start から max_bytes バイト（UTF-8）以内に収まる範囲の末尾（文字の途中で切らない）
+
+    Args:
+        buf (str | bytes-like): テキスト
+        start (int): 開始位置
+        max_bytes (int): 上限のバイト数
+
+    Returns:
+        int: 末尾の位置（テキストの末尾まで収まる場合は len(buf) 以上）
+    """
+    if not isinstance(buf, str):
+        limit = start + max_bytes
+        if limit >= len(buf):
+            return len(buf)
+        # UTF-8 の継続バイトの前で切らない
+        while limit > start + 1 and buf[limit] & 0xC0 == 0x80:
+            limit -= 1
+        return limit
+
+    # 1文字は1バイト以上なので、max_bytes 文字を変換すれば上限の位置が分かる
+    window = buf[start:start + max_bytes]
+    encoded = window.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return start + len(window)
+    # 上限で切れた最後の文字は数えない
+    return start + len(encoded[:max_bytes].decode("utf-8", "ignore"))
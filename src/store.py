@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+出力先モジュール - 整形結果をまとめて保存する出力先
+
+files:  従来どおり1パート1ファイル（{名前}_{日付}整形後_partN.txt）で保存する（このモジュールは使わない）
+jsonl:  圧縮したJSONLのシャードに追記する（プロセスごとに別のシャード、gzip または zstd）
+sqlite: 1つのSQLiteデータベースに1パート1行で保存する
+
+パートは従来の出力ファイルのパス（出力先フォルダからの相対パス）で識別し、
+export_store() で従来の出力ファイルの構成に書き出せる。
+add() したパートは commit() で複数文書分をまとめて書き込む（jsonl は1つの圧縮ブロック、
+sqlite は1トランザクション）
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+# 出力先フォルダの中で、まとめて保存したファイルを置くフォルダ
+STORE_DIR = "store"
+SQLITE_FILE = "outputs.sqlite3"
+# 他のプロセスが書き込み中の場合にSQLiteのロックを待つ最大秒数
+SQLITE_TIMEOUT = 60.0
+# 圧縮方式 -> シャードの拡張子
+SHARD_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+def _get_codec(compression):
+    """
+    圧縮方式の圧縮・展開関数を取得
+
+    Returns:
+        tuple: (圧縮する関数, 展開する関数)
+    """
+    if compression == "gzip":
+        import gzip
+        return (lambda data: gzip.compress(data, compresslevel=6)), gzip.decompress
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd で圧縮するには zstandard パッケージをインストールしてください")
+        # 圧縮したブロックにはフレームごとに元のサイズが記録される
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"不明な圧縮方式です: {compression}")
+
+def to_store_text(data):
+    """出力ファイルの内容を保存する形式（改行は "\\n"）のバイト列にする"""
+    if os.linesep != "\n":
+        data = data.replace(os.linesep.encode("ascii"), b"\n")
+    return data
+
+class OutputStore(ABC):
+    """
+    整形結果をまとめて保存する出力先の基底クラス
+
+    add() したパートはメモリ上に保持し、commit() でまとめて書き込む。
+    書き出しスレッドと親プロセスでのキャッシュの復元から呼ばれるため、操作はロックで保護する
+    """
+
+    kind = ""
+
+    def __init__(self, output_dir, batch_documents=100, batch_mb=16):
+        """
+        Args:
+            output_dir (str): 出力先フォルダ（パートの識別名はこのフォルダからの相対パス）
+            batch_documents (int, optional): まとめて書き込む文書数の目安
+            batch_mb (int, optional): まとめて書き込むテキストのサイズの目安（MB）
+        """
+        self.output_dir = output_dir
+        self.directory = os.path.join(output_dir, STORE_DIR)
+        self.batch_documents = batch_documents
+        self.batch_bytes = batch_mb * 1024 * 1024
+        self._pending = []
+        self._pending_documents = 0
+        self._pending_bytes = 0
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def name_of(self, path):
+        """出力ファイルのパスからパートの識別名（出力先フォルダからの相対パス、区切りは "/"）を求める"""
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def add(self, document_path, parts):
+        """
+        1文書分のパートを追加（commit() するまで書き込まない）
+
+        Args:
+            document_path (str): 分割しない場合の出力ファイルのパス
+            parts (list): (パート番号（分割しない場合はNone）, 出力ファイルのパス, UTF-8のテキスト) のリスト
+        """
+        document = self.name_of(document_path)
+        with self._lock:
+            for part, path, data in parts:
+                self._pending.append((self.name_of(path), document, part, data))
+                self._pending_bytes += len(data)
+            self._pending_documents += 1
+
+    def needs_commit(self):
+        """まとめて書き込む量に達したかどうか"""
+        return (self._pending_documents >= self.batch_documents
+                or self._pending_bytes >= self.batch_bytes)
+
+    def commit(self):
+        """追加したパートを書き込む"""
+        with self._lock:
+            if not self._pending:
+                return
+            records = self._pending
+            self._pending = []
+            self._pending_documents = 0
+            self._pending_bytes = 0
+            self._write([(path, document, part, str(data, "utf-8"))
+                         for path, document, part, data in records])
+
+    @abstractmethod
+    def read(self, path):
+        """
+        保存済み（まだ書き込んでいないものを含む）のパートのテキストを取得
+
+        Args:
+            path (str): 出力ファイルのパス
+
+        Returns:
+            str | None: テキスト（保存されていない場合はNone）
+        """
+
+    def contains(self, path):
+        """
+        パートが保存済み（まだ書き込んでいないものを含む）かどうか
+
+        Args:
+            path (str): 出力ファイルのパス
+
+        Returns:
+            bool: 保存済みならTrue
+        """
+        return self.read(path) is not None
+
+    def _read_pending(self, name):
+        """まだ書き込んでいないパートのテキストを取得（ない場合はNone）"""
+        with self._lock:
+            for path, _, _, data in reversed(self._pending):
+                if path == name:
+                    return str(data, "utf-8")
+        return None
+
+    @abstractmethod
+    def iter_parts(self):
+        """
+        保存済みのパートを返す（同じパートが複数回保存されている場合は最後のもの）
+
+        Yields:
+            tuple: (識別名, テキスト)
+        """
+
+    @abstractmethod
+    def _write(self, records):
+        """(識別名, 文書の識別名, パート番号, テキスト) のリストをまとめて書き込む"""
+
+class JsonlStore(OutputStore):
+    """
+    圧縮したJSONLのシャードに追記する出力先
+
+    1行が1パート（{"path", "document", "part", "text"}）で、commit() 1回分を1つの
+    圧縮ブロックとしてシャードの末尾に追加する。ブロックは連結してもそのまま
+    展開できる（zcat / zstdcat で全体を読める）。プロセスごとに別のシャードへ書き込むため
+    ロックは不要で、書き込んだブロックの位置と識別名は同名の .idx に1行ずつ記録する。
+    .idx に記録される前に中断したブロックは読み取り時に無視する
+    """
+
+    kind = "jsonl"
+
+    def __init__(self, output_dir, compression="gzip", shard_max_mb=256, **kwargs):
+        """
+        Args:
+            output_dir (str): 出力先フォルダ
+            compression (str, optional): 圧縮方式（gzip / zstd）
+            shard_max_mb (int, optional): 1シャードの上限サイズ（MB、超えたら次のシャードに切り替える）
+            その他の引数は OutputStore と同じ
+        """
+        super().__init__(output_dir, **kwargs)
+        self.compression = compression
+        self._compress, _ = _get_codec(compression)
+        self.shard_max = shard_max_mb * 1024 * 1024
+        self._shard_path = None
+        self._shard_size = 0
+        self._sequence = 0
+        # 読み取り用: 識別名 -> (シャード, 位置, 長さ)、.idx -> 読み終えた位置
+        self._locations = {}
+        self._index_offsets = {}
+        # 最後に展開したブロック: ((シャード, 位置, 長さ), {識別名: テキスト})
+        self._last_block = (None, {})
+
+    def _new_shard(self):
+        """このプロセスの新しいシャードのパスを決める（名前は作成日時から始まる）"""
+        self._sequence += 1
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        name = f"{stamp}-{socket.gethostname()}-{os.getpid()}-{self._sequence}"
+        self._shard_path = os.path.join(self.directory, name + SHARD_SUFFIXES[self.compression])
+        self._shard_size = 0
+
+    def _write(self, records):
+        if self._shard_path is None or self._shard_size >= self.shard_max:
+            self._new_shard()
+        payload = "".join(json.dumps({"path": path, "document": document, "part": part,
+                                      "text": text}, ensure_ascii=False) + "\n"
+                          for path, document, part, text in records)
+        block = self._compress(payload.encode("utf-8"))
+
+        # ブロックを書き終えてから .idx に記録する（従来の出力ファイルと同じく fsync はしない）
+        with open(self._shard_path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(block)
+        entry = {"offset": offset, "length": len(block), "paths": [record[0] for record in records]}
+        with open(self._shard_path + ".idx", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._shard_size = offset + len(block)
+
+    def _refresh(self):
+        """前回から増えた .idx の行を読み、識別名の位置を更新（シャードの作成順に、後のものを優先）"""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".idx"):
+                continue
+            index_path = os.path.join(self.directory, name)
+            shard_path = index_path[:-len(".idx")]
+            offset = self._index_offsets.get(index_path, 0)
+            with open(index_path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 書き込み中の行
+                    offset += len(line)
+                    entry = json.loads(line)
+                    location = (shard_path, entry["offset"], entry["length"])
+                    for path in entry["paths"]:
+                        self._locations[path] = location
+            self._index_offsets[index_path] = offset
+
+    def _read_block(self, location):
+        """ブロックを展開して {識別名: テキスト} を返す（直前に展開したブロックは再利用）"""
+        if self._last_block[0] == location:
+            return self._last_block[1]
+        shard_path, offset, length = location
+        compression = next(key for key, suffix in SHARD_SUFFIXES.items()
+                           if shard_path.endswith(suffix))
+        _, decompress = _get_codec(compression)
+        with open(shard_path, "rb") as f:
+            f.seek(offset)
+            payload = decompress(f.read(length))
+        texts = {}
+        for line in payload.decode("utf-8").splitlines():
+            record = json.loads(line)
+            texts[record["path"]] = record["text"]
+        self._last_block = (location, texts)
+        return texts
+
+    def read(self, path):
+        name = self.name_of(path)
+        with self._lock:
+            text = self._read_pending(name)
+            if text is not None:
+                return text
+            if name not in self._locations:
+                self._refresh()
+            location = self._locations.get(name)
+            if location is None:
+                return None
+            return self._read_block(location).get(name)
+
+    def contains(self, path):
+        name = self.name_of(path)
+        with self._lock:
+            if name not in self._locations:
+                self._refresh()
+            return name in self._locations or self._read_pending(name) is not None
+
+    def iter_parts(self):
+        with self._lock:
+            self._refresh()
+            blocks = {}
+            for name, location in self._locations.items():
+                blocks.setdefault(location, []).append(name)
+        for location in sorted(blocks):
+            texts = self._read_block(location)
+            for name in blocks[location]:
+                yield name, texts[name]
+
+class SqliteStore(OutputStore):
+    """
+    1つのSQLiteデータベースに1パート1行で保存する出力先
+
+    複数のプロセスから書き込めるよう WAL モードで開き、commit() 1回分を1トランザクションで
+    書き込む。同じパートを保存し直した場合は行を置き換える
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, output_dir, **kwargs):
+        super().__init__(output_dir, **kwargs)
+        self.path = os.path.join(self.directory, SQLITE_FILE)
+        self._connection = None
+
+    def _connect(self):
+        """データベースに接続（初回だけ。表がなければ作成）"""
+        if self._connection is None:
+            import sqlite3
+            # 書き出しスレッドと親プロセスのメインスレッドからロックを取って使う
+            connection = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS parts ("
+                               "path TEXT PRIMARY KEY, document TEXT NOT NULL, part INTEGER, "
+                               "text TEXT NOT NULL, updated REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS parts_document ON parts (document)")
+            self._connection = connection
+        return self._connection
+
+    def _write(self, records):
+        connection = self._connect()
+        updated = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO parts (path, document, part, text, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(path, document, part, text, updated) for path, document, part, text in records])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def read(self, path):
+        name = self.name_of(path)
+        with self._lock:
+            text = self._read_pending(name)
+            if text is not None:
+                return text
+            row = self._connect().execute("SELECT text FROM parts WHERE path = ?",
+                                          (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def contains(self, path):
+        name = self.name_of(path)
+        with self._lock:
+            if self._read_pending(name) is not None:
+                return True
+            return self._connect().execute("SELECT 1 FROM parts WHERE path = ?",
+                                           (name,)).fetchone() is not None
+
+    def iter_parts(self):
+        with self._lock:
+            paths = [row[0] for row in
+                     self._connect().execute("SELECT path FROM parts ORDER BY path")]
+        for path in paths:
+            with self._lock:
+                row = self._connect().execute("SELECT text FROM parts WHERE path = ?",
+                                              (path,)).fetchone()
+            if row is not None:
+                yield path, row[0]
+
+def open_output_store(output, output_dir):
+    """
+    設定に従って出力先を開く
+
+    Args:
+        output (OutputSettings): 出力先の設定
+        output_dir (str): 出力先フォルダ
+
+    Returns:
+        OutputStore | None: 出力先（sink が files の場合はNone）
+    """
+    batch = {"batch_documents": output.batch_documents, "batch_mb": output.batch_mb}
+    if output.sink == "jsonl":
+        return JsonlStore(output_dir, output.compression, output.shard_max_mb, **batch)
+    if output.sink == "sqlite":
+        return SqliteStore(output_dir, **batch)
+    return None
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_output_store(output, output_dir):
+    """
+    このプロセスの出力先を取得（同じ設定なら同じ出力先を使い続ける）
+
+    fork で生成されたワーカープロセスでは開き直し、親プロセスのシャード・接続を使わない
+
+    Args:
+        output (OutputSettings | None): 出力先の設定
+        output_dir (str): 出力先フォルダ
+
+    Returns:
+        OutputStore | None: 出力先（設定がない場合・sink が files の場合はNone）
+    """
+    if output is None or output.sink == "files":
+        return None
+    key = (os.getpid(), output.sink, output.compression, os.path.abspath(output_dir))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = open_output_store(output, output_dir)
+        return _stores[key]
+
+def export_store(store, export_dir):
+    """
+    出力先の内容を従来の出力ファイルの構成で書き出す
+
+    Args:
+        store (OutputStore): 出力先
+        export_dir (str): 書き出し先フォルダ
+
+    Returns:
+        tuple: (書き出したファイル数, 合計バイト数)
+    """
+    count = 0
+    size = 0
+    created_dirs = set()
+    for name, text in store.iter_parts():
+        path = os.path.join(export_dir, *name.split("/"))
+        directory = os.path.dirname(path)
+        if directory not in created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            created_dirs.add(directory)
+        # 従来の出力ファイルと同じく、改行はこの環境の改行コードで書き出す
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        count += 1
+        size += os.path.getsize(path)
+    return count, size
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ワーカー監視モジュール - 処理時間・メモリ使用量に上限を設けたワーカープロセスのプール
+
+ProcessPoolExecutor は実行中のタスクだけを止められないため、壊れたPDFの抽出が
+終わらないとワーカーが占有され続け、最後にはバッチ全体がそのファイルを待つことになる。
+WorkerPool はワーカーごとに1タスクずつ渡して監視し、上限を超えたワーカーだけを
+停止して新しいワーカーに置き換える。他のワーカーで実行中のタスクはそのまま続く
+"""
+
+import time
+import signal
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+from src.metrics import get_process_rss_mb
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+# 実行中のワーカーのメモリ使用量を確認する間隔（秒）
+POLL_SECONDS = 0.5
+# 停止を求めてから強制終了するまでの猶予（秒）。この間に書き出し途中の一時ファイルを削除する
+TERMINATE_GRACE_SECONDS = 5.0
+
+class WorkerStopped(Exception):
+    """ワーカープロセスが停止したため、実行中のタスクを完了できなかった"""
+
+class WorkerLimitExceeded(WorkerStopped):
+    """タスクが処理時間・メモリ使用量の上限を超えたため、ワーカープロセスを停止した"""
+
+def _exit_on_terminate(signum, frame):
+    """停止の要求を例外に変え、実行中の処理の finally（一時ファイルの削除など）を実行させる"""
+    raise SystemExit(1)
+
+def _worker_main(conn):
+    """
+    ワーカープロセスの処理: タスクを1つずつ受け取って実行し、結果を返す
+
+    Args:
+        conn (Connection): 親プロセスとの接続。(関数, 引数) を受け取り、
+            (成功したかどうか, 戻り値または例外) を返す。None を受け取ったら終了する
+    """
+    # 中断（Ctrl+C）は親プロセスがワーカーを停止して行う
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _exit_on_terminate)
+    parent = multiprocessing.parent_process()
+
+    while True:
+        if not conn.poll(1.0):
+            # 親プロセスが強制終了された場合は残らずに終了する
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        func, args = task
+        try:
+            reply = (True, func(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # 戻り値や例外を受け渡せない（pickle できない）場合
+            conn.send((False, RuntimeError(f"処理結果を受け渡せません: {str(e)}")))
+
+class _Worker:
+    """ワーカープロセスと実行中のタスク"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.future = None
+        self.started = None
+        self.tasks = 0
+
+class WorkerPool:
+    """
+    処理時間・メモリ使用量に上限を設けたワーカープロセスのプール
+
+    concurrent.futures の Executor と同じく submit() で Future を返すため、
+    ProcessPoolExecutor の代わりに使える。監視スレッドが空いたワーカーへタスクを渡し、
+    次の場合はそのワーカーだけを停止して、タスクを WorkerStopped で失敗させる。
+
+    - 1タスクの処理時間が timeout_seconds を超えた
+    - ワーカーのRSSが memory_limit_mb を超えた（RSSを取得できない環境では確認しない）
+    - タスクの実行中にワーカーが異常終了した
+
+    また、max_tasks_per_worker 個のタスクを処理したワーカーは終了させ、
+    抽出ライブラリのキャッシュなどによるメモリ使用量の増加を抑える。
+    停止・終了したワーカーの代わりは、次のタスクを渡すときに起動する
+    """
+
+    def __init__(self, max_workers, timeout_seconds=0, memory_limit_mb=0, max_tasks_per_worker=0,
+                 mp_context=None):
+        """
+        Args:
+            max_workers (int): ワーカー数
+            timeout_seconds (float, optional): 1タスクの処理時間の上限（秒、0で無制限）
+            memory_limit_mb (int, optional): ワーカーのRSSの上限（MB、0で無制限）
+            max_tasks_per_worker (int, optional): ワーカーを入れ替えるまでのタスク数（0で入れ替えない）
+            mp_context (BaseContext, optional): ワーカーの起動方式。省略時は multiprocessing の既定
+        """
+        self.max_workers = max(1, max_workers)
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        # 上限を超えて停止したワーカー数と、タスク数で入れ替えたワーカー数
+        self.stopped_count = 0
+        self.recycled_count = 0
+
+        self._context = mp_context or multiprocessing.get_context()
+        self._workers = []
+        # 終了を待っているプロセス: (プロセス, 強制終了する時刻)
+        self._exiting = []
+        self._tasks = deque()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._cancel = False
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._wakeup_pending = False
+        self._thread = threading.Thread(target=self._run, name="WorkerPool", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args):
+        """
+        タスクを投入
+
+        Args:
+            func (callable): ワーカーで実行する関数（モジュールの最上位で定義したもの）
+            *args: 関数の引数
+
+        Returns:
+            Future: 関数の戻り値または例外
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("ワーカープールは停止済みです")
+            self._tasks.append((future, func, args))
+        self._wakeup()
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """
+        ワーカープールを停止
+
+        Args:
+            wait (bool, optional): すべてのワーカーが終了するまで待つ
+            cancel_futures (bool, optional): 開始前のタスクを取り消し、実行中のタスクの
+                ワーカーも停止する。指定しない場合は投入済みのタスクを最後まで実行する
+        """
+        with self._lock:
+            self._shutdown = True
+            self._cancel = self._cancel or cancel_futures
+        self._wakeup()
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 例外や中断で抜けた場合は残りのタスクを待たない
+        self.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
+
+    def _wakeup(self):
+        """監視スレッドを起こす"""
+        with self._lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        try:
+            self._wakeup_writer.send_bytes(b"")
+        except OSError:
+            pass  # 監視スレッドは終了済み
+
+    def _run(self):
+        """監視スレッドの処理"""
+        try:
+            while True:
+                with self._lock:
+                    self._wakeup_pending = False
+                    finished = self._shutdown and not self._tasks
+                    cancel = self._cancel
+                if cancel:
+                    self._cancel_all()
+                self._dispatch()
+
+                busy = [worker for worker in self._workers if worker.future is not None]
+                if finished and not busy:
+                    break
+
+                waitables = [self._wakeup_reader]
+                waitables += [process.sentinel for process, _ in self._exiting]
+                for worker in self._workers:
+                    waitables += [worker.conn, worker.process.sentinel]
+                ready = wait_connections(waitables, self._poll_timeout(busy))
+                while self._wakeup_reader.poll():
+                    self._wakeup_reader.recv_bytes()
+
+                for worker in list(self._workers):
+                    if worker.conn in ready:
+                        self._receive(worker)
+                    elif worker.process.sentinel in ready:
+                        self._crashed(worker)
+                self._check_limits()
+                self._reap()
+        except BaseException as e:
+            logger.error(f"ワーカーの監視中にエラーが発生しました: {str(e)}")
+            self._cancel_all(WorkerStopped(f"ワーカーの監視が停止しました: {str(e)}"))
+        finally:
+            self._stop_workers()
+
+    def _poll_timeout(self, busy):
+        """次に上限や終了待ちのプロセスを確認するまでの秒数（Noneなら次の通知まで待つ）"""
+        deadlines = [kill_at for _, kill_at in self._exiting]
+        if busy and self.timeout_seconds:
+            deadlines += [worker.started + self.timeout_seconds for worker in busy]
+        timeout = None
+        if deadlines:
+            timeout = max(0.0, min(deadlines) - time.monotonic())
+        if busy and self.memory_limit_mb:
+            timeout = POLL_SECONDS if timeout is None else min(timeout, POLL_SECONDS)
+        return timeout
+
+    def _dispatch(self):
+        """空いているワーカーへタスクを渡す（足りなければワーカーを起動）"""
+        while True:
+            worker = next((worker for worker in self._workers if worker.future is None), None)
+            if worker is None and len(self._workers) >= self.max_workers:
+                return
+            with self._lock:
+                if not self._tasks:
+                    return
+                future, func, args = self._tasks.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if worker is None:
+                worker = _Worker(self._context)
+                self._workers.append(worker)
+            try:
+                worker.conn.send((func, args))
+            except OSError as e:
+                self._discard(worker)
+                future.set_exception(WorkerStopped(f"ワーカープロセスにタスクを渡せません: {str(e)}"))
+                continue
+            except Exception as e:
+                # 引数を受け渡せない（pickle できない）場合はワーカーをそのまま使う
+                future.set_exception(e)
+                continue
+            worker.future = future
+            worker.started = time.monotonic()
+
+    def _receive(self, worker):
+        """ワーカーからタスクの結果を受け取る"""
+        try:
+            success, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._crashed(worker)
+            return
+
+        future = worker.future
+        worker.future = None
+        worker.tasks += 1
+        if success:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+        if self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            # 次のタスクは新しいワーカーで実行する
+            logger.debug(f"ワーカー (PID {worker.process.pid}) を{worker.tasks}タスクで入れ替えます")
+            self.recycled_count += 1
+            self._workers.remove(worker)
+            self._retire(worker)
+
+    def _crashed(self, worker):
+        """ワーカーが異常終了した"""
+        worker.process.join(1.0)
+        error = WorkerStopped(f"ワーカープロセスが異常終了しました (終了コード {worker.process.exitcode})")
+        future = worker.future
+        self._discard(worker)
+        if future is not None:
+            future.set_exception(error)
+
+    def _check_limits(self):
+        """処理時間・メモリ使用量の上限を超えたワーカーを停止"""
+        now = time.monotonic()
+        for worker in list(self._workers):
+            if worker.future is None:
+                continue
+            reason = None
+            if self.timeout_seconds and now - worker.started > self.timeout_seconds:
+                reason = f"処理時間の上限 ({self.timeout_seconds:g}秒) を超えたため中断しました"
+            elif self.memory_limit_mb:
+                rss = get_process_rss_mb(worker.process.pid)
+                if rss is not None and rss > self.memory_limit_mb:
+                    reason = (f"メモリ使用量の上限 ({self.memory_limit_mb}MB) を超えたため"
+                              f"中断しました (RSS {rss:.0f}MB)")
+            if reason is None:
+                continue
+
+            logger.warning(f"ワーカー (PID {worker.process.pid}) を停止します: {reason}")
+            self.stopped_count += 1
+            future = worker.future
+            self._discard(worker)
+            future.set_exception(WorkerLimitExceeded(reason))
+
+    def _cancel_all(self, error=None):
+        """開始前のタスクを取り消し、実行中のタスクのワーカーを停止"""
+        with self._lock:
+            tasks = list(self._tasks)
+            self._tasks.clear()
+        for future, _, _ in tasks:
+            if error is None:
+                future.cancel()
+            elif future.set_running_or_notify_cancel():
+                future.set_exception(error)
+        for worker in list(self._workers):
+            if worker.future is not None:
+                future = worker.future
+                self._discard(worker)
+                future.set_exception(error or WorkerStopped("処理を中断しました"))
+
+    def _discard(self, worker):
+        """ワーカーを一覧から外して停止（SIGTERM、猶予を過ぎたら強制終了）"""
+        if worker in self._workers:
+            self._workers.remove(worker)
+        worker.future = None
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.terminate()
+            self._exiting.append((worker.process, time.monotonic() + TERMINATE_GRACE_SECONDS))
+
+    def _retire(self, worker):
+        """空いているワーカーに終了を指示"""
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+        worker.conn.close()
+        self._exiting.append((worker.process, time.monotonic() + TERMINATE_GRACE_SECONDS))
+
+    def _reap(self):
+        """終了したプロセスを片付け、猶予を過ぎたプロセスを強制終了"""
+        now = time.monotonic()
+        exiting = []
+        for process, kill_at in self._exiting:
+            if not process.is_alive():
+                process.join()
+                continue
+            if now >= kill_at:
+                process.kill()
+                process.join()
+                continue
+            exiting.append((process, kill_at))
+        self._exiting = exiting
+
+    def _stop_workers(self):
+        """すべてのワーカーを終了させ、終了するまで待つ"""
+        for worker in list(self._workers):
+            self._workers.remove(worker)
+            if worker.future is None:
+                self._retire(worker)
+            else:
+                self._discard(worker)
+        while self._exiting:
+            process, kill_at = self._exiting[0]
+            process.join(max(0.0, kill_at - time.monotonic()))
+            self._reap()
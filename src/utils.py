@@ -3,12 +3,19 @@
 
 """
 ユーティリティモジュール - 補助関数
+
+PDFの読み取りは抽出方式（src.extractor）に任せる。PDFライブラリは読み込みに
+時間がかかるため、CLIの起動やキャッシュだけで済む実行では読み込まず、PDFを開くときに読み込む
 """
 
 import os
-import pdfplumber
+import mmap
+import time
+from itertools import repeat
 from datetime import datetime
 from src.schema import SplitMode
+from src.extractor import get_extractor
+from src.splitter import get_splitter, count_lines
 
 def ensure_dir(dir_path):
     """
@@ -24,29 +31,130 @@ def ensure_dir(dir_path):
         os.makedirs(dir_path, exist_ok=True)
     return dir_path
 
-def read_pdf_text(pdf_path):
+def get_pdf_page_count(pdf_path, extractor="pdfplumber"):
+    """
+    PDFファイルのページ数を取得
+
+    Args:
+        pdf_path (str): PDFファイルのパス
+        extractor (str, optional): 抽出方式の名前
+
+    Returns:
+        int: ページ数
+    """
+    try:
+        return get_extractor(extractor).page_count(pdf_path)
+    except Exception as e:
+        raise ValueError(f"PDFファイルの読み込みに失敗しました: {str(e)}")
+
+def get_page_ranges(page_count, chunk_size):
+    """
+    ページ数をチャンクサイズごとの範囲に分割
+
+    Args:
+        page_count (int): 総ページ数
+        chunk_size (int): 1チャンクあたりのページ数
+
+    Returns:
+        list: (開始ページ, 終了ページ) のリスト（終了ページは含まない）
+    """
+    chunk_size = max(1, chunk_size)
+    return [(start, min(start + chunk_size, page_count))
+            for start in range(0, page_count, chunk_size)]
+
+def iter_pdf_pages(pdf_path, start=0, end=None, extractor="pdfplumber", memory_limit_mb=None,
+                   window_pages=100):
+    """
+    PDFファイルからページごとにテキストを抽出して返す
+
+    全文を1つの文字列にまとめないため、メモリ使用量はおおむね1ページ分に収まる
+
+    Args:
+        pdf_path (str): PDFファイルのパス
+        start (int, optional): 開始ページ（0始まり）
+        end (int, optional): 終了ページ（含まない）。省略時は最終ページまで
+        extractor (str, optional): 抽出方式の名前（src.extractor.EXTRACTORS のキー）
+        memory_limit_mb (float, optional): 省メモリ抽出に切り替えるRSS（MB）。
+            0なら最初から省メモリ抽出、Noneなら切り替えない
+        window_pages (int, optional): 省メモリ抽出で一度に開くページ数
+
+    Yields:
+        str: ページのテキスト（末尾に改行付き、テキストのないページは除く）
+    """
+    return get_extractor(extractor).iter_pages(pdf_path, start, end, memory_limit_mb, window_pages)
+
+def extract_page_range(pdf_path, start, end, extractor="pdfplumber"):
+    """
+    PDFファイルの指定ページ範囲からテキストを抽出
+
+    ワーカープロセスから呼ばれるため、呼び出しごとに独自にファイルを開く
+
+    Args:
+        pdf_path (str): PDFファイルのパス
+        start (int): 開始ページ（0始まり）
+        end (int): 終了ページ（含まない）
+        extractor (str, optional): 抽出方式の名前
+
+    Returns:
+        str: 抽出されたテキスト
+    """
+    return "".join(iter_pdf_pages(pdf_path, start, end, extractor))
+
+def read_pdf_text(pdf_path, page_workers=1, page_threshold=0, chunk_size=50,
+                  extractor="pdfplumber", memory_limit_mb=None, window_pages=100):
    """
    PDFファイルからテキストを抽出
 
+   ページ数が page_threshold 以上で page_workers が2以上の場合は、
+   ページ範囲ごとに別プロセスで抽出し、ページ順に結合する
+
    Args:
        pdf_path (str): PDFファイルのパス
+       page_workers (int, optional): ページ並列抽出のプロセス数（1なら単一プロセス）
+       page_threshold (int, optional): ページ並列抽出を行う最小ページ数（0で無効）
+       chunk_size (int, optional): 1プロセスに割り当てるページ数
+       extractor (str, optional): 抽出方式の名前
+       memory_limit_mb (float, optional): 省メモリ抽出に切り替えるRSS（MB, iter_pdf_pages を参照）
+       window_pages (int, optional): 省メモリ抽出で一度に開くページ数
 
    Returns:
        str: 抽出されたテキスト
    """
-   text = ""
-   try:
-       with pdfplumber.open(pdf_path) as pdf:
-           for page in pdf.pages:
-               page_text = page.extract_text()
-               if page_text:
-                   text += page_text + "\n"
-   except Exception as e:
-       raise ValueError(f"PDFファイルの読み込みに失敗しました: {str(e)}")
+   if page_workers > 1 and page_threshold > 0:
+       page_count = get_pdf_page_count(pdf_path, extractor)
+       if page_count >= page_threshold:
+           from concurrent.futures import ProcessPoolExecutor
+           ranges = get_page_ranges(page_count, chunk_size)
+           with ProcessPoolExecutor(max_workers=min(page_workers, len(ranges))) as executor:
+               texts = executor.map(extract_page_range, repeat(pdf_path),
+                                    [start for start, _ in ranges], [end for _, end in ranges],
+                                    repeat(extractor))
+               return "".join(texts)
+
+   return "".join(iter_pdf_pages(pdf_path, extractor=extractor, memory_limit_mb=memory_limit_mb,
+                                 window_pages=window_pages))
 
-   return text
+def get_output_dir(pdf_path, source_root=None, output_dir="outputs"):
+   """
+   PDFファイルの出力先フォルダを決定
+
+   source_root を指定した場合は、その下のフォルダ構成を出力先に再現する
+
+   Args:
+       pdf_path (str): PDFファイルのパス
+       source_root (str, optional): 探索を開始したフォルダ
+       output_dir (str, optional): 出力先のルートフォルダ
 
-def get_output_path(file_name, timestamp=None, part=None):
+   Returns:
+       str: 出力先フォルダのパス
+   """
+   if source_root is None:
+       return output_dir
+
+   rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(pdf_path)), os.path.abspath(source_root))
+   return output_dir if rel_dir == os.curdir else os.path.join(output_dir, rel_dir)
+
+def get_output_path(file_name, timestamp=None, part=None, output_dir="outputs", create_dir=True):
    """
    出力ファイルのパスを生成
 
@@ -54,6 +162,8 @@ def get_output_path(file_name, timestamp=None, part=None):
        file_name (str): 元のファイル名（拡張子なし）
        timestamp (str, optional): タイムスタンプ
        part (int, optional): 分割番号
+       output_dir (str, optional): 出力先フォルダ
+       create_dir (bool, optional): 出力先フォルダがなければ作成する
 
    Returns:
        str: 出力ファイルパス
@@ -64,47 +174,66 @@ def get_output_path(file_name, timestamp=None, part=None):
    part_suffix = "" if part is None else f"_part{part}"
    output_filename = f"{file_name}_{timestamp}整形後{part_suffix}.txt"
 
-   output_dir = ensure_dir("outputs")
+   if create_dir:
+       output_dir = ensure_dir(output_dir)
    return os.path.join(output_dir, output_filename)
 
+def get_success_message(file_name, split_mode=SplitMode.FULL):
+   """
+   処理に成功したファイルのメッセージを生成
+
+   Args:
+       file_name (str): 元のファイル名（拡張子なし）
+       split_mode (SplitMode | TextSplitter, optional): 分割モード
+
+   Returns:
+       str: メッセージ
+   """
+   splitter = get_splitter(split_mode)
+   split_info = "" if splitter.mode == SplitMode.FULL else f" ({splitter.label}分割保存)"
+   return f"{file_name}.pdf → 成功{split_info}"
+
 def split_text(text, split_mode=SplitMode.FULL):
    """
    テキストを指定されたモードで分割
 
    Args:
        text (str): 分割するテキスト
-       split_mode (SplitMode): 分割モード
+       split_mode (SplitMode | TextSplitter): 分割モード
 
    Returns:
        list: 分割されたテキスト
    """
-   if split_mode == SplitMode.FULL:
-       return [text]
-
-   lines = text.splitlines()
-   line_count = len(lines)
-
-   if line_count <= 1:
-       return [text]
-
-   if split_mode == SplitMode.HALF:
-       # 半分に分割
-       mid = line_count // 2
-       return [
-           "\n".join(lines[:mid]),
-           "\n".join(lines[mid:])
-       ]
-
-   elif split_mode == SplitMode.THIRD:
-       # 三分割
-       third = line_count // 3
-       return [
-           "\n".join(lines[:third]),
-           "\n".join(lines[third:2*third]),
-           "\n".join(lines[2*third:])
-       ]
-
-   return [text]  # デフォルト
+   return list(iter_split_text(text, split_mode))
+
+def iter_split_text(text, split_mode=SplitMode.FULL):
+   """
+   テキストを指定されたモードで分割し、パートを1つずつ返す
+
+   行のリストを作らずに改行の位置から分割位置を求めるため、
+   同時に保持するのは元のテキストと取り出し中のパートだけ
+
+   Args:
+       text (str): 分割するテキスト
+       split_mode (SplitMode | TextSplitter): 分割モード
+
+   Yields:
+       str: 分割されたテキスト（各パートの末尾の改行は含まない）
+   """
+   splitter = get_splitter(split_mode)
+   line_count = count_lines(text)
+   size = _utf8_size(text) if splitter.mode == SplitMode.SIZE else len(text)
+   if not splitter.needs_split(line_count, size):
+       yield text
+       return
+
+   for start, end in splitter.iter_parts(text, line_count):
+       yield text[start:end]
+
+def _utf8_size(text):
+   """テキストをUTF-8で保存したときのバイト数（全体を一度に変換しない）"""
+   block = 1024 * 1024
+   return sum(len(text[start:start + block].encode("utf-8")) for start in range(0, len(text), block))
 
 def save_text(text, output_path):
    """
@@ -127,4 +256,150 @@ def save_text(text, output_path):
 
        return True
    except Exception as e:
-       raise IOError(f"ファイル保存エラー: {str(e)}")
\ No newline at end of file
+       raise IOError(f"ファイル保存エラー: {str(e)}")
+
+def save_text_stream(chunks, get_path, split_mode=SplitMode.FULL, created_dirs=None, stats=None,
+                     store=None):
+    """
+    テキスト片を逐次ファイルに書き出し、指定モードで分割して保存
+
+    split_text と save_text を組み合わせた場合と同じ内容を出力するが、
+    テキスト全体をメモリに保持しない。分割する場合は一時ファイルに書き出しながら
+    行数を数え、一時ファイルをメモリマップして分割位置を求めてから、
+    各パートの範囲をそのまま1パートずつ書き出す。
+    各出力ファイルは一時ファイルに書き終えてから名前を変更するため、
+    書きかけの出力ファイルは残らない
+
+    Args:
+        chunks (iterable): 保存するテキスト片
+        get_path (callable): パート番号（分割しない場合はNone）から出力パスを返す関数
+        split_mode (SplitMode | TextSplitter): 分割モード
+        created_dirs (set, optional): 作成済みのフォルダ。指定した場合は含まれるフォルダの
+            作成を省略し、新たに作成したフォルダを追加する
+        stats (dict, optional): 指定した場合は分割の秒数 (split_seconds) と
+            出力の合計バイト数 (output_bytes) を記録する
+        store (OutputStore, optional): 指定した場合はファイルを作らずに出力先へ追加する
+            （書き込むのは store.commit() を呼んだとき）
+
+    Returns:
+        list: 出力ファイルパスのリスト（store を指定した場合は各パートの識別に使うパス）
+    """
+    splitter = get_splitter(split_mode)
+    if store is not None:
+        return _add_to_store(chunks, get_path, splitter, store, stats)
+
+    output_path = get_path(None)
+    temp_path = output_path + ".tmp"
+
+    try:
+        output_dir = os.path.dirname(temp_path) or "."
+        if created_dirs is None or output_dir not in created_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+            if created_dirs is not None:
+                created_dirs.add(output_dir)
+
+        # 書き出しながら splitlines() と同じ数え方で行数を数える
+        line_count = 0
+        last_char = "\n"
+        newline = None if splitter.mode == SplitMode.FULL else ""
+        try:
+            with open(temp_path, "w", encoding="utf-8", newline=newline) as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+                        line_count += chunk.count("\n")
+                        last_char = chunk[-1]
+        except BaseException:
+            # 読み取り側の失敗などで中断した場合は書きかけのファイルを残さない
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if last_char != "\n":
+            line_count += 1
+
+        if not splitter.needs_split(line_count, os.path.getsize(temp_path)):
+            os.replace(temp_path, output_path)
+            if stats is not None:
+                stats["split_seconds"] = 0.0
+                stats["output_bytes"] = os.path.getsize(output_path)
+            return [output_path]
+
+        split_start = time.perf_counter()
+        output_paths = []
+        with open(temp_path, "rb") as src, \
+                mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            view = memoryview(buf)
+            try:
+                ranges = list(splitter.iter_parts(buf, line_count))
+                _release_pages(buf, 0, len(buf))
+                for part, (start, end) in enumerate(ranges, 1):
+                    part_path = get_path(part)
+                    part_temp_path = part_path + ".tmp"
+                    with open(part_temp_path, "wb") as f:
+                        _write_range(f, view, start, end)
+                    _release_pages(buf, start, end)
+                    os.replace(part_temp_path, part_path)
+                    output_paths.append(part_path)
+            finally:
+                view.release()
+
+        os.remove(temp_path)
+        if stats is not None:
+            stats["split_seconds"] = time.perf_counter() - split_start
+            stats["output_bytes"] = sum(os.path.getsize(path) for path in output_paths)
+        return output_paths
+    except OSError as e:
+        raise IOError(f"ファイル保存エラー: {str(e)}")
+
+def _add_to_store(chunks, get_path, splitter, store, stats=None):
+    """
+    テキスト片を出力先に追加（save_text_stream で store を指定した場合）
+
+    出力先は書き込むまでテキストを保持するため、一時ファイルを作らずにメモリ上で
+    分割位置を求め、各パートはバイト列をコピーせずに切り出す
+    """
+    data = "".join(chunks).encode("utf-8")
+    line_count = count_lines(data)
+
+    split_start = time.perf_counter()
+    if splitter.needs_split(line_count, len(data)):
+        view = memoryview(data)
+        parts = [(part, get_path(part), view[start:end])
+                 for part, (start, end) in enumerate(splitter.iter_parts(data, line_count), 1)]
+    else:
+        parts = [(None, get_path(None), data)]
+    store.add(get_path(None), parts)
+
+    if stats is not None:
+        stats["split_seconds"] = time.perf_counter() - split_start
+        stats["output_bytes"] = sum(len(part[2]) for part in parts)
+    return [part[1] for part in parts]
+
+def _release_pages(buf, start, end):
+    """
+    読み終えたメモリマップの範囲をこのプロセスのRSSから外す（対応していない環境では何もしない）
+
+    ファイルの内容はOSのキャッシュに残るため、再び読む場合もディスクから読み直すとは限らない
+    """
+    if not hasattr(mmap, "MADV_DONTNEED") or end <= start:
+        return
+    start -= start % mmap.PAGESIZE
+    try:
+        buf.madvise(mmap.MADV_DONTNEED, start, end - start)
+    except (OSError, ValueError):
+        pass
+
+def _write_range(f, view, start, end, block=1024 * 1024):
+    """
+    メモリマップした一時ファイルの範囲をコピーせずに書き出す
+
+    テキストモードで保存した場合と同じ内容にするため、改行が "\\n" でない環境
+    （Windows）ではブロックごとに改行を置き換えて書き出す
+    """
+    if os.linesep == "\n":
+        f.write(view[start:end])
+        return
+    line_separator = os.linesep.encode("ascii")
+    for block_start in range(start, end, block):
+        data = view[block_start:min(block_start + block, end)].tobytes()
+        f.write(data.replace(b"\n", line_separator))
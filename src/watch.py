@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+フォルダ監視モジュール - 追加・更新されたPDFファイルの逐次処理
+"""
+
+import os
+import json
+import time
+from src.batch import process_files
+from src.scanner import PdfScanner
+from src.logger import setup_logger
+from src.settings import load_settings
+from src.schema import SplitMode, BatchSummary
+
+logger = setup_logger()
+
+def scan_folder(folder_path, recursive=False, include=None, exclude=None):
+    """
+    フォルダ内のPDFファイルのサイズと更新日時を取得
+
+    Args:
+        folder_path (str): 監視するフォルダパス
+        recursive (bool, optional): サブフォルダも探索するかどうか
+        include (list, optional): 対象にするパターン（PdfScanner を参照）
+        exclude (list, optional): 除外するファイル・フォルダのパターン
+
+    Returns:
+        dict: PDFの絶対パス -> (サイズ, 更新日時(ns))
+    """
+    found = {}
+    for path in PdfScanner(folder_path, recursive, include, exclude):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # 走査中に削除されたファイルは次の走査で扱う
+            continue
+        found[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+class WatchState:
+    """
+    処理済みPDFファイルの記録
+
+    ファイルごとに処理した時点のサイズと更新日時を保存し、再起動後も
+    変更のないファイルを再処理しない
+    """
+
+    def __init__(self, state_path):
+        """
+        Args:
+            state_path (str): 状態ファイルのパス
+        """
+        self.state_path = state_path
+        self.files = {}
+
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    self.files = {path: tuple(stat) for path, stat in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                logger.warning(f"監視状態を読み込めません。全ファイルを未処理として扱います: {str(e)}")
+
+    def is_processed(self, path, stat):
+        """前回処理した時点からサイズ・更新日時が変わっていないかどうか"""
+        return self.files.get(path) == stat
+
+    def mark(self, path, stat):
+        """処理済みとして記録"""
+        self.files[path] = stat
+
+    def forget_missing(self, found, folder_path, recursive=False):
+        """監視フォルダ（recursive=True の場合はサブフォルダも）から削除されたファイルの記録を消す"""
+        folder = os.path.abspath(folder_path)
+        prefix = os.path.join(folder, "")
+        for path in list(self.files):
+            in_folder = path.startswith(prefix) if recursive else os.path.dirname(path) == folder
+            if in_folder and path not in found:
+                del self.files[path]
+
+    def save(self):
+        """状態ファイルに保存"""
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.files, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            logger.error(f"監視状態の保存エラー: {str(e)}")
+
+def watch_folder(folder_path, split_mode=SplitMode.FULL, workers=None, use_cache=None,
+                 interval=None, max_cycles=None, extractor=None, rebuild_cache=False,
+                 recursive=False, include=None, exclude=None):
+    """
+    フォルダを定期的に走査し、追加・更新されたPDFファイルだけを処理し続ける
+
+    起動時はフォルダを1回走査して状態ファイルと比較するだけで、処理済みの
+    ファイルは読み込まない。書き込み中のファイルを拾わないよう、2回続けて
+    同じサイズ・更新日時で、更新から settle_seconds 以上経ったファイルだけを処理する。
+    設定ファイルが変更された場合は次の走査から新しい設定を使う（状態ファイルの場所を除く）
+
+    Args:
+        folder_path (str): 監視するフォルダパス
+        split_mode (SplitMode | TextSplitter): 分割モード
+        workers (int, optional): 並列ワーカー数。指定しない場合は設定ファイルの値を使用
+        use_cache (bool, optional): 結果キャッシュを使うかどうか。指定しない場合は設定ファイルの値を使用
+        interval (float, optional): 走査間隔（秒）。指定しない場合は設定ファイルの値を使用
+        max_cycles (int, optional): 走査回数の上限（指定しない場合は中断されるまで続ける）
+        extractor (str, optional): 抽出方式の名前。指定しない場合は設定ファイルの値を使用
+        rebuild_cache (bool, optional): キャッシュを使わずに処理し、結果でキャッシュを更新する
+        recursive (bool, optional): サブフォルダも監視するかどうか（出力先にはフォルダ構成を再現）
+        include (list, optional): 対象にするパターン（PdfScanner を参照）
+        exclude (list, optional): 除外するファイル・フォルダのパターン
+
+    Returns:
+        BatchSummary: 監視を終了するまでの処理結果の合計
+    """
+    if not os.path.isdir(folder_path):
+        raise ValueError(f"指定されたパスはフォルダではありません: {folder_path}")
+
+    settings = load_settings()
+    watch = settings.watch
+    fixed_interval = interval
+    if interval is None:
+        interval = watch.interval
+
+    # サブフォルダも監視する場合は、フォルダ一括処理と同じく出力先にフォルダ構成を再現する
+    source_root = os.path.abspath(folder_path) if recursive else None
+    state = WatchState(watch.state_file)
+    previous = {}
+    total = BatchSummary()
+    cycle = 0
+
+    logger.info(f"フォルダの監視を開始: {folder_path} (間隔 {interval}秒)")
+    try:
+        while max_cycles is None or cycle < max_cycles:
+            cycle += 1
+            # 設定ファイルが変更されていなければ同じオブジェクトが返る
+            current = load_settings()
+            if current is not settings:
+                settings = current
+                watch = settings.watch
+                interval = watch.interval if fixed_interval is None else fixed_interval
+                logger.info("設定ファイルの変更を反映しました")
+
+            found = scan_folder(folder_path, recursive, include, exclude)
+            state.forget_missing(found, folder_path, recursive)
+
+            # 前回の走査から変化がなく、書き込みが落ち着いた未処理ファイル
+            now_ns = time.time_ns()
+            settle_ns = int(watch.settle_seconds * 1e9)
+            ready = sorted(path for path, stat in found.items()
+                           if not state.is_processed(path, stat)
+                           and previous.get(path) == stat
+                           and now_ns - stat[1] >= settle_ns)
+            previous = found
+
+            # 1回の処理件数を制限し、大量に追加された場合も状態をこまめに保存する
+            for start in range(0, len(ready), watch.batch_size):
+                batch = ready[start:start + watch.batch_size]
+                logger.info(f"新規・更新ファイルを処理: {len(batch)}件")
+                summary = BatchSummary()
+                process_files(batch, split_mode, workers, use_cache, rebuild_cache,
+                              settings=settings, source_root=source_root, extractor=extractor,
+                              summary=summary)
+                for path in batch:
+                    state.mark(path, found[path])
+                state.save()
+
+                total.success_count += summary.success_count
+                total.error_count += summary.error_count
+                total.cache_hits += summary.cache_hits
+                total.cache_misses += summary.cache_misses
+
+            if max_cycles is None or cycle < max_cycles:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("フォルダの監視を終了します")
+    finally:
+        state.save()
+
+    return total
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+出力モジュール - 整形結果の非同期書き出し
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from src.utils import save_text_stream
+from src.schema import SplitMode
+
+# 書き出しスレッドへまとめて渡すテキストの目安（文字数）
+BATCH_CHARS = 64 * 1024
+# 書き出しを中断したときに、書き出しスレッドの後片付けを待つ最大秒数
+ABORT_WAIT_SECONDS = 2.0
+
+class WriteAborted(Exception):
+    """書き出し中のテキストの生成側で処理が中断された"""
+
+class OutputWriter:
+    """
+    バックグラウンドスレッドによる出力ファイルの書き出し
+
+    整形結果をある程度まとめてから上限付きのキューで書き出しスレッドへ渡すため、
+    PDFの抽出・整形と、前のページや前のファイルの書き出し・分割が並行して進む。
+    キューが満ちた場合は生成側が待つので、メモリ使用量は上限内に収まる。
+    作成済みの出力フォルダはスレッド内で記録し、同じフォルダを作り直さない。
+    出力先（OutputStore）に保存する場合は、書き出し待ちのファイルがなくなるか、
+    まとめて書き込む量に達するまで複数ファイル分を溜めてから書き込み、
+    書き込んだ時点でそれらの Future を完了させる
+    """
+
+    def __init__(self, max_jobs=2, max_batches=16):
+        """
+        Args:
+            max_jobs (int, optional): 書き出し待ちにできるファイル数
+            max_batches (int, optional): 1ファイルあたりの書き出し待ちのテキストの数
+        """
+        self.pid = os.getpid()
+        self.max_batches = max_batches
+        self._jobs = queue.Queue(maxsize=max_jobs)
+        self._created_dirs = set()
+        self._thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, chunks, get_path, split_mode=SplitMode.FULL, stats=None, store=None):
+        """
+        テキスト片を書き出しスレッドへ渡す
+
+        chunks はこのメソッドを呼んだスレッドで最後まで読み進める。
+        読み取り中に例外が発生した場合は書き出しを取り消し、書きかけのファイルが
+        削除されるのを待ってから例外を送出する
+
+        Args:
+            chunks (iterable): 保存するテキスト片
+            get_path (callable): パート番号（分割しない場合はNone）から出力パスを返す関数
+            split_mode (SplitMode | TextSplitter): 分割モード
+            stats (dict, optional): 指定した場合は書き出しスレッドが分割・保存の秒数
+                (split_seconds, save_seconds)、出力の合計バイト数 (output_bytes)、
+                完了時刻 (finished, time.perf_counter() の値) を記録する。
+                Future の完了後に参照する
+            store (OutputStore, optional): 出力先（指定しない場合は出力ファイルに保存）
+
+        Returns:
+            Future: 書き出しが終わると出力ファイルパスのリストを返す
+        """
+        future = Future()
+        batches = queue.Queue(maxsize=self.max_batches)
+        self._jobs.put((batches, get_path, split_mode, future, stats, store))
+
+        try:
+            batch = []
+            size = 0
+            for chunk in chunks:
+                batch.append(chunk)
+                size += len(chunk)
+                if size >= BATCH_CHARS:
+                    batches.put("".join(batch))
+                    batch = []
+                    size = 0
+            if batch:
+                batches.put("".join(batch))
+        except BaseException:
+            batches.put(WriteAborted)
+            # 書きかけの一時ファイルが削除されるまで待つ（ワーカーの停止時にもファイルを残さない）
+            try:
+                future.exception(timeout=ABORT_WAIT_SECONDS)
+            except Exception:
+                pass
+            raise
+        batches.put(None)
+        return future
+
+    def _run(self):
+        """書き出しスレッドの本体"""
+        # 出力先への書き込みを待っている (Future, 出力パス, 出力先)
+        deferred = []
+        while True:
+            batches, get_path, split_mode, future, stats, store = self._jobs.get()
+            finished = []
+            # 生成側のテキストを待っていた時間（保存時間から除く）
+            waited = [0.0]
+
+            def iter_batches():
+                while True:
+                    wait_start = time.perf_counter()
+                    batch = batches.get()
+                    waited[0] += time.perf_counter() - wait_start
+                    if batch is None or batch is WriteAborted:
+                        finished.append(batch)
+                        break
+                    yield batch
+                if batch is WriteAborted:
+                    raise WriteAborted("書き出しが中断されました")
+
+            try:
+                start = time.perf_counter()
+                output_paths = save_text_stream(iter_batches(), get_path, split_mode,
+                                                self._created_dirs, stats, store)
+                if stats is not None:
+                    stats["finished"] = time.perf_counter()
+                    stats["save_seconds"] = (stats["finished"] - start - waited[0]
+                                             - stats["split_seconds"])
+                if store is None:
+                    future.set_result(output_paths)
+                else:
+                    deferred.append((future, output_paths, store))
+            except Exception as e:
+                if not finished:
+                    # 生成側が残りを渡し終えられるように読み捨てる
+                    self._drain(batches)
+                future.set_exception(e)
+
+            if deferred and (self._jobs.empty() or deferred[-1][2].needs_commit()):
+                self._commit(deferred)
+
+    @staticmethod
+    def _commit(deferred):
+        """溜めていたファイルを出力先に書き込み、待っていた Future を完了させる"""
+        error = None
+        for store in {id(store): store for _, _, store in deferred}.values():
+            try:
+                store.commit()
+            except Exception as e:
+                error = e
+        for future, output_paths, _ in deferred:
+            if error is None:
+                future.set_result(output_paths)
+            else:
+                future.set_exception(IOError(f"出力先への書き込みエラー: {str(error)}"))
+        deferred.clear()
+
+    @staticmethod
+    def _drain(batches):
+        """書き出しに失敗したファイルの残りのテキストを読み捨てる"""
+        while True:
+            batch = batches.get()
+            if batch is None or batch is WriteAborted:
+                return
+
+class InlineWriter:
+    """
+    呼び出したスレッドで分割・保存する書き出し（OutputWriter と同じ呼び出し方）
+
+    cProfile は計測を始めたスレッドの処理しか記録しないため、プロファイルを取る
+    ファイルの分割・保存を計測結果に含めるときに使う
+    """
+
+    def __init__(self):
+        self._created_dirs = set()
+
+    def write(self, chunks, get_path, split_mode=SplitMode.FULL, stats=None, store=None):
+        """
+        テキスト片を読み進めながら分割・保存する
+
+        引数と stats に記録する値は OutputWriter.write と同じ。出力先に保存する場合は
+        このファイルの分だけですぐに書き込む
+
+        Returns:
+            Future: 完了済みの Future（出力ファイルパスのリストを返す）
+        """
+        # テキスト片の生成（抽出・整形）を待っていた時間（保存時間から除く）
+        waited = [0.0]
+
+        def iter_batches():
+            batch = []
+            size = 0
+            it = iter(chunks)
+            while True:
+                wait_start = time.perf_counter()
+                chunk = next(it, None)
+                waited[0] += time.perf_counter() - wait_start
+                if chunk is None:
+                    break
+                batch.append(chunk)
+                size += len(chunk)
+                if size >= BATCH_CHARS:
+                    yield "".join(batch)
+                    batch = []
+                    size = 0
+            if batch:
+                yield "".join(batch)
+
+        start = time.perf_counter()
+        output_paths = save_text_stream(iter_batches(), get_path, split_mode,
+                                        self._created_dirs, stats, store)
+        if store is not None:
+            try:
+                store.commit()
+            except Exception as e:
+                raise IOError(f"出力先への書き込みエラー: {str(e)}")
+        if stats is not None:
+            stats["finished"] = time.perf_counter()
+            stats["save_seconds"] = (stats["finished"] - start - waited[0]
+                                     - stats["split_seconds"])
+
+        future = Future()
+        future.set_result(output_paths)
+        return future
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """
+    このプロセスの書き出しスレッドを取得（初回呼び出し時に起動）
+
+    fork で生成されたワーカープロセスには親のスレッドが引き継がれないため、
+    プロセスごとに起動し直す
+
+    Returns:
+        OutputWriter: 書き出しスレッド
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = OutputWriter()
+        return _writer